@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Resumable batch jobs over deal ranges, e.g. labelling millions of
+    deals. The deals are cut into fixed chunks that run over a process
+    pool. Everything lives in one job directory:
+        job         the task, deal range, chunk size and parameters;
+                    a rerun with other settings is refused
+        shards/     one append-only text file per worker process:
+                        r <deal> <status> <moves> <nodes> <seconds>
+                    per deal, then c <start> <end> once the chunk is
+                    written and synced. Records without their c line
+                    are a chunk cut short and are ignored.
+        checkpoint  the done deal ranges, the totals so far and how far
+                    each shard was read, replaced atomically
+    A rerun loads the checkpoint, reads only the shard tails past it
+    for chunks that finished after it, and runs the rest. Each worker
+    writes its own shard, so no single writer limits throughput.
+'''
+
+import argparse
+import concurrent.futures as cf
+import os
+import pathlib as pl
+import random
+import secrets
+import sys
+import time
+import typing as ty
+
+import game_log as GL
+import solver as SV
+import thoughtful as TH
+
+# a deal's record: (deal, status, moves, nodes, seconds)
+Record = ty.Tuple[int, SV.SolveStatus, int, int, float]
+
+
+def _label(deal: int, max_nodes: int=200000, **params) -> Record:
+    start = time.perf_counter()
+    result = TH.solve(SV.deal_state(deal), max_nodes)
+    return (deal, result.status, len(result.moves), result.nodes,
+            time.perf_counter() - start)
+
+
+def _solve(deal: int, max_nodes: int=20000, **params) -> Record:
+    start = time.perf_counter()
+    result = SV.solve(SV.deal_state(deal), 'best', max_nodes=max_nodes)
+    return (deal, result.status, len(result.moves), result.nodes,
+            time.perf_counter() - start)
+
+
+def _random(deal: int, max_moves: int=1000, **params) -> Record:
+    ''' a random playout, a win is SOLVED and the rest INCONCLUSIVE '''
+    game = GL.random_game(deal, max_moves, random.Random(deal))
+    status = SV.SolveStatus.SOLVED if game.won \
+        else SV.SolveStatus.INCONCLUSIVE
+    return deal, status, len(game.moves), 0, game.seconds
+
+
+_tasks = {
+    'label': _label,
+    'solve': _solve,
+    'random': _random,
+}
+
+
+def tasks() -> ty.List[str]:
+    return list(_tasks)
+
+
+class Totals():
+    ''' the aggregate of a set of records
+    '''
+    __slots__ = ('_deals', '_counts', '_moves', '_nodes', '_seconds')
+
+    def __init__(self):
+        self._deals = 0
+        self._counts = {s: 0 for s in SV.SolveStatus}
+        self._moves = 0
+        self._nodes = 0
+        self._seconds = 0.0
+
+    @property
+    def deals(self) -> int:
+        return self._deals
+
+    @property
+    def counts(self) -> ty.Dict[SV.SolveStatus, int]:
+        return self._counts
+
+    def add(self, record: Record) -> None:
+        deal, status, moves, nodes, seconds = record
+        self._deals += 1
+        self._counts[status] += 1
+        self._moves += moves
+        self._nodes += nodes
+        self._seconds += seconds
+
+    def merge(self, other: 'Totals') -> None:
+        self._deals += other._deals
+        for s, n in other._counts.items():
+            self._counts[s] += n
+        self._moves += other._moves
+        self._nodes += other._nodes
+        self._seconds += other._seconds
+
+    def line(self) -> str:
+        counts = ' '.join(str(n) for n in self._counts.values())
+        return f'totals {self._deals} {counts} {self._moves} {self._nodes} ' \
+               f'{self._seconds:.6f}'
+
+    @staticmethod
+    def from_line(parts: ty.List[str]) -> 'Totals':
+        ''' the inverse of line(), parts is it split '''
+        t = Totals()
+        n = len(t._counts)
+        t._deals = int(parts[1])
+        t._counts = {s: int(c) for s, c in zip(SV.SolveStatus,
+                                                parts[2:2 + n])}
+        t._moves = int(parts[2 + n])
+        t._nodes = int(parts[3 + n])
+        t._seconds = float(parts[4 + n])
+        return t
+
+    def __str__(self) -> str:
+        counts = ', '.join(f'{s.name}:{n}' for s, n in self._counts.items())
+        per = max(1, self._deals)
+        return f'{self._deals} deals, {counts}, ' \
+               f'{self._nodes / per:.0f} nodes/deal ' \
+               f'{self._seconds / per:.3f}s/deal'
+
+
+def _write_atomic(path: pl.Path, text: str) -> None:
+    ''' replace path by text, all or nothing even across a crash '''
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w') as fd:
+        fd.write(text)
+        fd.flush()
+        os.fsync(fd.fileno())
+    os.replace(tmp, path)
+
+
+# this process's shard, per job directory
+_shards = {}
+
+
+def _shard(directory: pl.Path) -> ty.Tuple[str, ty.TextIO]:
+    ''' the shard this process appends to, a new file per process so a
+        torn tail of a dead one is never appended to
+    '''
+    key = (os.getpid(), directory)
+    if key not in _shards:
+        name = f'{os.getpid()}-{secrets.token_hex(4)}.log'
+        _shards[key] = (name, open(directory / 'shards' / name, 'a'))
+    return _shards[key]
+
+
+def run_chunk(directory: pl.Path, task: str, params: ty.Dict[str, int],
+              start: int, end: int) -> ty.Tuple[int, int, str, int, Totals]:
+    ''' the pool task: run deals [start, end), append them to this
+        process's shard and sync it
+    Returns:
+        (start, end, shard name, shard size after the chunk, totals)
+    '''
+    run = _tasks[task]
+    totals = Totals()
+    lines = []
+    for deal in range(start, end):
+        record = run(deal, **params)
+        totals.add(record)
+        deal, status, moves, nodes, seconds = record
+        lines.append(f'r {deal} {int(status)} {moves} {nodes} '
+                     f'{seconds:.6f}\n')
+    lines.append(f'c {start} {end}\n')
+    name, fd = _shard(directory)
+    fd.write(''.join(lines))
+    fd.flush()
+    os.fsync(fd.fileno())
+    return start, end, name, fd.tell(), totals
+
+
+def _read_shard(path: pl.Path, offset: int=0) \
+        -> ty.Iterator[ty.Tuple[int, int, ty.List[Record]]]:
+    ''' the complete chunks of a shard from offset on
+    Yields:
+        (start, end, records)
+    '''
+    records = []
+    with open(path) as fd:
+        fd.seek(offset)
+        for line in fd:
+            if not line.endswith('\n'):
+                break  # cut short by a crash
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == 'r' and len(parts) == 6:
+                records.append((int(parts[1]), SV.SolveStatus(int(parts[2])),
+                                int(parts[3]), int(parts[4]),
+                                float(parts[5])))
+            elif parts[0] == 'c':
+                yield int(parts[1]), int(parts[2]), records
+                records = []
+
+
+def read_records(directory: pl.Path) -> ty.Iterator[Record]:
+    ''' every record of the job's complete chunks, each chunk once
+    '''
+    seen = set()
+    for path in sorted((directory / 'shards').glob('*.log')):
+        for start, end, records in _read_shard(path):
+            if start not in seen:
+                seen.add(start)
+                yield from records
+
+
+def _merge(ranges: ty.List[ty.Tuple[int, int]]) \
+        -> ty.List[ty.Tuple[int, int]]:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class Job():
+    ''' a job directory and its progress
+    '''
+    def __init__(self, directory: pl.Path, task: str, first: int,
+                 deals: int, chunk: int=256,
+                 params: ty.Dict[str, int] | None=None):
+        '''
+        Args:
+            directory: made if missing, else the job must be the same
+            task: one of tasks()
+            first, deals: the deal range
+            chunk: deals per pool task and per checkpointed range
+            params: passed to the task, e.g. max_nodes
+        Raises:
+            ValueError: the directory holds a different job
+        '''
+        self._dir = directory
+        self._task = task
+        self._first = first
+        self._end = first + deals
+        self._chunk = chunk
+        self._params = params or {}
+        (directory / 'shards').mkdir(parents=True, exist_ok=True)
+        spec = f'{task} {first} {deals} {chunk} ' \
+            + ' '.join(f'{k}={v}' for k, v in sorted(self._params.items()))
+        path = directory / 'job'
+        if path.exists():
+            if path.read_text().strip() != spec.strip():
+                raise ValueError(f'{directory} holds the job '
+                                 f'"{path.read_text().strip()}"')
+        else:
+            _write_atomic(path, spec + '\n')
+        self._done = []
+        self._totals = Totals()
+        self._offsets = {}
+        self._load()
+
+    @property
+    def totals(self) -> Totals:
+        return self._totals
+
+    @property
+    def done(self) -> ty.List[ty.Tuple[int, int]]:
+        ''' the done deal ranges, merged '''
+        return self._done
+
+    def _load(self) -> None:
+        ''' the checkpoint, then the chunks the shards finished after it
+        '''
+        path = self._dir / 'checkpoint'
+        if path.exists():
+            for line in path.read_text().splitlines():
+                parts = line.split()
+                match parts[0]:
+                    case 'done':
+                        self._done.append((int(parts[1]), int(parts[2])))
+                    case 'totals':
+                        self._totals = Totals.from_line(parts)
+                    case 'shard':
+                        self._offsets[parts[1]] = int(parts[2])
+        for shard in sorted((self._dir / 'shards').glob('*.log')):
+            offset = self._offsets.get(shard.name, 0)
+            for start, end, records in _read_shard(shard, offset):
+                if not self._is_done(start):
+                    totals = Totals()
+                    for record in records:
+                        totals.add(record)
+                    self._add(start, end, totals)
+            self._offsets[shard.name] = shard.stat().st_size
+        self._done = _merge(self._done)
+
+    def _is_done(self, start: int) -> bool:
+        return any(a <= start < b for a, b in self._done)
+
+    def _add(self, start: int, end: int, totals: Totals) -> None:
+        self._done.append((start, end))
+        self._totals.merge(totals)
+
+    def todo(self) -> ty.List[ty.Tuple[int, int]]:
+        ''' the chunks not done yet '''
+        return [(s, min(s + self._chunk, self._end))
+                for s in range(self._first, self._end, self._chunk)
+                if not self._is_done(s)]
+
+    def checkpoint(self) -> None:
+        self._done = _merge(self._done)
+        lines = [f'done {a} {b}' for a, b in self._done]
+        lines.append(self._totals.line())
+        lines += [f'shard {name} {offset}'
+                  for name, offset in sorted(self._offsets.items())]
+        _write_atomic(self._dir / 'checkpoint', '\n'.join(lines) + '\n')
+
+    def run(self, workers: int | None=None, every: float=10.0,
+            progress: ty.Callable[['Job'], None] | None=None) -> Totals:
+        ''' run what is left, checkpointing every so many seconds and
+            at the end, also when interrupted
+        '''
+        last = time.monotonic()
+        pool = cf.ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [pool.submit(run_chunk, self._dir, self._task,
+                                   self._params, start, end)
+                       for start, end in self.todo()]
+            for future in cf.as_completed(futures):
+                start, end, name, offset, totals = future.result()
+                self._add(start, end, totals)
+                # a worker's chunks finish in order, so its shard is
+                # accounted for up to here
+                self._offsets[name] = max(offset, self._offsets.get(name, 0))
+                if time.monotonic() - last >= every:
+                    self.checkpoint()
+                    last = time.monotonic()
+                    if progress:
+                        progress(self)
+        finally:
+            # chunks still running land in their shards for the next run
+            pool.shutdown(cancel_futures=True)
+            self.checkpoint()
+        return self._totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a resumable batch '
+                                     'job, rerun it to resume')
+    parser.add_argument('directory',
+                        type=pl.Path,
+                        help='the job directory')
+    parser.add_argument('--task', '-t',
+                        choices=tasks(),
+                        default='label',
+                        help='what to run per deal default: %(default)s')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=1000,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--chunk', '-c',
+                        type=int,
+                        default=64,
+                        help='deals per chunk default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=20000,
+                        help='solver node limit default: %(default)s')
+    parser.add_argument('--max_moves', '-m',
+                        type=int,
+                        default=1000,
+                        help='random playout length default: %(default)s')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='pool size default: %(default)s')
+    parser.add_argument('--every', '-e',
+                        type=float,
+                        default=10.0,
+                        help='seconds between checkpoints default: '
+                             '%(default)s')
+    args = parser.parse_args()
+    params = {'max_moves': args.max_moves} if args.task == 'random' \
+        else {'max_nodes': args.max_nodes}
+    try:
+        job = Job(args.directory, args.task, args.first, args.deals,
+                  args.chunk, params)
+    except ValueError as e:
+        sys.exit(e)
+    left = sum(b - a for a, b in job.todo())
+    print(f'{args.deals - left} deals done, {left} to run', file=sys.stderr)
+    start = time.perf_counter()
+    try:
+        totals = job.run(args.workers, args.every,
+                         lambda j: print(j.totals, file=sys.stderr))
+    except KeyboardInterrupt:
+        sys.exit(f'interrupted at {job.totals.deals} deals, rerun to '
+                 f'resume')
+    print(f'{totals} in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Engine benchmark.
+    A seeded random game is played with the solver move generator to
+    get a move script, the script is then replayed through the engine
+    once per tableau backend with stdout sent to /dev/null. The
+    backends print nothing themselves, the foundation and stock traces
+    they share cost both the same.
+    Reports time per move and the transient bytes allocated per move,
+    i.e., tracemalloc's peak above the live memory before the move,
+    for each table layout asked for, see layout.py.
+'''
+
+import argparse
+import contextlib
+import os
+import random
+import time
+import tracemalloc
+import typing as ty
+
+import layout as L
+import parse_sol_cmds as psc
+import solitaire as S
+import solver as SV
+import tableau as T
+
+
+def move_script(seed: int, nmoves: int) -> ty.List[psc.SolCmd]:
+    ''' nmoves random legal moves from the deal for seed, tableau moves
+        are preferred so the script exercises the backends.
+    '''
+    state = SV.state_from_game(*SV.deal_game(seed))
+    rng = random.Random(seed)
+    script = []
+    for i in range(nmoves):
+        moves = SV.legal_moves(state)
+        if not moves:
+            break
+        plays = [m for m in moves if m[0] != psc.SolActs.STOCK_TO_WASTE]
+        move = rng.choice(plays if plays and rng.random() < 0.7 else moves)
+        state = SV.apply_move(state, move)
+        script.append(SV.move_to_cmd(move))
+    return script
+
+
+def replay(seed: int, script: ty.List[psc.SolCmd], tableau_class: type,
+           trace: bool=False) -> ty.Tuple[float, float, SV.State]:
+    ''' play script on a fresh deal
+    Returns:
+        (seconds per move, allocated bytes per move, final State)
+    '''
+    game = SV.deal_game(seed, tableau_class)
+    alloc = 0
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        start = time.perf_counter()
+        for cmd in script:
+            if trace:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            S.play_cmd(*game, cmd)
+            if trace:
+                alloc += tracemalloc.get_traced_memory()[1] - before
+        secs = time.perf_counter() - start
+    n = max(1, len(script))
+    return secs / n, alloc / n, SV.state_from_game(*game)
+
+
+def run_backends(seeds: ty.Iterable[int], nmoves: int) -> None:
+    scripts = {seed: move_script(seed, nmoves) for seed in seeds}
+    nmoves = sum(len(s) for s in scripts.values())
+    print(f'{len(scripts)} games, {nmoves} moves')
+    finals = {}
+    for seed, script in scripts.items():
+        state = SV.state_from_game(*SV.deal_game(seed))
+        for cmd in script:
+            state = SV.apply_move(state, (cmd.cmd, tuple(cmd.cargs)))
+        finals[seed] = state
+    for name in T.backends():
+        cls = T.backend(name)
+        secs = sum(replay(seed, script, cls)[0] * len(script)
+                   for seed, script in scripts.items())
+        tracemalloc.start()
+        alloc = 0
+        for seed, script in scripts.items():
+            sec, nbytes, final = replay(seed, script, cls, trace=True)
+            alloc += nbytes * len(script)
+            assert finals[seed] == final, f'{name} differs on {seed=}'
+        tracemalloc.stop()
+        print(f'{name:>8}: {secs / nmoves * 1e6:8.2f}us/move '
+              f'{alloc / nmoves:8.1f} alloc bytes/move '
+              f'{nmoves / secs:10.0f} moves/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the engine')
+    parser.add_argument('--seed', '-s',
+                        type=int,
+                        default=1,
+                        help='first seed default: %(default)s')
+    parser.add_argument('--games', '-g',
+                        type=int,
+                        default=50,
+                        help='number of games default: %(default)s')
+    parser.add_argument('--moves', '-m',
+                        type=int,
+                        default=400,
+                        help='moves per game default: %(default)s')
+    parser.add_argument('--layouts', '-l',
+                        nargs='+',
+                        choices=L.layouts(),
+                        default=L.layouts(),
+                        help='table layouts default: %(default)s')
+    args = parser.parse_args()
+    for name in args.layouts:
+        L.use(name)
+        print(L.current())
+        run_backends(range(args.seed, args.seed + args.games), args.moves)
@@ -9,7 +9,6 @@ import re
 import sys
 import typing as ty
 
-import parse_sol_cmds as psc
 
 COLOR_RED='[31;1m'
 COLOR_BLUE='[34;1m'
@@ -45,6 +44,13 @@ def card_range():
     return _range
 
 class Card():
+    ''' A playing card. There are only 52, made once at import, Card(v, s)
+        and card(v, s) both return the shared instance so cards compare
+        by identity and hold no per game memory.
+    '''
+    __slots__ = ('_name', '_suit', '_color', '_title', '_value', '_red',
+                 '_id')
+
     _suit_map = {
         Suits.SPADE : 'spade',
         Suits.HEART : 'heart',
@@ -63,15 +69,25 @@ class Card():
         color = COLOR_RED if s in Card.RedSuits else COLOR_BLUE
         return f'{color}{Card.Symbols[s]}{COLOR_NONE}'
 
-    def __init__(self, value: int, suit: Suits):
-        assert (value >= ace) and (value <= king), \
-                f'Bad card {value=}'
+    def __new__(cls, value: int, suit: Suits):
+        return card(value, suit)
+
+    def _make(value: int, suit: Suits):
+        ''' only used to build the 52 flyweights '''
+        self = object.__new__(Card)
         self._name = _card_map[value]
-        self._suit = suit
-        self._color = COLOR_RED if suit in Card.RedSuits else COLOR_BLUE
+        self._suit = Suits(suit)
+        self._red = suit in Card.RedSuits
+        self._color = COLOR_RED if self._red else COLOR_BLUE
         self._title \
             = f'{self._color}{self._name}{Card.Symbols[self._suit]}{COLOR_NONE}'
         self._value = value
+        self._id = (value - ace) * len(Suits) + suit - _min_suit
+        return self
+
+    def __reduce__(self):
+        # pickle/copy give back the flyweight
+        return card, (self._value, self._suit)
 
     @property
     def name(self) -> str:
@@ -93,6 +109,15 @@ class Card():
     def title(self) -> str:
         return self._title
 
+    @property
+    def red(self) -> bool:
+        return self._red
+
+    @property
+    def id(self) -> int:
+        ''' index in the value major deck order, see card_by_id '''
+        return self._id
+
     #def below(self, card):
     #    return self._value == (card._value - 1)
 
@@ -131,6 +156,26 @@ class Card():
     def __str__(self):
         return self._title
 
+# the flyweights, in id order: value major, i.e., A♠ A♡ A♢ A♣ 2♠ ...
+_cards = [Card._make(value, suit)
+          for value in range(ace, king + 1)
+            for suit in Suits]
+
+def card(value: int, suit: Suits) -> Card:
+    ''' the card factory, returns the shared Card for value, suit
+    '''
+    assert (value >= ace) and (value <= king), \
+            f'Bad card {value=}'
+    return _cards[(value - ace) * len(Suits) + suit - _min_suit]
+
+def card_by_id(cid: int) -> Card:
+    return _cards[cid]
+
+def all_cards() -> ty.List[Card]:
+    ''' the 52 cards in id order '''
+    return list(_cards)
+
+
 def cards_to_str(card_list: [Card]) -> str:
     '''
     debug method to create a string from a list of cards
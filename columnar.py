@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Columnar export of games for analytics, needs numpy.
+    Two tables, a row per game and a row per move:
+        games  game, deal, policy, won, moves, seconds, nodes
+        moves  game, index, act, src, dst, flipped
+    game is the export's own game number, act a SolActs value, src and
+    dst the 0 based columns of the move or -1, flipped the face down
+    cards the move turned up, -1 past a move the rules do not allow.
+    Nodes are the solver's, 0 for games read from logs.
+    Rows gather in a preallocated structured array and every chunk rows
+    go out as a batch, so memory is bounded by the chunk size:
+        npy    <prefix>-<table>-<n>.<column>.npy, a file per column
+               per batch that np.load(mmap_mode='r') maps
+        arrow  <prefix>-<table>.arrow, an Arrow IPC file of record
+               batches, if pyarrow is installed
+    An export replaces an earlier one to the same prefix, in either
+    format.
+'''
+
+import argparse
+import pathlib as pl
+import sys
+import time
+import typing as ty
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+import game_log as GL
+import layout as L
+import parse_sol_cmds as psc
+import solver as SV
+
+GAMES = np.dtype([('game', np.int64), ('deal', np.int64),
+                  ('policy', 'S16'), ('won', np.bool_),
+                  ('moves', np.int32), ('seconds', np.float64),
+                  ('nodes', np.int64)])
+MOVES = np.dtype([('game', np.int64), ('index', np.int32),
+                  ('act', np.int8), ('src', np.int8), ('dst', np.int8),
+                  ('flipped', np.int8)])
+
+_tables = {'games': GAMES, 'moves': MOVES}
+
+
+def formats() -> ty.List[str]:
+    return ['npy'] + (['arrow'] if pa is not None else [])
+
+
+class TableWriter():
+    ''' rows in, a batch out every chunk rows
+    '''
+    def __init__(self, prefix: pl.Path, table: str, chunk: int=65536,
+                 fmt: str='npy'):
+        '''
+        Args:
+            prefix: see the module doc for the paths
+            table: games or moves
+            chunk: rows per batch
+            fmt: one of formats()
+        '''
+        assert fmt in formats(), f'unknown format {fmt}'
+        self._prefix = pl.Path(prefix)
+        self._table = table
+        self._fmt = fmt
+        self._rows = np.zeros(chunk, _tables[table])
+        self._n = 0
+        self._batches = 0
+        self._total = 0
+        self._arrow = None
+
+    @property
+    def rows(self) -> int:
+        ''' rows written and pending '''
+        return self._total + self._n
+
+    def row(self) -> np.void:
+        ''' the next row to fill in, the batch goes out when full '''
+        if self._n == len(self._rows):
+            self.flush()
+        self._n += 1
+        return self._rows[self._n - 1]
+
+    def _clear(self) -> None:
+        ''' remove an earlier export's batches of this table, in either
+            format, which read_table would otherwise read as this one's
+        '''
+        name = f'{self._prefix.name}-{self._table}'
+        self._prefix.parent.mkdir(parents=True, exist_ok=True)
+        for path in self._prefix.parent.glob(f'{name}-[0-9]*.*.npy'):
+            path.unlink()
+        self._prefix.with_name(f'{name}.arrow').unlink(missing_ok=True)
+
+    def flush(self) -> None:
+        if not self._n:
+            return
+        if not self._batches:
+            self._clear()
+        rows = self._rows[:self._n]
+        name = f'{self._prefix.name}-{self._table}'
+        if self._fmt == 'npy':
+            path = self._prefix.with_name(f'{name}-{self._batches:05d}')
+            for column in rows.dtype.names:
+                np.save(path.with_name(f'{path.name}.{column}.npy'),
+                        rows[column])
+        else:
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(rows[c]) for c in rows.dtype.names],
+                names=list(rows.dtype.names))
+            if self._arrow is None:
+                self._arrow = pa.ipc.new_file(
+                    str(self._prefix.with_name(f'{name}.arrow')),
+                    batch.schema)
+            self._arrow.write_batch(batch)
+        self._batches += 1
+        self._total += self._n
+        self._n = 0
+
+    def close(self) -> None:
+        self.flush()
+        if not self._batches:
+            self._clear()  # an empty export reads back empty
+        if self._arrow is not None:
+            self._arrow.close()
+            self._arrow = None
+
+
+class Exporter():
+    ''' the games and moves tables of one export
+    '''
+    def __init__(self, prefix: pl.Path, chunk: int=65536, fmt: str='npy'):
+        self._games = TableWriter(prefix, 'games', chunk, fmt)
+        self._moves = TableWriter(prefix, 'moves', chunk, fmt)
+
+    @property
+    def games(self) -> int:
+        return self._games.rows
+
+    @property
+    def moves(self) -> int:
+        return self._moves.rows
+
+    def add_game(self, game: GL.Game, nodes: int=0) -> None:
+        ''' a games row and a moves row per move, replayed by the
+            solver rules of the game's layout to count the cards turned
+            up
+        '''
+        number = self._games.rows
+        g = self._games.row()
+        g['game'] = number
+        g['deal'] = game.deal
+        g['policy'] = game.policy.encode()[:16]
+        g['won'] = game.won
+        g['moves'] = len(game.moves)
+        g['seconds'] = game.seconds
+        g['nodes'] = nodes
+        with L.using(game.layout):
+            state = SV.deal_state(game.deal)
+            for index, cmd in enumerate(game.moves):
+                m = self._moves.row()
+                m['game'] = number
+                m['index'] = index
+                m['act'] = cmd.cmd
+                args = list(cmd.cargs) + [-1, -1]
+                m['src'], m['dst'] = args[0], args[1]
+                move = (cmd.cmd, tuple(cmd.cargs))
+                if state is None or move[0] not in psc.MOVE_ACTS \
+                        or not SV.is_legal(state, move):
+                    state = None
+                    m['flipped'] = -1
+                    continue
+                hidden = sum(len(h) for h, s in state[0])
+                state = SV.apply_move(state, move)
+                m['flipped'] = hidden - sum(len(h) for h, s in state[0])
+
+    def close(self) -> None:
+        self._games.close()
+        self._moves.close()
+
+    def __enter__(self) -> 'Exporter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_table(prefix: pl.Path, table: str) \
+        -> ty.Iterator[ty.Dict[str, np.ndarray]]:
+    ''' the columns of each batch in order, memory mapped, not read
+    '''
+    prefix = pl.Path(prefix)
+    name = f'{prefix.name}-{table}'
+    path = prefix.with_name(f'{name}.arrow')
+    if path.exists():
+        reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            # as the table's dtypes, so both formats read the same
+            yield {c: np.asarray(batch.column(c).to_numpy(
+                       zero_copy_only=False), _tables[table][c])
+                   for c in batch.schema.names}
+        return
+    batches = sorted({p.name.split('.')[0] for p in
+                      prefix.parent.glob(f'{name}-[0-9]*.*.npy')})
+    for batch in batches:
+        yield {c: np.load(prefix.parent / f'{batch}.{c}.npy', mmap_mode='r')
+               for c in _tables[table].names}
+
+
+def _solved_game(deal: int, max_nodes: int) -> ty.Tuple[GL.Game, int]:
+    start = time.perf_counter()
+    result = SV.solve(SV.deal_state(deal), max_nodes=max_nodes)
+    return GL.Game(deal, 'solver', result.moves,
+                   result.status == SV.SolveStatus.SOLVED,
+                   time.perf_counter() - start), result.nodes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export games and moves '
+                                     'as columns')
+    parser.add_argument('paths',
+                        type=pl.Path,
+                        nargs='*',
+                        help='game logs, default: solve --deals deals')
+    parser.add_argument('--out', '-o',
+                        type=pl.Path,
+                        default=pl.Path('data/export'),
+                        help='output prefix default: %(default)s')
+    parser.add_argument('--format',
+                        choices=formats(),
+                        default='npy',
+                        help='batch format default: %(default)s')
+    parser.add_argument('--chunk', '-c',
+                        type=int,
+                        default=65536,
+                        help='rows per batch default: %(default)s')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=20,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=20000,
+                        help='solver node limit default: %(default)s')
+    args = parser.parse_args()
+    if args.paths:
+        games = ((g, 0) for p in args.paths for g in GL.read_path(p))
+    else:
+        games = (_solved_game(d, args.max_nodes)
+                 for d in range(args.first, args.first + args.deals))
+    start = time.perf_counter()
+    with Exporter(args.out, args.chunk, args.format) as out:
+        for game, nodes in games:
+            out.add_game(game, nodes)
+    print(f'{out.games} games, {out.moves} moves in '
+          f'{time.perf_counter() - start:.1f}s', file=sys.stderr)
+    # a scan only touches the columns it reads
+    start = time.perf_counter()
+    won = moves = flipped = 0
+    for batch in read_table(args.out, 'games'):
+        won += int(batch['won'].sum())
+    for batch in read_table(args.out, 'moves'):
+        moves += len(batch['act'])
+        flipped += int(batch['flipped'].clip(0).sum())
+    print(f'scan: {won} won, {moves} moves, {flipped} cards turned up in '
+          f'{time.perf_counter() - start:.3f}s', file=sys.stderr)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Training data for move ranking models, needs numpy.
+    Games, from game logs or solved live, are replayed through the
+    solver rules and every position becomes one row of fixed shape:
+        cols   (7, 19) int8  card id + 1 per column from the bottom,
+                             0 past the end, HIDDEN for a face down card
+                             unless reveal is set
+        down   (7,)    int8  face down cards per column
+        found  (4,)    int8  foundation top value per suit
+        waste  (24,)   int8  waste card id + 1 from the bottom, top last
+        stock  ()      int8  cards in the stock
+        mask   (960,)  bool  the legal moves, see move_index
+        move   ()      int16 move_index of the move played
+        deal, step, won      where the row came from
+    Rows are gathered in preallocated chunk arrays and each full chunk
+    is written as one shard, <prefix>-00000.npz, ... or one .npy per
+    array, so memory is bounded by the chunk size not the dataset.
+    The shapes are klondike's, games of other layouts are skipped.
+'''
+
+import argparse
+import pathlib as pl
+import sys
+import typing as ty
+
+import numpy as np
+
+import cards as C
+import game_log as GL
+import parse_sol_cmds as psc
+import solver as SV
+import tableau as T
+
+HIDDEN = len(C.all_cards()) + 1
+
+_ncols = T.Tableau.cols()
+_max_down = _ncols - 1
+_max_col = _max_down + C.king
+_max_waste = len(C.all_cards()) - _ncols * (_ncols + 1) // 2
+# a move is (act, first column, second column), NONE for no column
+NONE = _ncols
+_slots = _ncols + 1
+MOVES = len(psc.SolActs) * _slots * _slots
+
+_fields = {
+    'cols': ((_ncols, _max_col), np.int8),
+    'down': ((_ncols,), np.int8),
+    'found': ((len(C.Suits),), np.int8),
+    'waste': ((_max_waste,), np.int8),
+    'stock': ((), np.int8),
+    'mask': ((MOVES,), np.bool_),
+    'move': ((), np.int16),
+    'deal': ((), np.int64),
+    'step': ((), np.int16),
+    'won': ((), np.bool_),
+}
+
+# every move the engine knows, for the mask
+_all_moves = [(psc.SolActs.STOCK_TO_WASTE, ()),
+              (psc.SolActs.WASTE_FOUNDATION, ())] \
+    + [(psc.SolActs.WASTE_TO_TABLEAU, (x,)) for x in range(_ncols)] \
+    + [(psc.SolActs.TABLEAU_TO_FOUNDATION, (x,)) for x in range(_ncols)] \
+    + [(psc.SolActs.TABLEAU_TO_TABLEAU, (x, y))
+       for x in range(_ncols) for y in range(_ncols) if x != y]
+
+
+def move_index(move: SV.Move) -> int:
+    ''' the mask index of move, unused columns are NONE
+    '''
+    act, cargs = move
+    first = cargs[0] if len(cargs) > 0 else NONE
+    second = cargs[1] if len(cargs) > 1 else NONE
+    return (int(act) * _slots + first) * _slots + second
+
+
+def index_move(index: int) -> SV.Move:
+    ''' the inverse of move_index '''
+    rest, second = divmod(index, _slots)
+    act, first = divmod(rest, _slots)
+    return psc.SolActs(act), tuple(c for c in (first, second) if c != NONE)
+
+
+_all_indexes = [move_index(m) for m in _all_moves]
+
+
+def encode(state: SV.State, row: ty.Dict[str, np.ndarray], i: int,
+           reveal: bool=False) -> None:
+    ''' write state's board and legal mask into row i of the arrays
+    '''
+    cols, found, stock, waste = state
+    grid = row['cols'][i]
+    grid.fill(0)
+    for x, (hidden, shown) in enumerate(cols):
+        column = [c + 1 for c in hidden] if reveal \
+            else [HIDDEN] * len(hidden)
+        column += [c + 1 for c in shown]
+        grid[x, :len(column)] = column
+        row['down'][i, x] = len(hidden)
+    row['found'][i] = found
+    row['waste'][i].fill(0)
+    row['waste'][i, :len(waste)] = [c + 1 for c in waste]
+    row['stock'][i] = len(stock)
+    mask = row['mask'][i]
+    mask.fill(False)
+    for move, index in zip(_all_moves, _all_indexes):
+        if SV.is_legal(state, move):
+            mask[index] = True
+
+
+class ShardWriter():
+    ''' rows in, a shard file out every chunk rows
+    '''
+    def __init__(self, prefix: pl.Path, chunk: int=16384,
+                 fmt: str='npz', compress: bool=True):
+        '''
+        Args:
+            prefix: shard paths are <prefix>-<n>.npz or
+                <prefix>-<n>.<field>.npy
+            chunk: rows per shard
+            fmt: npz or npy
+        '''
+        assert fmt in ('npz', 'npy'), f'unknown format {fmt}'
+        self._prefix = pl.Path(prefix)
+        self._chunk = chunk
+        self._fmt = fmt
+        self._compress = compress
+        self._arrays = {name: np.zeros((chunk,) + shape, dtype)
+                        for name, (shape, dtype) in _fields.items()}
+        self._rows = 0
+        self._shards = []
+        self._total = 0
+
+    @property
+    def shards(self) -> ty.List[pl.Path]:
+        return self._shards
+
+    @property
+    def rows(self) -> int:
+        ''' rows written and pending '''
+        return self._total + self._rows
+
+    def add_game(self, game: GL.Game, reveal: bool=False) -> int:
+        ''' one row per move of game, a game that stops replaying is
+            cut at the bad move and one not on klondike adds none
+        Returns:
+            the rows added
+        '''
+        if game.layout != 'klondike':
+            return 0
+        state = SV.deal_state(game.deal)
+        added = 0
+        for step, cmd in enumerate(game.moves):
+            move = (cmd.cmd, tuple(cmd.cargs))
+            if move[0] not in psc.MOVE_ACTS or not SV.is_legal(state, move):
+                break
+            i = self._rows
+            encode(state, self._arrays, i, reveal)
+            self._arrays['move'][i] = move_index(move)
+            self._arrays['deal'][i] = game.deal
+            self._arrays['step'][i] = step
+            self._arrays['won'][i] = game.won
+            self._rows += 1
+            added += 1
+            if self._rows == self._chunk:
+                self.flush()
+            state = SV.apply_move(state, move)
+        return added
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        n = len(self._shards)
+        arrays = {name: a[:self._rows] for name, a in self._arrays.items()}
+        self._prefix.parent.mkdir(parents=True, exist_ok=True)
+        if self._fmt == 'npz':
+            path = self._prefix.with_name(f'{self._prefix.name}-{n:05d}.npz')
+            save = np.savez_compressed if self._compress else np.savez
+            save(path, **arrays)
+        else:
+            path = self._prefix.with_name(f'{self._prefix.name}-{n:05d}')
+            for name, a in arrays.items():
+                np.save(path.with_name(f'{path.name}.{name}.npy'), a)
+        self._shards.append(path)
+        self._total += self._rows
+        self._rows = 0
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> 'ShardWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_shards(prefix: pl.Path) -> ty.Iterator[ty.Dict[str, np.ndarray]]:
+    ''' the arrays of each shard in order, one shard in memory at a time
+    '''
+    prefix = pl.Path(prefix)
+    for path in sorted(prefix.parent.glob(f'{prefix.name}-[0-9]*.npz')):
+        with np.load(path) as data:
+            yield {name: data[name] for name in data.files}
+    shards = sorted({p.name.split('.')[0] for p in
+                     prefix.parent.glob(f'{prefix.name}-[0-9]*.*.npy')})
+    for shard in shards:
+        yield {name: np.load(prefix.parent / f'{shard}.{name}.npy')
+               for name in _fields}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export training data')
+    parser.add_argument('paths',
+                        type=pl.Path,
+                        nargs='*',
+                        help='game logs, default: solve --deals deals')
+    parser.add_argument('--out', '-o',
+                        type=pl.Path,
+                        default=pl.Path('data/games'),
+                        help='shard prefix default: %(default)s')
+    parser.add_argument('--format',
+                        choices=['npz', 'npy'],
+                        default='npz',
+                        help='shard format default: %(default)s')
+    parser.add_argument('--chunk', '-c',
+                        type=int,
+                        default=16384,
+                        help='rows per shard default: %(default)s')
+    parser.add_argument('--reveal', '-r',
+                        action='store_true',
+                        help='encode face down cards, not HIDDEN')
+    parser.add_argument('--won', '-W',
+                        action='store_true',
+                        help='only won games')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=20,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=20000,
+                        help='solver node limit default: %(default)s')
+    args = parser.parse_args()
+    if args.paths:
+        games = (g for p in args.paths for g in GL.read_path(p))
+    else:
+        games = (GL.solver_game(d, args.max_nodes)
+                 for d in range(args.first, args.first + args.deals))
+    ngames = 0
+    skipped = 0
+    with ShardWriter(args.out, args.chunk, args.format) as writer:
+        for game in games:
+            if args.won and not game.won:
+                continue
+            if game.layout != 'klondike':
+                skipped += 1
+                continue
+            writer.add_game(game, args.reveal)
+            ngames += 1
+    print(f'{ngames} games, {writer.rows} rows, {len(writer.shards)} shards',
+          file=sys.stderr)
+    if skipped:
+        print(f'{skipped} games not on klondike skipped', file=sys.stderr)
+    for path in writer.shards:
+        print(path)
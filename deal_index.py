@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Offline deal difficulty index.
+    Each deal number is scored once by the solver and by how deep its
+    aces and kings are buried, the solved deals are split into
+    easy/medium/hard buckets by score and written to a small binary
+    file. Picking a deal of a difficulty is then a random index into
+    the bucket's array.
+    The moves a score counts are the best first line after shorten has
+    cut what it can, a length to win in, not the shortest one.
+    File layout, little endian:
+        b'SDIX', uint32 bucket count, uint32 deals per bucket,
+        then per bucket the deal numbers (uint32) easiest first.
+'''
+
+import argparse
+import array
+import concurrent.futures as cf
+import itertools as it
+import math
+import os
+import pathlib as pl
+import random
+import struct
+import sys
+import typing as ty
+
+import cards as C
+import shorten as SH
+import solve_cache as SC
+import solver as SV
+
+BUCKETS = ('easy', 'medium', 'hard')
+
+_MAGIC = b'SDIX'
+
+
+class DealScore():
+    __slots__ = ('_deal', '_status', '_moves', '_nodes', '_burial')
+
+    def __init__(self, deal: int, status: SV.SolveStatus, moves: int,
+                 nodes: int, burial: int):
+        self._deal = deal
+        self._status = status
+        self._moves = moves
+        self._nodes = nodes
+        self._burial = burial
+
+    @property
+    def deal(self) -> int:
+        return self._deal
+
+    @property
+    def solved(self) -> bool:
+        return self._status == SV.SolveStatus.SOLVED
+
+    @property
+    def status(self) -> SV.SolveStatus:
+        return self._status
+
+    @property
+    def moves(self) -> int:
+        return self._moves
+
+    @property
+    def nodes(self) -> int:
+        return self._nodes
+
+    @property
+    def burial(self) -> int:
+        return self._burial
+
+    @property
+    def difficulty(self) -> float:
+        ''' bigger is harder: search effort, line length, burial
+        '''
+        return (4 * math.log2(1 + self._nodes) + self._moves / 8
+                + self._burial / 2)
+
+    def __str__(self) -> str:
+        return f'{self._deal}: {self._status.name} moves:{self._moves} ' \
+               f'nodes:{self._nodes} burial:{self._burial} ' \
+               f'difficulty:{self.difficulty:.1f}'
+
+
+def burial(state: SV.State) -> int:
+    ''' the cards on top of each hidden ace and king, summed
+    '''
+    depth = 0
+    for hidden, shown in state[0]:
+        for i, cid in enumerate(hidden):
+            if SV._value[cid] in (C.ace, C.king):
+                depth += len(hidden) - 1 - i + len(shown)
+    return depth
+
+
+def score_deal(deal: int, max_nodes: int=20000,
+               cache: pl.Path | None=None) -> DealScore:
+    start = SV.deal_state(deal)
+    result = SC.solve(start, 'best', cache, max_nodes=max_nodes)
+    moves = result.moves
+    if result.status == SV.SolveStatus.SOLVED:
+        moves = SH.shorten(start, moves)
+    return DealScore(deal, result.status, len(moves), result.nodes,
+                     burial(start))
+
+
+def score_deals(deals: ty.Iterable[int], max_nodes: int=20000,
+                workers: int | None=None, cache: pl.Path | None=None) \
+        -> ty.Iterator[DealScore]:
+    ''' score deals over a process pool, in deal order
+    '''
+    with cf.ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(score_deal, deals, it.repeat(max_nodes),
+                            it.repeat(cache), chunksize=8)
+
+
+def bucket_deals(scores: ty.Iterable[DealScore]) -> ty.List[ty.List[int]]:
+    ''' the solved deals by difficulty, split into equal BUCKETS
+    '''
+    solved = sorted((s for s in scores if s.solved),
+                    key=lambda s: (s.difficulty, s.deal))
+    n = len(BUCKETS)
+    return [[s.deal for s in solved[b * len(solved) // n:
+                                    (b + 1) * len(solved) // n]]
+            for b in range(n)]
+
+
+def write_index(path: pl.Path, buckets: ty.List[ty.List[int]]) -> None:
+    with open(path, 'wb') as fd:
+        fd.write(_MAGIC)
+        fd.write(struct.pack(f'<I{len(buckets)}I', len(buckets),
+                             *[len(b) for b in buckets]))
+        for deals in buckets:
+            a = array.array('I', deals)
+            if sys.byteorder != 'little':
+                a.byteswap()
+            fd.write(a.tobytes())
+
+
+class DealIndex():
+    ''' a loaded index, pick() is O(1)
+    '''
+    def __init__(self, path: pl.Path):
+        '''
+        Raises:
+            OSError: path can not be read
+            ValueError: path is not a whole deal index
+        '''
+        data = pl.Path(path).read_bytes()
+        if data[:4] != _MAGIC or len(data) < 8:
+            raise ValueError(f'not a deal index: {path}')
+        (nbuckets,) = struct.unpack_from('<I', data, 4)
+        if nbuckets != len(BUCKETS):
+            raise ValueError(f'{path}: {nbuckets} buckets, '
+                             f'expected {len(BUCKETS)}')
+        pos = 8 + 4 * nbuckets
+        if len(data) < pos:
+            raise ValueError(f'{path}: cut short in the header')
+        counts = struct.unpack_from(f'<{nbuckets}I', data, 8)
+        if len(data) != pos + 4 * sum(counts):
+            raise ValueError(f'{path}: {len(data)} bytes, the header says '
+                             f'{pos + 4 * sum(counts)}')
+        self._buckets = {}
+        for name, count in zip(BUCKETS, counts):
+            a = array.array('I')
+            a.frombytes(data[pos:pos + 4 * count])
+            if sys.byteorder != 'little':
+                a.byteswap()
+            self._buckets[name] = a
+            pos += 4 * count
+
+    def count(self, bucket: str) -> int:
+        return len(self._buckets[bucket])
+
+    def pick(self, bucket: str, rng: random.Random=random) -> int | None:
+        ''' a random deal number of the bucket's difficulty
+        '''
+        deals = self._buckets[bucket]
+        if not deals:
+            return None
+        return deals[rng.randrange(len(deals))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a deal index')
+    parser.add_argument('--out', '-o',
+                        type=pl.Path,
+                        default=pl.Path('deals.idx'),
+                        help='index file default: %(default)s')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=0,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=1000,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=20000,
+                        help='solver node limit default: %(default)s')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='pool size default: %(default)s')
+    parser.add_argument('--cache', '-c',
+                        type=pl.Path,
+                        default=None,
+                        help='a solve_cache.py file to reuse solves from')
+    parser.add_argument('--verbose', '-v',
+                        action='store_true',
+                        help='print each deal score')
+    args = parser.parse_args()
+    scores = []
+    for s in score_deals(range(args.first, args.first + args.deals),
+                         args.max_nodes, args.workers, args.cache):
+        if args.verbose:
+            print(s)
+        scores.append(s)
+    buckets = bucket_deals(scores)
+    write_index(args.out, buckets)
+    index = DealIndex(args.out)
+    print(f'{args.out}: {len(scores)} deals, '
+          + ', '.join(f'{b}:{index.count(b)}' for b in BUCKETS))
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' A background pool of deals the solver has proven winnable.
+    A refill thread keeps a process pool solving random deal numbers
+    and queues the winnable ones up to a bound, so new_deal can take
+    one without waiting. Only when the queue is empty does get()
+    solve deals inline.
+'''
+
+import argparse
+import atexit
+import collections
+import concurrent.futures as cf
+import multiprocessing as mp
+import pathlib as pl
+import queue
+import random
+import threading
+import time
+import typing as ty
+
+import solve_cache as SC
+import solver as SV
+
+
+def is_winnable(deal: int, max_nodes: int,
+                cache: pl.Path | None=None) -> ty.Tuple[int, bool]:
+    result = SC.solve(SV.deal_state(deal), 'best', cache,
+                      max_nodes=max_nodes)
+    return deal, result.status == SV.SolveStatus.SOLVED
+
+
+class WinnablePool():
+    ''' a bounded queue of winnable deal numbers, refilled as it drains
+    '''
+    def __init__(self,
+                 size: int=8,
+                 workers: int=2,
+                 max_nodes: int=20000,
+                 deal_range: int=1_000_000,
+                 seed: int | None=None,
+                 cache: pl.Path | None=None):
+        '''
+        Args:
+            size: the most deals kept ready
+            workers: solver processes
+            max_nodes: solver node limit, deals that need more are skipped
+            deal_range: deals are drawn from [0, deal_range)
+            cache: a solve_cache file, see SC.solve
+        '''
+        self._size = size
+        self._workers = workers
+        self._max_nodes = max_nodes
+        self._deal_range = deal_range
+        self._cache = cache
+        self._rng = random.Random(seed)
+        self._inline_rng = random.Random(None if seed is None else ~seed)
+        self._deals = queue.Queue(maxsize=size)
+        self._found_times = collections.deque(maxlen=32)
+        self._tried = 0
+        self._found = 0
+        self._inline = 0
+        self._stop = threading.Event()
+        # the pool grows from the refill thread while the game has
+        # threads and a cache connection open, so its workers are not
+        # forked from the game
+        self._pool = cf.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context(
+                'forkserver' if 'forkserver' in mp.get_all_start_methods()
+                else 'spawn'))
+        self._thread = threading.Thread(target=self._refill,
+                                        name='deal-pool',
+                                        daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def depth(self) -> int:
+        ''' deals ready now '''
+        return self._deals.qsize()
+
+    @property
+    def refill_rate(self) -> float:
+        ''' winnable deals found per second, over the recent finds '''
+        times = list(self._found_times)
+        if len(times) < 2:
+            return 0.0
+        return (len(times) - 1) / max(1e-9, times[-1] - times[0])
+
+    @property
+    def tried(self) -> int:
+        return self._tried
+
+    @property
+    def found(self) -> int:
+        return self._found
+
+    @property
+    def inline(self) -> int:
+        ''' deals get() had to solve itself '''
+        return self._inline
+
+    def get(self, inline: bool=True) -> int | None:
+        ''' a winnable deal number, from the queue if one is ready.
+        Args:
+            inline: if the queue is empty solve random deals here until
+                one is winnable, otherwise return None
+        '''
+        try:
+            return self._deals.get_nowait()
+        except queue.Empty:
+            pass
+        if not inline:
+            return None
+        while True:
+            self._inline += 1
+            deal, ok = is_winnable(self._inline_rng.randrange(
+                self._deal_range), self._max_nodes, self._cache)
+            if ok:
+                return deal
+
+    def _refill(self) -> None:
+        pending = set()
+        while not self._stop.is_set():
+            while (len(pending) < self._workers
+                   and self._deals.qsize() + len(pending) < self._size):
+                try:
+                    pending.add(self._pool.submit(
+                        is_winnable, self._rng.randrange(self._deal_range),
+                        self._max_nodes, self._cache))
+                except RuntimeError:
+                    return  # the pool was shut down at exit
+            if not pending:
+                # full, wait for get() to make room
+                self._stop.wait(0.05)
+                continue
+            done, pending = cf.wait(pending, timeout=0.1,
+                                    return_when=cf.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    deal, ok = future.result()
+                except (cf.CancelledError, cf.process.BrokenProcessPool):
+                    return
+                self._tried += 1
+                if not ok:
+                    continue
+                try:
+                    self._deals.put_nowait(deal)
+                except queue.Full:
+                    continue
+                self._found += 1
+                self._found_times.append(time.monotonic())
+
+    def close(self) -> None:
+        if self._stop.is_set():
+            return None
+        self._stop.set()
+        self._thread.join()
+        # workers still starting need the pool alive to unpickle their
+        # locks; a running search is bounded by max_nodes
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        atexit.unregister(self.close)
+        return None
+
+    def __str__(self) -> str:
+        return f'depth:{self.depth}/{self._size} found:{self._found}/' \
+               f'{self._tried} rate:{self.refill_rate:.2f}/s ' \
+               f'inline:{self._inline}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Test the winnable pool')
+    parser.add_argument('--size', '-s',
+                        type=int,
+                        default=8,
+                        help='pool size default: %(default)s')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=2,
+                        help='solver processes default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=20000,
+                        help='solver node limit default: %(default)s')
+    parser.add_argument('--take', '-t',
+                        type=int,
+                        default=12,
+                        help='deals to take default: %(default)s')
+    parser.add_argument('--interval', '-i',
+                        type=float,
+                        default=0.5,
+                        help='seconds between takes default: %(default)s')
+    args = parser.parse_args()
+    pool = WinnablePool(args.size, args.workers, args.max_nodes, seed=1)
+    for i in range(args.take):
+        time.sleep(args.interval)
+        start = time.perf_counter()
+        deal = pool.get()
+        ms = (time.perf_counter() - start) * 1000
+        print(f'deal {deal} in {ms:.1f}ms {pool}')
+    pool.close()
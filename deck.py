@@ -9,15 +9,14 @@ import sys
 import typing as ty
 
 import cards as C
+import layout as L
 
 
 class Deck():
-    _unshuffled_deck = [C.Card(card, suit)
-                          for card in range(*C.card_range())
-                            for suit in C.Suits ]
-
+    ''' the cards of the current layout, L.current().deck()
+    '''
     def random_shuffle() -> ty.Iterable[C.Card]:
-        d = list(Deck._unshuffled_deck)
+        d = L.current().deck()
         random.shuffle(d)
         yield from d
 
@@ -41,6 +40,17 @@ class Deck():
         return f'{str(len(self._deck))}: {cardsstr}'
         
 
+def numbered_shuffle(deal: int) -> ty.Callable[[], ty.Iterable[C.Card]]:
+    ''' a genit for Deck where deal number n always gives the same cards,
+        the same ones as random.seed(n) followed by Deck()
+    '''
+    def shuffle() -> ty.Iterable[C.Card]:
+        d = L.current().deck()
+        random.Random(deal).shuffle(d)
+        yield from d
+    return shuffle
+
+
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser(description='Test deck')
@@ -54,7 +64,7 @@ if __name__ == '__main__':
     deck = Deck()
 
     print(f'deck({args.seed}: {deck}')
-    cols = list(range(1, 8))
+    cols = list(range(1, L.current().cols + 1))
     cols.append(0)
     for col in cols:
         column = deck.deal_cards(col)
@@ -10,22 +10,40 @@ import typing as ty
 
 import cards as C
 import deck as D
+import layout as L
 import parse_sol_cmds as psc
 
+_nsuits = len(C.Suits)
 
-class Foundation():                                                                                                                                                                                           
-    ''' class represents the four stacks that we are trying to fill to win
-        each stack is a single suit that has to be in the A to K order.
+
+class Foundation():
+    ''' class represents the stacks that we are trying to fill to win,
+        four per deck of the layout. Each stack is a single suit that
+        has to be in the A to K order, stack i holds suit
+        i % len(C.Suits).
     '''
-    def __init__(self):                                                         
-        self._stacks = {C.Suits.SPADE:[],
-                        C.Suits.HEART:[],
-                        C.Suits.DIAMOND:[],
-                        C.Suits.CLUB:[]
-                       }
-                                                                                
-    def stack(self, s: C.Suits) -> ty.List[C.Card]:
-        return self._stacks[s]
+    __slots__ = ('_stacks',)
+
+    def __init__(self, stacks: int | None=None):
+        '''
+        Args:
+            stacks: the number of stacks, default the layout's
+        '''
+        if stacks is None:
+            stacks = L.current().foundations
+        self._stacks = [[] for i in range(stacks)]
+
+    def stack(self, s: C.Suits, k: int=0) -> ty.List[C.Card]:
+        ''' the k-th stack of suit s '''
+        return self._stacks[k * _nsuits + s - C.min_suit()]
+
+    def stacks(self) -> ty.List[ty.List[C.Card]]:
+        ''' every stack in stack order '''
+        return self._stacks
+
+    def tops(self) -> ty.Tuple[int, ...]:
+        ''' the top value of each stack, 0 for empty '''
+        return tuple(len(stack) for stack in self._stacks)
 
     def add_card(self, card: C.Card) -> bool:                                                    
         '''
@@ -39,38 +57,38 @@ class Foundation():
             the new card and the opposite color
         '''                                       
         print(f'f.ad-new: {card}')
-        stack = self._stacks[card.suit] # get suit stack
-        print(f'f.ad-new to: {stack}')
-        if not stack:
-            # if the foundation stack is empty we can only add an Ace
-            print(f'f.ad-new: {card.value} =? {C.ace}')
-            if card.value == C.ace:
-                print(f'f.ad-new found: {C.ace}')
+        # the first stack of the suit it fits, see layout
+        for stack in self._stacks[card.suit - C.min_suit()::_nsuits]:
+            print(f'f.ad-new to: {stack}')
+            if not stack:
+                # if the foundation stack is empty we can only add an Ace
+                print(f'f.ad-new: {card.value} =? {C.ace}')
+                if card.value == C.ace:
+                    print(f'f.ad-new found: {C.ace}')
+                    stack.append(card)
+                    return True
+                print(f'f.ad-new NOT found: {C.ace}')
+                continue
+            # stack not empty, so the rule is that the bottom if the stack
+            # is one less then new card
+            print(f'f.ac-old{C.cards_to_str(stack)} ?= {card}')
+            if (card.value - stack[-1].value) == 1:
                 stack.append(card)
+                print(f'f.ac-new-stack{C.cards_to_str(stack)}')
                 return True
-            else:
-                print(f'f.ad-new NOT found: {C.ace}')
-                return False
-        # stack not empty, so the rule is that the bottom if the stack is
-        # one less then new card
-        print(f'f.ac-old{C.cards_to_str(stack)} ?= {card}')
-        if (card.value - stack[-1].value) == 1:
-            stack.append(card)
-            print(f'f.ac-new-stack{C.cards_to_str(stack)}')
-            return True
         return False
                                                                                 
-    def top_card_str(self, suit: C.Suits) -> str:
+    def top_card_str(self, suit: C.Suits, k: int=0) -> str:
         ''' get the string for current top card by suit from its stack
         Returns:
             the top card title of a foundation pile. If the pile               
             is empty, return the symbol for the suit.
         '''
         #print(f'f.tcs: {suit}')
-        stack = self._stacks[suit]                                    
+        stack = self.stack(suit, k)
         if not stack:
             return C.Card.symbol(suit)
-        return str(self._stacks[suit][-1])
+        return str(stack[-1])
                                                                                 
     def game_won(self) -> bool:                                                          
         ''' solitaire rule for game won, i.e. all four stacks are full.
@@ -78,16 +96,17 @@ class Foundation():
             True iff the game is won, i.e., when all stacks being full!
         '''
         #print(f'check game won')
-        if any(not s for s in self._stacks.values()):
+        if any(not s for s in self._stacks):
             return False
         # return true iff all stacks have a king as the top card.
-        b_all = all(s[-1].value == C.king for s in self._stacks.values())
+        b_all = all(s[-1].value == C.king for s in self._stacks)
         return b_all
 
 def print_foundation(f: Foundation) -> None:
-    for s in C.Suits:
-        stack = f.stack(s)
-        print(f'F:{C.Card.symbol(s)}: {C.cards_to_str(stack)}')
+    for k in range(len(f.stacks()) // _nsuits):
+        for s in C.Suits:
+            stack = f.stack(s, k)
+            print(f'F:{C.Card.symbol(s)}: {C.cards_to_str(stack)}')
 
 
 if __name__ == '__main__':
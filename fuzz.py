@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Rules fuzzer.
+    Command text, some of it the moves the solver would make, some of
+    it moves aimed at empty columns and an empty waste, some of it
+    junk, goes through parse_cmd/parse_sol_cmds and the game's own
+    command handlers, solitaire._cmd_table, with stdout sent to
+    /dev/null. The solver State is played alongside as
+    the model. After every move:
+      - the engine must accept exactly the moves SV.is_legal accepts
+      - the layout's cards are all on the table, each as many times
+        as there are decks
+      - each foundation stack is its suit from the ace up
+      - each tableau column shows a run of alternating colors, and
+        shows a card whenever it has hidden cards
+    only checking what the move touched, and every compare_every moves
+    all of it is checked and the engine must equal the model.
+    With --fast most commands are moves handed to the handlers already
+    parsed and only the every compare_every moves check is made; a
+    --text share of command lines keeps the parser covered.
+    A failing game is shrunk by removing commands while it still fails
+    the same way, so the reproducer is a deal and a few command lines.
+'''
+
+import argparse
+import collections
+import concurrent.futures as cf
+import contextlib
+import functools
+import itertools as it
+import os
+import random
+import sys
+import time
+import traceback
+import typing as ty
+
+import cards as C
+import layout as L
+import parse_sol_cmds as psc
+import solitaire as S
+import solver as SV
+import tableau as T
+
+_suits = list(C.Suits)
+
+# how many column arguments the engine uses for each move
+_arity = {
+    psc.SolActs.STOCK_TO_WASTE: 0,
+    psc.SolActs.WASTE_FOUNDATION: 0,
+    psc.SolActs.WASTE_TO_TABLEAU: 1,
+    psc.SolActs.TABLEAU_TO_FOUNDATION: 1,
+    psc.SolActs.TABLEAU_TO_TABLEAU: 2,
+}
+
+_acts = list(_arity)
+
+_junk_cmds = 'NnmwtuhsqrxX?'
+# '²' is a digit to str.isdigit but not to int()
+_junk_args = ('0', '1', '4', '7', '8', '9', '10', '-1', 'x', '1.5', '²',
+              '٣', '')
+
+
+class Failure(Exception):
+    ''' a broken rule, kind is one of crash, parse, rules, invariant
+        or model
+    '''
+    def __init__(self, kind: str, detail: str, where: str=''):
+        super().__init__(f'{kind}: {detail}')
+        self.kind = kind
+        self.detail = detail
+        self.where = where
+
+    @property
+    def signature(self) -> ty.Tuple[str, str]:
+        ''' the same for failures of the same bug '''
+        return self.kind, self.where or self.detail
+
+
+def check_invariants(tableau: T.Tableau, foundation, stock_waste,
+                     columns: ty.Iterable[int] | None=None) -> None:
+    ''' raises Failure for the first broken invariant
+    Args:
+        columns: the columns a move touched, only these and the
+            foundation tops are checked and cards are counted rather
+            than matched. None checks everything.
+    '''
+    unflipped = tableau.unflipped
+    flipped = tableau.flipped
+    full = columns is None
+    for x in range(len(flipped)) if full else columns:
+        hidden, shown = unflipped[x], flipped[x]
+        if hidden and not shown:
+            raise Failure('invariant', f'column {x + 1} hides cards but '
+                          f'shows none', 'hidden')
+        for above, below in zip(shown, shown[1:]):
+            if above.red == below.red or above.value != below.value + 1:
+                raise Failure('invariant', f'column {x + 1} run '
+                              f'{above} {below}', 'run')
+    count = len(stock_waste._stock) + len(stock_waste._waste)
+    for i, stack in enumerate(foundation.stacks()):
+        s = _suits[i % len(_suits)]
+        # stacks only grow, so checking the top each move checks them all
+        for v, card in enumerate(stack if full else stack[-1:],
+                                 start=C.ace if full else len(stack)):
+            if card.suit != s or card.value != v:
+                raise Failure('invariant', f'foundation {s.name} has {card}'
+                              f' at {v}', 'foundation')
+        count += len(stack)
+    for x in range(len(flipped)):
+        count += len(unflipped[x]) + len(flipped[x])
+    layout = L.current()
+    if count != layout.cards:
+        raise Failure('invariant', f'{count} cards', 'conservation')
+    if full:
+        cards = collections.Counter(stock_waste._stock)
+        cards.update(stock_waste._waste)
+        for stack in foundation.stacks():
+            cards.update(stack)
+        for x in range(len(flipped)):
+            cards.update(unflipped[x])
+            cards.update(flipped[x])
+        if len(cards) != len(C.all_cards()) \
+                or any(n != layout.decks for n in cards.values()):
+            raise Failure('invariant', f'{len(cards)} different cards',
+                          'conservation')
+
+
+def _where(e: BaseException) -> str:
+    ''' file:line of the innermost frame, to tell crashes apart '''
+    frame = traceback.extract_tb(e.__traceback__)[-1]
+    return f'{os.path.basename(frame.filename)}:{frame.lineno} ' \
+           f'{type(e).__name__}'
+
+
+class Runner():
+    ''' an engine game and its model, step() plays one command line
+    '''
+    __slots__ = ('_game', '_state', '_compare_every', '_moves')
+
+    def __init__(self, deal: int, tableau_class: type=T.ArrayTableau,
+                 compare_every: int=16):
+        self._game = SV.deal_game(deal, tableau_class)
+        self._state = SV.state_from_game(*self._game)
+        self._compare_every = compare_every
+        self._moves = 0
+
+    @property
+    def state(self) -> SV.State:
+        ''' the model '''
+        return self._state
+
+    @property
+    def moves(self) -> int:
+        return self._moves
+
+    def _parse(self, text: str) -> psc.SolCmd | None:
+        try:
+            cmd = psc.parse_sol_cmds(lambda: psc.parse_cmd(text))
+        except psc.InvalidCmd:
+            return None
+        finally:
+            psc._cmd_history.clear()
+        for c in cmd.cargs:
+            if not 0 <= c < T.Tableau.cols():
+                raise Failure('parse', f'{text!r} gave column {c}', 'range')
+        return cmd
+
+    def step(self, text: str) -> None:
+        ''' one command line, parsed, played and its columns checked '''
+        try:
+            cmd = self._parse(text)
+        except Failure:
+            raise
+        except Exception as e:
+            raise Failure('crash', f'{text!r}: {type(e).__name__}: {e}',
+                          _where(e)) from e
+        if cmd is None or cmd.cmd not in _arity:
+            return
+        move = (cmd.cmd, tuple(cmd.cargs[:_arity[cmd.cmd]]))
+        self.play(move, SV.is_legal(self._state, move), text, check=True)
+
+    def play(self, move: SV.Move, legal: bool, text: str | None=None,
+             check: bool=False) -> None:
+        ''' one parsed move through the game's own handler, legal is
+            the model's verdict on it
+        Args:
+            text: the command line move came from, for the report
+            check: check the columns move touched now rather than only
+                every compare_every moves
+        '''
+        try:
+            # the handlers the game loop calls, on this runner's game
+            S._tableau, S._foundation, S._waste = self._game
+            moved = S._cmd_table[move[0]](move[1])
+        except Exception as e:
+            text = text or SV.move_to_cmd(move).cmd_line
+            raise Failure('crash', f'{text!r}: {type(e).__name__}: {e}',
+                          _where(e)) from e
+        self._moves += 1
+        if moved != legal:
+            text = text or SV.move_to_cmd(move).cmd_line
+            raise Failure('rules', f'{text!r} engine:{moved} model:{legal}',
+                          f'{move[0].name}:{moved}')
+        if legal:
+            self._state = SV.apply_move(self._state, move)
+        if check:
+            check_invariants(*self._game, columns=move[1])
+        if self._compare_every and self._moves % self._compare_every == 0:
+            self.compare()
+
+    def compare(self) -> None:
+        ''' every invariant, and the engine must equal the model '''
+        check_invariants(*self._game)
+        if SV.state_from_game(*self._game) != self._state:
+            raise Failure('model', 'engine and model differ', 'state')
+
+
+def random_text(state: SV.State, rng: random.Random) -> str:
+    ''' one command line: a model move, a move aimed at an edge of the
+        rules, or junk
+    '''
+    r = rng.random()
+    if r < 0.6:
+        # sampling with is_legal is cheaper than listing legal_moves
+        cols = state[0]
+        for _ in range(8):
+            act = rng.choice(_acts)
+            move = (act, tuple(rng.randrange(len(cols))
+                               for _ in range(_arity[act])))
+            if SV.is_legal(state, move):
+                return SV.move_to_cmd(move).cmd_line
+        moves = SV.legal_moves(state)
+        if moves:
+            return SV.move_to_cmd(rng.choice(moves)).cmd_line
+    if r < 0.9:
+        cols = state[0]
+        empty = [x for x, (h, s) in enumerate(cols) if not s]
+        col = rng.choice(empty) + 1 if empty and rng.random() < 0.5 \
+            else rng.randint(1, len(cols))
+        return rng.choice(['m', 'w', f'w {col}', f't {col}',
+                           f't {rng.randint(1, len(cols))} {col}',
+                           f't {col} {col}'])
+    args = ' '.join(rng.choice(_junk_args)
+                    for _ in range(rng.randint(0, 3)))
+    return f'{rng.choice(_junk_cmds)} {args}'
+
+
+@functools.lru_cache
+def _moves(cols: int) -> ty.List[ty.List[SV.Move]]:
+    ''' every move of each of _acts on a table of cols columns '''
+    return [[(act, args) for args in it.product(range(cols),
+                                                repeat=_arity[act])]
+            for act in _acts]
+
+
+def random_move(state: SV.State, rng: random.Random) \
+        -> ty.Tuple[SV.Move, bool]:
+    ''' a parsed move and whether the model allows it: mostly legal
+        moves, the rest random ones the engine has to refuse
+    '''
+    rand = rng.random
+    moves = _moves(len(state[0]))
+    for _ in range(8):
+        # an act, then its columns, so the two column moves do not crowd
+        # out the rest
+        acts = moves[int(rand() * len(moves))]
+        move = acts[int(rand() * len(acts))]
+        legal = SV.is_legal(state, move)
+        if legal or rand() < 0.1:
+            return move, legal
+    legal = SV.legal_moves(state)
+    if legal:
+        return legal[int(rand() * len(legal))], True
+    return move, False
+
+
+def replay(deal: int, texts: ty.Sequence[str], tableau_class: type,
+           compare_every: int=1) -> Failure | None:
+    runner = Runner(deal, tableau_class, compare_every)
+    try:
+        for text in texts:
+            runner.step(text)
+        runner.compare()
+    except Failure as f:
+        return f
+    return None
+
+
+def shrink(deal: int, texts: ty.List[str], failure: Failure,
+           tableau_class: type) -> ty.List[str]:
+    ''' the fewest commands found that fail with failure's signature:
+        the shortest of the last 1, 2, 4, ... lines, as the failing one
+        is last, then removes halves, then quarters, ..., then single
+        lines
+    '''
+    def fails(candidate):
+        f = replay(deal, candidate, tableau_class)
+        return f is not None and f.signature == failure.signature
+
+    n = 1
+    while n < len(texts):
+        if fails(texts[-n:]):
+            texts = texts[-n:]
+            break
+        n *= 2
+    chunk = max(1, len(texts) // 2)
+    while True:
+        i = 0
+        while i < len(texts):
+            candidate = texts[:i] + texts[i + chunk:]
+            if fails(candidate):
+                texts = candidate
+            else:
+                i += chunk
+        if chunk == 1:
+            return texts
+        chunk //= 2
+
+
+def fuzz_game(deal: int, nmoves: int, tableau_name: str='array',
+              seed: int=0, compare_every: int=16,
+              layout: str='klondike', fast: bool=False,
+              text: float=0.05) \
+        -> ty.Tuple[int, int, float,
+                    ty.List[ty.Tuple[str, str, ty.List[str]]]]:
+    ''' fuzz one deal until a failure or nmoves commands
+    Args:
+        fast: play parsed moves and check the invariants only every
+            compare_every moves, except for a text share of command
+            lines that still go through the parser and are checked at
+            once
+    Returns:
+        (deal, commands, seconds, [(signature, detail, reproducer)])
+    '''
+    L.use(layout)
+    tableau_class = T.backend(tableau_name)
+    rng = random.Random(seed * 1_000_003 + deal)
+    # command lines, and in fast mode moves
+    texts = []
+    failures = []
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        start = time.perf_counter()
+        runner = Runner(deal, tableau_class, compare_every)
+        try:
+            for _ in range(nmoves):
+                if SV.is_won(runner.state):
+                    break
+                if not fast or rng.random() < text:
+                    line = random_text(runner.state, rng)
+                    texts.append(line)
+                    runner.step(line)
+                else:
+                    move, legal = random_move(runner.state, rng)
+                    texts.append(move)
+                    runner.play(move, legal)
+            runner.compare()
+        except Failure as f:
+            secs = time.perf_counter() - start
+            texts = [t if isinstance(t, str) else SV.move_to_cmd(t).cmd_line
+                     for t in texts]
+            short = shrink(deal, texts, f, tableau_class)
+            failures.append((' '.join(f.signature), f.detail, short))
+        else:
+            secs = time.perf_counter() - start
+    return deal, len(texts), secs, failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fuzz the game rules')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=100,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--moves', '-m',
+                        type=int,
+                        default=2000,
+                        help='commands per deal default: %(default)s')
+    parser.add_argument('--seed', '-s',
+                        type=int,
+                        default=0,
+                        help='command stream seed default: %(default)s')
+    parser.add_argument('--tableau', '-t',
+                        choices=T.backends(),
+                        default='array',
+                        help='tableau backend default: %(default)s')
+    parser.add_argument('--compare_every', '-c',
+                        type=int,
+                        default=16,
+                        help='moves between engine/model compares '
+                             'default: %(default)s')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='pool size default: %(default)s')
+    parser.add_argument('--layout', '-l',
+                        choices=L.layouts(),
+                        default='klondike',
+                        help='table layout default: %(default)s')
+    parser.add_argument('--fast',
+                        action='store_true',
+                        help='play parsed moves, checking everything only '
+                             'every --compare_every moves')
+    parser.add_argument('--text',
+                        type=float,
+                        default=0.05,
+                        help='share of command lines with --fast '
+                             'default: %(default)s')
+    args = parser.parse_args()
+    deals = range(args.first, args.first + args.deals)
+    seen = {}
+    commands = 0
+    secs = 0.0
+    with cf.ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for deal, n, sec, failures in pool.map(
+                fuzz_game, deals, it.repeat(args.moves),
+                it.repeat(args.tableau), it.repeat(args.seed),
+                it.repeat(args.compare_every), it.repeat(args.layout),
+                it.repeat(args.fast), it.repeat(args.text)):
+            commands += n
+            secs += sec
+            for signature, detail, texts in failures:
+                if signature not in seen \
+                        or len(texts) < len(seen[signature][2]):
+                    seen[signature] = (deal, detail, texts)
+    print(f'{len(deals)} deals, {commands} commands, '
+          f'{commands / max(1e-9, secs):.0f} commands/s per worker')
+    for signature, (deal, detail, texts) in sorted(seen.items()):
+        print(f'{signature}\n  {detail}\n  deal {deal}: '
+              + ' ; '.join(texts))
+    sys.exit(1 if seen else 0)
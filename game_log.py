@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Recorded games, one text line per record:
+        game <deal> <policy> [<layout>]
+                                  a game starts, deal is the deal number,
+                                  layout a layout.layouts() name, logs
+                                  without one are klondike
+        move <act> [<arg> ...] [=<checksum>]
+                                  a SolActs value and 0 based columns
+        end <won> <seconds>       won is 0 or 1
+    Lines starting with # are comments. The reader yields one Game at a
+    time so a file of any size is read in bounded memory.
+    The checksum, 8 hex digits, chains the position after each move:
+    crc32 of its snapshot.pack bytes started from the checksum of the
+    move before, 0 at the deal. Replaying up to a move and comparing
+    its checksum checks the whole game so far, see verify.py.
+'''
+
+import argparse
+import pathlib as pl
+import random
+import sys
+import time
+import typing as ty
+import zlib
+
+import layout as L
+import parse_sol_cmds as psc
+import snapshot as SN
+import solver as SV
+
+
+class Game():
+    ''' one recorded game
+    '''
+    __slots__ = ('_deal', '_policy', '_moves', '_won', '_seconds',
+                 '_checksums', '_layout')
+
+    def __init__(self, deal: int, policy: str, moves: ty.List[psc.SolCmd],
+                 won: bool, seconds: float,
+                 checksums: ty.List[int | None] | None=None,
+                 layout: str | None=None):
+        '''
+        Args:
+            layout: the layout.layouts() name the game was dealt in,
+                None is the current one
+        '''
+        self._deal = deal
+        self._policy = policy
+        self._moves = moves
+        self._won = won
+        self._seconds = seconds
+        self._checksums = checksums or [None] * len(moves)
+        self._layout = L.current().name if layout is None else layout
+
+    @property
+    def deal(self) -> int:
+        return self._deal
+
+    @property
+    def policy(self) -> str:
+        return self._policy
+
+    @property
+    def moves(self) -> ty.List[psc.SolCmd]:
+        return self._moves
+
+    @property
+    def won(self) -> bool:
+        return self._won
+
+    @property
+    def seconds(self) -> float:
+        return self._seconds
+
+    @property
+    def checksums(self) -> ty.List[int | None]:
+        ''' per move the chained checksum, None where none was logged '''
+        return self._checksums
+
+    @property
+    def layout(self) -> str:
+        ''' the layout to deal it in, e.g., with L.using '''
+        return self._layout
+
+
+def chain(checksum: int, snapshot: bytes) -> int:
+    ''' the checksum after a move to the snapshot.pack position snapshot
+    '''
+    return zlib.crc32(snapshot, checksum)
+
+
+def checksums(deal: int, moves: ty.List[psc.SolCmd]) \
+        -> ty.List[int | None]:
+    ''' the checksums of moves played on deal by the solver rules, None
+        from a move they would not play, in the current layout
+    '''
+    state = SV.deal_state(deal)
+    checksum = 0
+    sums = []
+    for cmd in moves:
+        move = (cmd.cmd, tuple(cmd.cargs))
+        if move[0] not in psc.MOVE_ACTS or not SV.is_legal(state, move):
+            break
+        state = SV.apply_move(state, move)
+        checksum = chain(checksum, SN.pack_state(state))
+        sums.append(checksum)
+    return sums + [None] * (len(moves) - len(sums))
+
+
+class GameLog():
+    ''' writes games to a file
+    '''
+    def __init__(self, fd: ty.TextIO):
+        self._fd = fd
+        self._start = None
+        self._checksum = 0
+
+    def start(self, deal: int, policy: str='human',
+              layout: str | None=None) -> None:
+        ''' a game of deal, dealt in layout, None is the current one
+        '''
+        if self._start is not None:
+            self.end(False)
+        self._start = time.perf_counter()
+        self._checksum = 0
+        if layout is None:
+            layout = L.current().name
+        self._fd.write(f'game {deal} {policy} {layout}\n')
+
+    def move(self, cmd: psc.SolCmd, snapshot: bytes | None=None) -> None:
+        ''' log cmd, with the checksum chain if given snapshot, the
+            snapshot.pack of the position after it
+        '''
+        checksum = None
+        if snapshot is not None:
+            self._checksum = checksum = chain(self._checksum, snapshot)
+        self._move(cmd, checksum)
+
+    def _move(self, cmd: psc.SolCmd, checksum: int | None) -> None:
+        args = ''.join(f' {a}' for a in cmd.cargs)
+        if checksum is not None:
+            args += f' ={checksum:08x}'
+        self._fd.write(f'move {int(cmd.cmd)}{args}\n')
+
+    def end(self, won: bool, seconds: float | None=None) -> None:
+        ''' end the game started, a no-op when none is
+        '''
+        if self._start is None:
+            return None
+        if seconds is None:
+            seconds = time.perf_counter() - self._start
+        self._fd.write(f'end {int(won)} {seconds:.6f}\n')
+        self._start = None
+
+    def write_game(self, game: Game) -> None:
+        ''' write game, checksummed by the solver rules if it has none
+        '''
+        self.start(game.deal, game.policy, game.layout)
+        sums = game.checksums
+        if all(c is None for c in sums):
+            with L.using(game.layout):
+                sums = checksums(game.deal, game.moves)
+        for cmd, checksum in zip(game.moves, sums):
+            self._move(cmd, checksum)
+        self.end(game.won, game.seconds)
+
+
+def read_games(fd: ty.TextIO) -> ty.Iterator[Game]:
+    ''' yields the games in fd, a game without an end line is not won
+    '''
+    deal = None
+    policy = ''
+    layout = 'klondike'
+    moves = []
+    sums = []
+    for line in fd:
+        parts = line.split()
+        if not parts or parts[0][0] == '#':
+            continue
+        match parts[0]:
+            case 'move':
+                checksum = None
+                if parts[-1][0] == '=':
+                    checksum = int(parts.pop()[1:], 16)
+                moves.append(psc.SolCmd(psc.SolActs(int(parts[1])),
+                                        [int(a) for a in parts[2:]]))
+                sums.append(checksum)
+            case 'game':
+                if deal is not None:
+                    yield Game(deal, policy, moves, False, 0.0, sums, layout)
+                deal, policy, moves, sums = int(parts[1]), parts[2], [], []
+                layout = parts[3] if len(parts) > 3 else 'klondike'
+            case 'end':
+                yield Game(deal, policy, moves, parts[1] == '1',
+                           float(parts[2]), sums, layout)
+                deal, policy, moves, sums = None, '', [], []
+    if deal is not None:
+        yield Game(deal, policy, moves, False, 0.0, sums, layout)
+
+
+def read_path(path: pl.Path) -> ty.Iterator[Game]:
+    with open(path) as fd:
+        yield from read_games(fd)
+
+
+def random_game(deal: int, max_moves: int, rng: random.Random) -> Game:
+    ''' play deal with random legal moves, foundation moves first
+    '''
+    start = time.perf_counter()
+    state = SV.deal_state(deal)
+    moves = []
+    while len(moves) < max_moves and not SV.is_won(state):
+        legal = SV.legal_moves(state)
+        if not legal:
+            break
+        if legal[0][0] in (psc.SolActs.TABLEAU_TO_FOUNDATION,
+                           psc.SolActs.WASTE_FOUNDATION):
+            move = legal[0]
+        else:
+            move = rng.choice(legal)
+        state = SV.apply_move(state, move)
+        moves.append(SV.move_to_cmd(move))
+    return Game(deal, 'random', moves, SV.is_won(state),
+                time.perf_counter() - start)
+
+
+def solver_game(deal: int, max_nodes: int) -> Game:
+    ''' solve deal, a game that is not solved has no moves
+    '''
+    start = time.perf_counter()
+    result = SV.solve(SV.deal_state(deal), max_nodes=max_nodes)
+    return Game(deal, 'solver', result.moves,
+                result.status == SV.SolveStatus.SOLVED,
+                time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Record games')
+    parser.add_argument('--out', '-o',
+                        type=argparse.FileType('w'),
+                        default=sys.stdout,
+                        help='game log default: stdout')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=100,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--policy', '-p',
+                        choices=['random', 'solver'],
+                        default='random',
+                        help='who plays default: %(default)s')
+    parser.add_argument('--max_moves', '-m',
+                        type=int,
+                        default=500,
+                        help='random game length default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=20000,
+                        help='solver node limit default: %(default)s')
+    args = parser.parse_args()
+    log = GameLog(args.out)
+    rng = random.Random(args.first)
+    for deal in range(args.first, args.first + args.deals):
+        if args.policy == 'random':
+            log.write_game(random_game(deal, args.max_moves, rng))
+        else:
+            log.write_game(solver_game(deal, args.max_nodes))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' A greedy policy over board features: each turn it plays the legal
+    move whose next position has the largest weighted sum of
+        hidden  face down cards
+        found   cards on the foundations
+        empty   empty tableau columns
+        kings   kings at the base of a column, nothing under them
+    and never goes back to a position it has been in, so it stops when
+    every move leads somewhere it has been. The weights are tuned by
+    tune.py.
+'''
+
+import argparse
+import time
+import typing as ty
+
+import cards as C
+import game_log as GL
+import solver as SV
+
+FEATURES = ('hidden', 'found', 'empty', 'kings')
+
+WEIGHTS = {'hidden': -5.0, 'found': 10.0, 'empty': 1.0, 'kings': 2.0}
+
+_value = SV._value
+
+
+def features(state: SV.State) -> ty.Tuple[int, int, int, int]:
+    ''' the FEATURES of state, in that order '''
+    cols, found = state[0], state[1]
+    hidden = empty = kings = 0
+    for h, s in cols:
+        hidden += len(h)
+        if not s:
+            empty += 1
+        elif not h and _value[s[0]] == C.king:
+            kings += 1
+    return hidden, sum(found), empty, kings
+
+
+def play(deal: int, weights: ty.Dict[str, float] | None=None,
+         max_moves: int=1000) -> GL.Game:
+    ''' play deal greedily with weights, default WEIGHTS
+    '''
+    start = time.perf_counter()
+    w = [(weights or WEIGHTS)[f] for f in FEATURES]
+    state = SV.deal_state(deal)
+    seen = {state}
+    moves = []
+    while len(moves) < max_moves and not SV.is_won(state):
+        best = None
+        for move in SV.legal_moves(state):
+            child = SV.apply_move(state, move)
+            if child in seen:
+                continue
+            value = sum(a * b for a, b in zip(w, features(child)))
+            if best is None or value > best[0]:
+                best = (value, move, child)
+        if best is None:
+            break
+        value, move, state = best
+        seen.add(state)
+        moves.append(SV.move_to_cmd(move))
+    return GL.Game(deal, 'greedy', moves, SV.is_won(state),
+                   time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play deals greedily')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=100,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--max_moves', '-m',
+                        type=int,
+                        default=1000,
+                        help='moves per game default: %(default)s')
+    for name in FEATURES:
+        parser.add_argument(f'--{name}',
+                            type=float,
+                            default=WEIGHTS[name],
+                            help=f'{name} weight default: %(default)s')
+    args = parser.parse_args()
+    weights = {f: getattr(args, f) for f in FEATURES}
+    start = time.perf_counter()
+    games = [play(d, weights, args.max_moves)
+             for d in range(args.first, args.first + args.deals)]
+    won = sum(g.won for g in games)
+    print(f'{won}/{len(games)} won, '
+          f'{sum(len(g.moves) for g in games) / len(games):.0f} moves/game '
+          f'{(time.perf_counter() - start) / len(games):.3f}s/game')
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Background solving for the interactive game.
+    Each position gets its own worker process so the search never
+    shares the interpreter (or the GIL) with the input loop. restart()
+    kills the worker of the old position and starts one on the new,
+    the worker streams the best line it has found every so often and
+    the solution or verdict at the end. latest() only drains what has
+    arrived, so asking for a hint never waits on the search.
+'''
+
+import argparse
+import atexit
+import multiprocessing as mp
+import pathlib as pl
+import queue
+import time
+import typing as ty
+
+import metrics as M
+import parse_sol_cmds as psc
+import solve_cache as SC
+import solver as SV
+import thoughtful as TH
+
+
+class Hint():
+    ''' what the worker knows about the position so far
+    '''
+    __slots__ = ('_status', '_moves', '_nodes', '_reason', '_seconds',
+                 '_best')
+
+    def __init__(self, status: SV.SolveStatus | None=None,
+                 moves: ty.List[psc.SolCmd] | None=None, nodes: int=0,
+                 reason: str='', seconds: float=0.0,
+                 best: ty.List[psc.SolCmd] | None=None):
+        self._status = status
+        self._moves = moves or []
+        self._nodes = nodes
+        self._reason = reason
+        self._seconds = seconds
+        self._best = self._moves if best is None else best
+
+    @property
+    def status(self) -> SV.SolveStatus | None:
+        ''' None while the search runs '''
+        return self._status
+
+    @property
+    def done(self) -> bool:
+        return self._status is not None
+
+    @property
+    def moves(self) -> ty.List[psc.SolCmd]:
+        ''' the solution once SOLVED, before that the best line so far '''
+        return self._moves
+
+    @property
+    def best(self) -> ty.List[psc.SolCmd]:
+        ''' the best line found, kept when the search ends without a
+            solution
+        '''
+        return self._best
+
+    @property
+    def nodes(self) -> int:
+        return self._nodes
+
+    @property
+    def seconds(self) -> float:
+        return self._seconds
+
+    def __str__(self) -> str:
+        if self._status is None:
+            what = f'searching, best line of {len(self._moves)} moves'
+        else:
+            what = f'{self._status.name} moves:{len(self._moves)}'
+        if not self._moves and self._best:
+            what += f', best line of {len(self._best)} moves'
+        s = f'{what} nodes:{self._nodes} {self._seconds:.1f}s'
+        if self._reason:
+            s += f' ({self._reason})'
+        return s
+
+
+def _moves_out(cmds: ty.List[psc.SolCmd]) -> ty.List[SV.Move]:
+    return [(c.cmd, tuple(c.cargs)) for c in cmds]
+
+
+def _search(state: SV.State, mode: str, kwargs: ty.Dict,
+            perfect: bool, cache: pl.Path | None, out: mp.Queue) -> None:
+    ''' the worker process, puts ('line', nodes, moves) as the best line
+        improves, ('nodes', nodes) between and ('done', status, nodes,
+        moves, best, reason) at the end
+    '''
+    sent = None
+
+    def progress(nodes, moves):
+        nonlocal sent
+        if moves is sent:
+            out.put(('nodes', nodes))
+        else:
+            sent = moves
+            out.put(('line', nodes, _moves_out(moves)))
+
+    max_nodes = kwargs.get('max_nodes', 1_000_000)
+    connection = SC.open_cache(cache) if cache is not None else None
+    result = connection.get(state, max_nodes) if connection else None
+    if result is None:
+        if perfect:
+            result = TH.solve(state, progress=progress, **kwargs)
+        else:
+            result = SV.solve(state, mode, progress=progress, **kwargs)
+        if connection:
+            connection.put(state, result, max_nodes)
+    if connection:
+        connection.flush()
+    out.put(('done', result.status, result.nodes, _moves_out(result.moves),
+             _moves_out(result.best), result.reason))
+
+
+class HintWorker():
+    ''' one background search at a time, for the latest position
+    '''
+    def __init__(self, mode: str='best', perfect: bool=False,
+                 cache: pl.Path | None=None, **kwargs):
+        '''
+        Args:
+            mode: an SV.modes() search
+            perfect: search with thoughtful, the hidden cards are known
+            cache: a solve_cache file, read before and written after
+                each search
+            kwargs: passed to the search, e.g., mem_mb, max_nodes
+        '''
+        self._mode = mode
+        self._perfect = perfect
+        self._cache = cache
+        self._kwargs = kwargs
+        # not fork: the game's log, metrics and pool threads may hold a
+        # lock (e.g., the metrics one) at fork time, forkserver children
+        # come from a process with no threads and the solver imported
+        if 'forkserver' in mp.get_all_start_methods():
+            self._ctx = mp.get_context('forkserver')
+            self._ctx.set_forkserver_preload([__name__])
+        else:
+            self._ctx = mp.get_context('spawn')
+        self._process = None
+        self._queue = None
+        self._state = None
+        self._start = 0.0
+        self._hint = Hint()
+        self._counted = True
+        self._restarts = 0
+        atexit.register(self.close)
+
+    @property
+    def state(self) -> SV.State | None:
+        ''' the position being searched '''
+        return self._state
+
+    @property
+    def restarts(self) -> int:
+        return self._restarts
+
+    def restart(self, state: SV.State) -> None:
+        ''' drop the search of the old position and search state
+        '''
+        if state == self._state:
+            return None
+        self.cancel()
+        self._state = state
+        self._hint = Hint()
+        self._counted = False
+        self._start = time.monotonic()
+        # a queue per search, a killed writer can leave one unusable
+        self._queue = self._ctx.Queue()
+        self._process = self._ctx.Process(
+            target=_search, name='hint-worker', daemon=True,
+            args=(state, self._mode, self._kwargs, self._perfect,
+                  self._cache, self._queue))
+        self._process.start()
+        self._restarts += 1
+        return None
+
+    def _count(self, nodes: int, secs: float) -> None:
+        ''' add the search to the metrics once, the worker's own
+            counters die with it
+        '''
+        if not self._counted:
+            self._counted = True
+            M.searched('thoughtful' if self._perfect else self._mode,
+                       nodes, secs)
+
+    def cancel(self) -> None:
+        ''' stop the search, one cut short is counted with the nodes of
+            the last line it streamed
+        '''
+        if self._process is not None:
+            self.latest()
+            self._count(self._hint.nodes, time.monotonic() - self._start)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process.join()
+            self._process = None
+        if self._queue is not None:
+            self._queue.close()
+            self._queue = None
+        self._state = None
+        return None
+
+    def latest(self) -> Hint:
+        ''' the newest result, without waiting for the search
+        '''
+        q = self._queue
+        while q is not None:
+            try:
+                msg = q.get_nowait()
+            except queue.Empty:
+                break
+            secs = time.monotonic() - self._start
+            if msg[0] == 'line':
+                self._hint = Hint(None, [SV.move_to_cmd(m) for m in msg[2]],
+                                  msg[1], seconds=secs)
+            elif msg[0] == 'nodes':
+                self._hint = Hint(None, self._hint.moves, msg[1],
+                                  seconds=secs)
+            else:
+                _, status, nodes, moves, best, reason = msg
+                # only deepening ends with a best line, the other
+                # searches streamed theirs
+                best = [SV.move_to_cmd(m) for m in best] or self._hint.best
+                self._hint = Hint(status, [SV.move_to_cmd(m) for m in moves],
+                                  nodes, reason, secs, best)
+                self._count(nodes, secs)
+        if self._hint.status is None and q is not None \
+                and not self._process.is_alive() and q.empty():
+            # died without an answer, e.g. out of memory
+            self._hint = Hint(SV.SolveStatus.INCONCLUSIVE, [],
+                              self._hint.nodes, 'the search stopped',
+                              time.monotonic() - self._start,
+                              self._hint.best)
+        return self._hint
+
+    def close(self) -> None:
+        self.cancel()
+        atexit.unregister(self.close)
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Watch a background search')
+    parser.add_argument('--deal', '-d',
+                        type=int,
+                        default=7,
+                        help='deal number default: %(default)s')
+    parser.add_argument('--mode', '-m',
+                        choices=SV.modes(),
+                        default='best',
+                        help='search mode default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=200000,
+                        help='node limit default: %(default)s')
+    parser.add_argument('--interval', '-i',
+                        type=float,
+                        default=0.25,
+                        help='seconds between polls default: %(default)s')
+    args = parser.parse_args()
+    worker = HintWorker(args.mode, max_nodes=args.max_nodes)
+    state = SV.deal_state(args.deal)
+    worker.restart(state)
+    slowest = 0.0
+    while True:
+        time.sleep(args.interval)
+        start = time.perf_counter()
+        hint = worker.latest()
+        slowest = max(slowest, time.perf_counter() - start)
+        first = hint.best[0].cmd_line if hint.best else '-'
+        print(f'{hint} next:{first}')
+        if hint.done:
+            break
+    print(f'slowest latest(): {slowest * 1000:.2f}ms')
+    # a state change mid search restarts it
+    worker.restart(SV.apply_move(state, SV.legal_moves(state)[0]))
+    time.sleep(args.interval)
+    print(f'restarted ({worker.restarts}): {worker.latest()}')
+    worker.close()
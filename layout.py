@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Table layouts: how many decks and tableau columns a game uses.
+    Column x is dealt x + 1 cards and the rest go to the stock. Each
+    deck adds a foundation stack per suit, stack i holds suit
+    i % len(C.Suits), and a card goes to the first stack of its suit
+    that it fits. The two copies of a card in a double deck are the
+    same C.Card, so they share a card id.
+    The engine, solver and snapshots read the current layout when a
+    game is dealt or a state is made, so use() switches it for the
+    games that follow.
+'''
+
+import argparse
+import contextlib
+import typing as ty
+
+import cards as C
+
+
+class Layout():
+    ''' a deck count and column count
+    '''
+    __slots__ = ('_name', '_decks', '_cols')
+
+    def __init__(self, name: str, decks: int, cols: int):
+        dealt = cols * (cols + 1) // 2
+        if dealt >= decks * len(C.all_cards()):
+            raise ValueError(f'{name}: {cols} columns deal {dealt} cards')
+        self._name = name
+        self._decks = decks
+        self._cols = cols
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def decks(self) -> int:
+        return self._decks
+
+    @property
+    def cols(self) -> int:
+        return self._cols
+
+    @property
+    def cards(self) -> int:
+        return self._decks * len(C.all_cards())
+
+    @property
+    def foundations(self) -> int:
+        ''' foundation stacks, one per suit per deck '''
+        return self._decks * len(C.Suits)
+
+    @property
+    def dealt(self) -> int:
+        ''' cards dealt to the tableau '''
+        return self._cols * (self._cols + 1) // 2
+
+    def deck(self) -> ty.List[C.Card]:
+        ''' the unshuffled cards, deck after deck '''
+        return C.all_cards() * self._decks
+
+    def __str__(self) -> str:
+        decks = 'deck' if self._decks == 1 else 'decks'
+        return f'{self._name}: {self._decks} {decks}, {self._cols} columns, ' \
+               f'{self.foundations} foundations, ' \
+               f'{self.cards - self.dealt} in the stock'
+
+
+_layouts = {
+    'klondike': Layout('klondike', 1, 7),
+    'wide': Layout('wide', 1, 9),
+    'double': Layout('double', 2, 9),
+    'double10': Layout('double10', 2, 10),
+}
+
+_current = _layouts['klondike']
+
+
+def layouts() -> ty.List[str]:
+    return list(_layouts)
+
+
+def layout(name: str) -> Layout:
+    return _layouts[name]
+
+
+def current() -> Layout:
+    return _current
+
+
+def use(name: str | Layout) -> Layout:
+    ''' make name the layout of the games dealt from now on
+    Returns:
+        the layout it replaces
+    '''
+    global _current
+    previous = _current
+    _current = name if isinstance(name, Layout) else _layouts[name]
+    return previous
+
+
+@contextlib.contextmanager
+def using(name: str | Layout) -> ty.Iterator[Layout]:
+    ''' use(name) for the with block, then the layout it replaced
+    '''
+    previous = use(name)
+    try:
+        yield _current
+    finally:
+        use(previous)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='List the layouts')
+    parser.parse_args()
+    for name in layouts():
+        print(layout(name))
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Streaming statistics over game logs (see game_log).
+    Games are read one at a time and folded into a LogStats, so memory
+    does not grow with the log size. A directory of logs is split by
+    file over a process pool and the partial LogStats are merged.
+    Games are only replayed when a metric needs the table, i.e.,
+    "recycles" has to know when the stock is empty.
+'''
+
+import argparse
+import collections
+import concurrent.futures as cf
+import os
+import pathlib as pl
+import typing as ty
+
+import game_log as GL
+import layout as L
+import parse_sol_cmds as psc
+import solver as SV
+
+METRICS = ('moves', 'recycles', 'first', 'time')
+
+
+class LogStats():
+    ''' incremental aggregates over games, merge() combines two
+    '''
+    def __init__(self, metrics: ty.Iterable[str]=METRICS):
+        self._metrics = frozenset(metrics)
+        self._games = 0
+        self._won = 0
+        self._moves = 0
+        self._move_types = collections.Counter()
+        self._recycles = collections.Counter()  # recycles -> games
+        self._first = {}  # first move act -> [games, won]
+        self._win_secs = 0.0
+        self._win_min = None
+        self._win_max = None
+        self._bad = 0
+
+    def _need_replay(self) -> bool:
+        return 'recycles' in self._metrics
+
+    def add(self, game: GL.Game) -> None:
+        self._games += 1
+        self._won += game.won
+        self._moves += len(game.moves)
+        if 'moves' in self._metrics:
+            self._move_types.update(m.cmd for m in game.moves)
+        if 'first' in self._metrics:
+            first = game.moves[0].cmd if game.moves else psc.SolActs.EMPTY
+            entry = self._first.setdefault(first, [0, 0])
+            entry[0] += 1
+            entry[1] += game.won
+        if 'time' in self._metrics and game.won:
+            secs = game.seconds
+            self._win_secs += secs
+            self._win_min = secs if self._win_min is None \
+                else min(self._win_min, secs)
+            self._win_max = secs if self._win_max is None \
+                else max(self._win_max, secs)
+        if self._need_replay():
+            self._recycles[self._replay(game)] += 1
+
+    def _replay(self, game: GL.Game) -> int:
+        ''' replay through the solver rules, in the game's layout
+        Returns:
+            the number of times the waste went back to the stock
+        '''
+        with L.using(game.layout):
+            state = SV.deal_state(game.deal)
+        recycles = 0
+        try:
+            for m in game.moves:
+                if m.cmd == psc.SolActs.STOCK_TO_WASTE and not state[2]:
+                    recycles += 1
+                state = SV.apply_move(state, (m.cmd, tuple(m.cargs)))
+        except (IndexError, ValueError):
+            self._bad += 1
+        return recycles
+
+    def merge(self, other: 'LogStats') -> 'LogStats':
+        self._games += other._games
+        self._won += other._won
+        self._moves += other._moves
+        self._move_types.update(other._move_types)
+        self._recycles.update(other._recycles)
+        for act, (n, w) in other._first.items():
+            entry = self._first.setdefault(act, [0, 0])
+            entry[0] += n
+            entry[1] += w
+        self._win_secs += other._win_secs
+        for value in (other._win_min, other._win_max):
+            if value is None:
+                continue
+            self._win_min = value if self._win_min is None \
+                else min(self._win_min, value)
+            self._win_max = value if self._win_max is None \
+                else max(self._win_max, value)
+        self._bad += other._bad
+        return self
+
+    @property
+    def games(self) -> int:
+        return self._games
+
+    def _percentile(self, p: int) -> int:
+        ''' the recycles count at percentile p of the games
+        '''
+        want = p * sum(self._recycles.values()) / 100
+        seen = 0
+        for r in sorted(self._recycles):
+            seen += self._recycles[r]
+            if seen >= want:
+                return r
+        return 0
+
+    def report(self) -> str:
+        lines = [f'games: {self._games} won: {self._won} '
+                 f'({100 * self._won / max(1, self._games):.1f}%) '
+                 f'moves: {self._moves}']
+        if 'moves' in self._metrics:
+            lines.append('move types:')
+            for act, n in self._move_types.most_common():
+                lines.append(f'  {act.name:<22} {n:>10} '
+                             f'{100 * n / max(1, self._moves):5.1f}%')
+        if 'recycles' in self._metrics:
+            total = sum(r * n for r, n in self._recycles.items())
+            lines.append(f'stock recycles per game: '
+                         f'{total / max(1, self._games):.2f}')
+            lines.append('  ' + ' '.join(f'p{p}:{self._percentile(p)}'
+                                         for p in (50, 90, 99, 100)))
+            if self._bad:
+                lines.append(f'  games that did not replay: {self._bad}')
+        if 'first' in self._metrics:
+            lines.append('win rate by first move:')
+            for act, (n, w) in sorted(self._first.items(),
+                                      key=lambda i: -i[1][0]):
+                lines.append(f'  {act.name:<22} {w:>8}/{n:<8} '
+                             f'{100 * w / n:5.1f}%')
+        if 'time' in self._metrics and self._won:
+            lines.append(f'time to win: mean {self._win_secs / self._won:.3f}s'
+                         f' min {self._win_min:.3f}s max {self._win_max:.3f}s')
+        return '\n'.join(lines)
+
+
+def games_of(paths: ty.Iterable[pl.Path],
+             policy: str | None=None) -> ty.Iterator[GL.Game]:
+    ''' the games of each path in turn, optionally of one policy
+    '''
+    for path in paths:
+        for game in GL.read_path(path):
+            if policy is None or game.policy == policy:
+                yield game
+
+
+def analyze(games: ty.Iterable[GL.Game],
+            metrics: ty.Iterable[str]=METRICS) -> LogStats:
+    stats = LogStats(metrics)
+    for game in games:
+        stats.add(game)
+    return stats
+
+
+def _analyze_file(path: pl.Path, metrics: ty.Tuple[str, ...],
+                  policy: str | None) -> LogStats:
+    return analyze(games_of([path], policy), metrics)
+
+
+def log_paths(paths: ty.Iterable[pl.Path],
+              pattern: str='*.log') -> ty.List[pl.Path]:
+    ''' paths with each directory replaced by its files matching pattern
+    '''
+    files = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(sorted(path.rglob(pattern)))
+        else:
+            files.append(path)
+    return files
+
+
+def analyze_paths(paths: ty.Iterable[pl.Path],
+                  metrics: ty.Iterable[str]=METRICS,
+                  policy: str | None=None,
+                  workers: int | None=None) -> LogStats:
+    ''' one pool task per file, the partial LogStats are merged
+    '''
+    metrics = tuple(metrics)
+    files = list(paths)
+    stats = LogStats(metrics)
+    if workers == 1 or len(files) < 2:
+        for path in files:
+            stats.merge(_analyze_file(path, metrics, policy))
+        return stats
+    with cf.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_analyze_file, path, metrics, policy)
+                   for path in files]
+        for future in cf.as_completed(futures):
+            stats.merge(future.result())
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Game log statistics')
+    parser.add_argument('paths',
+                        type=pl.Path,
+                        nargs='+',
+                        help='game log files or directories of them')
+    parser.add_argument('--pattern',
+                        default='*.log',
+                        help='log file pattern in directories '
+                             'default: %(default)s')
+    parser.add_argument('--metrics', '-m',
+                        default=','.join(METRICS),
+                        help='comma list of metrics default: %(default)s')
+    parser.add_argument('--policy', '-p',
+                        default=None,
+                        help='only games of this policy')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='pool size default: %(default)s')
+    args = parser.parse_args()
+    metrics = [m for m in args.metrics.split(',') if m]
+    bad = set(metrics) - set(METRICS)
+    if bad:
+        parser.error(f'unknown metrics {bad}, choose from {METRICS}')
+    stats = analyze_paths(log_paths(args.paths, args.pattern), metrics,
+                          args.policy, args.workers)
+    print(stats.report())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Buffered background logging.
+    Callers queue a record and return, a writer thread drains the queue
+    and writes the records in batches. The file is only flushed when
+    an error record is written, on close, or at exit.
+'''
+
+import argparse
+import atexit
+import collections
+import enum
+import os
+import pathlib as pl
+import tempfile
+import threading
+import time
+import typing as ty
+
+
+class Level(enum.IntEnum):
+    DEBUG = enum.auto()
+    INFO = enum.auto()
+    ERROR = enum.auto()
+
+
+class Policy(enum.Enum):
+    ''' what log() does when the queue is full
+    '''
+    DROP = 'drop'  # throw the record away and count it
+    BLOCK = 'block'  # wait for the writer
+
+
+class Record():
+    ''' a queued log record, formatting happens on the writer thread
+    '''
+    __slots__ = ('_created', '_level', '_args')
+
+    def __init__(self, level: Level, args: ty.Tuple):
+        self._created = time.time()
+        self._level = level
+        self._args = args
+
+    @property
+    def created(self) -> float:
+        return self._created
+
+    @property
+    def level(self) -> Level:
+        return self._level
+
+    @property
+    def args(self) -> ty.Tuple:
+        return self._args
+
+    def __str__(self) -> str:
+        # the same text print(*args) writes
+        return ' '.join(str(a) for a in self._args) + '\n'
+
+
+class LogWriter():
+    ''' queues records for a background thread that writes them in batches
+        The queue is a deque, appends are atomic so log() takes no lock
+        unless the queue is full and the policy is BLOCK.
+    '''
+    def __init__(self,
+                 target: str | pl.Path | ty.TextIO,
+                 max_bytes: int=0,
+                 backups: int=3,
+                 queue_size: int=10000,
+                 policy: Policy=Policy.DROP,
+                 batch: int=256,
+                 interval: float=0.05):
+        '''
+        Args:
+            target: a path, or an open text file (no rotation then)
+            max_bytes: rotate the file when it grows past this, 0 never
+            backups: rotated files kept as path.1 ... path.backups
+            queue_size: the bound of the record queue
+            policy: what to do when the queue is full
+            batch: queued records that wake the writer early
+            interval: seconds the writer sleeps between batches
+        '''
+        if isinstance(target, (str, pl.Path)):
+            self._path = pl.Path(target)
+            self._fd = open(self._path, 'a', encoding='utf-8')
+            self._size = self._fd.tell()
+        else:
+            self._path = None
+            self._fd = target
+            self._size = 0
+        self._max_bytes = max_bytes if self._path else 0
+        self._backups = backups
+        self._queue_size = queue_size
+        self._policy = policy
+        self._batch = batch
+        self._interval = interval
+        self._records = collections.deque()
+        self._wake = threading.Event()
+        self._space = threading.Condition()
+        self._dropped = 0
+        self._written = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run,
+                                        name='log-writer',
+                                        daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    @property
+    def written(self) -> int:
+        return self._written
+
+    @property
+    def depth(self) -> int:
+        return len(self._records)
+
+    def log(self, *args, level: Level=Level.INFO) -> None:
+        if self._closed:
+            return None
+        records = self._records
+        if len(records) >= self._queue_size:
+            if self._policy == Policy.DROP:
+                self._dropped += 1
+                return None
+            self._wake.set()
+            with self._space:
+                self._space.wait_for(
+                    lambda: len(records) < self._queue_size or self._closed)
+        records.append(Record(level, args))
+        if len(records) >= self._batch:
+            self._wake.set()
+        return None
+
+    def error(self, *args) -> None:
+        ''' log, never dropped, and have the writer flush the file
+        '''
+        if not self._closed:
+            self._records.append(Record(Level.ERROR, args))
+            self._wake.set()
+        return None
+
+    def close(self) -> None:
+        ''' write what is queued, flush and close the file
+        '''
+        if self._closed:
+            return None
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        if self._dropped:
+            self._fd.write(f'log_writer: dropped {self._dropped} records\n')
+        self._fd.flush()
+        if self._path:
+            self._fd.close()
+        atexit.unregister(self.close)
+        return None
+
+    def _run(self) -> None:
+        records = self._records
+        while True:
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            closed = self._closed
+            while records:
+                batch = [records.popleft()
+                         for i in range(min(len(records), 4 * self._batch))]
+                with self._space:
+                    self._space.notify_all()
+                self._write(batch)
+            if closed:
+                return
+
+    def _write(self, records: ty.List[Record]) -> None:
+        ''' one write per batch, cut where the file reaches max_bytes
+        '''
+        parts = []
+        for r in records:
+            text = str(r)
+            parts.append(text)
+            # bytes, not characters: a card symbol is 3 bytes in UTF-8
+            self._size += len(text.encode('utf-8'))
+            if self._max_bytes and self._size >= self._max_bytes:
+                self._fd.write(''.join(parts))
+                parts = []
+                self._rotate()
+        self._fd.write(''.join(parts))
+        self._written += len(records)
+        if any(r.level == Level.ERROR for r in records):
+            self._fd.flush()
+
+    def _rotate(self) -> None:
+        ''' path -> path.1 -> path.2 ..., the oldest is removed
+        '''
+        self._fd.close()
+        for i in range(self._backups - 1, 0, -1):
+            src = self._path.with_name(f'{self._path.name}.{i}')
+            if src.exists():
+                os.replace(src, self._path.with_name(
+                    f'{self._path.name}.{i + 1}'))
+        if self._backups:
+            os.replace(self._path,
+                       self._path.with_name(f'{self._path.name}.1'))
+        else:
+            self._path.unlink()
+        self._fd = open(self._path, 'a', encoding='utf-8')
+        self._size = 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Test the log writer')
+    parser.add_argument('--log_file', '-l',
+                        type=pl.Path,
+                        default=pl.Path('LW.log'),
+                        help='log file default: %(default)s')
+    parser.add_argument('--count', '-n',
+                        type=int,
+                        default=200000,
+                        help='records to log default: %(default)s')
+    parser.add_argument('--max_bytes', '-m',
+                        type=int,
+                        default=1 << 20,
+                        help='rotate size default: %(default)s')
+    parser.add_argument('--policy', '-p',
+                        choices=[p.value for p in Policy],
+                        default=Policy.BLOCK.value,
+                        help='queue full policy default: %(default)s')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    with tempfile.TemporaryFile('w') as tmp:
+        for i in range(args.count):
+            print('line', i, file=tmp, flush=True)
+    flush_secs = time.perf_counter() - start
+    lw = LogWriter(args.log_file, max_bytes=args.max_bytes,
+                   policy=Policy(args.policy))
+    start = time.perf_counter()
+    for i in range(args.count):
+        lw.log('line', i)
+    queue_secs = time.perf_counter() - start
+    lw.close()
+    total_secs = time.perf_counter() - start
+    print(f'print flush: {flush_secs / args.count * 1e6:.2f}us/line')
+    print(f'queued: {queue_secs / args.count * 1e6:.2f}us/line, '
+          f'{total_secs:.2f}s to drain, {lw.written=} {lw.dropped=}')
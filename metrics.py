@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Live counters in the Prometheus text format.
+    A Counter keeps one dict of counts per thread, so inc() is a dict
+    update with no lock; the lock is only taken the first time a thread
+    counts, to add its shard, and by a scrape, which sums the shards.
+    A Gauge is a function called at scrape time, e.g. a queue's depth.
+    serve() answers GET /metrics from a daemon thread.
+    Counts are per process, pool workers count in their own.
+'''
+
+import argparse
+import collections
+import http.server
+import random
+import threading
+import time
+import typing as ty
+import urllib.request
+
+PREFIX = 'solitaire_'
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+class Counter():
+    ''' a monotonic count, optionally split by one label
+    '''
+    __slots__ = ('_name', '_help', '_label', '_local', '_shards')
+
+    def __init__(self, name: str, help: str, label: str | None=None):
+        self._name = name
+        self._help = help
+        self._label = label
+        self._local = threading.local()
+        self._shards = []
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def inc(self, n: float=1, label: str='') -> None:
+        try:
+            self._local.counts[label] += n
+        except AttributeError:
+            counts = collections.defaultdict(int)
+            with _lock:
+                self._shards.append(counts)
+            self._local.counts = counts
+            counts[label] += n
+
+    def values(self) -> ty.Dict[str, float]:
+        ''' the counts of every thread summed by label '''
+        total = collections.defaultdict(int)
+        with _lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # copy() is atomic, iterating a dict another thread adds to
+            # is not
+            for label, n in shard.copy().items():
+                total[label] += n
+        return dict(total)
+
+    def render(self) -> ty.List[str]:
+        values = self.values()
+        if not values and not self._label:
+            values = {'': 0}
+        return _render(self._name, self._help, 'counter', self._label,
+                       values)
+
+
+class Gauge():
+    ''' a value read when scraped
+    '''
+    __slots__ = ('_name', '_help', '_label', '_read')
+
+    def __init__(self, name: str, help: str,
+                 read: ty.Callable[[], float | ty.Dict[str, float]],
+                 label: str | None=None):
+        '''
+        Args:
+            read: returns the value, or with label a dict label -> value
+        '''
+        self._name = name
+        self._help = help
+        self._label = label
+        self._read = read
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def render(self) -> ty.List[str]:
+        try:
+            value = self._read()
+        except Exception:
+            return []  # e.g. what it reads was closed
+        values = value if self._label else {'': value}
+        return _render(self._name, self._help, 'gauge', self._label, values)
+
+
+def _render(name: str, help: str, kind: str, label: str | None,
+            values: ty.Dict[str, float]) -> ty.List[str]:
+    full = PREFIX + name
+    lines = [f'# HELP {full} {help}', f'# TYPE {full} {kind}']
+    for value_label, value in sorted(values.items()):
+        if label:
+            escaped = str(value_label).replace('\\', r'\\') \
+                .replace('"', r'\"').replace('\n', r'\n')
+            lines.append(f'{full}{{{label}="{escaped}"}} {value}')
+        else:
+            lines.append(f'{full} {value}')
+    return lines
+
+
+def counter(name: str, help: str, label: str | None=None) -> Counter:
+    ''' the counter called name, made on first use
+    '''
+    with _lock:
+        if name not in _metrics:
+            _metrics[name] = Counter(name, help, label)
+        return _metrics[name]
+
+
+def gauge(name: str, help: str,
+          read: ty.Callable[[], float | ty.Dict[str, float]],
+          label: str | None=None) -> Gauge:
+    ''' register, or replace, the gauge called name
+    '''
+    with _lock:
+        _metrics[name] = Gauge(name, help, read, label)
+        return _metrics[name]
+
+
+def remove(name: str) -> None:
+    with _lock:
+        _metrics.pop(name, None)
+
+
+def render() -> str:
+    ''' every metric in the Prometheus text format '''
+    with _lock:
+        metrics = list(_metrics.values())
+    lines = []
+    for metric in metrics:
+        lines += metric.render()
+    return '\n'.join(lines) + '\n'
+
+
+# the engine's counters
+games_started = counter('games_started_total', 'games dealt')
+games_won = counter('games_won_total', 'games won')
+moves = counter('moves_total', 'moves that changed the table', 'act')
+solver_searches = counter('solver_searches_total', 'searches run', 'mode')
+solver_nodes = counter('solver_nodes_total', 'states expanded', 'mode')
+solver_seconds = counter('solver_seconds_total', 'seconds searching',
+                         'mode')
+cache_lookups = counter('solve_cache_lookups_total', 'solve cache lookups')
+cache_hits = counter('solve_cache_hits_total', 'solve cache hits')
+
+
+def searched(mode: str, nodes: int, seconds: float) -> None:
+    ''' count one finished search '''
+    solver_searches.inc(1, mode)
+    solver_nodes.inc(nodes, mode)
+    solver_seconds.inc(seconds, mode)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int=9108, host: str='127.0.0.1') \
+        -> http.server.ThreadingHTTPServer:
+    ''' answer /metrics on host:port from a daemon thread, port 0
+        picks a free one, see server_address. shutdown() stops it.
+    '''
+    server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics',
+                     daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the counters')
+    parser.add_argument('--port', '-p',
+                        type=int,
+                        default=0,
+                        help='port, 0 picks one default: %(default)s')
+    parser.add_argument('--threads', '-t',
+                        type=int,
+                        default=4,
+                        help='counting threads default: %(default)s')
+    parser.add_argument('--incs', '-n',
+                        type=int,
+                        default=200000,
+                        help='increments per thread default: %(default)s')
+    args = parser.parse_args()
+    server = serve(args.port)
+    url = f'http://{server.server_address[0]}:{server.server_address[1]}' \
+          '/metrics'
+    work = collections.deque(range(1000))
+    gauge('work_queue_depth', 'items waiting', lambda: len(work))
+
+    # the per thread counter against one locked dict
+    locked = collections.defaultdict(int)
+    locked_lock = threading.Lock()
+
+    def count_locked(n):
+        for i in range(n):
+            with locked_lock:
+                locked['STOCK_TO_WASTE'] += 1
+
+    def count_sharded(n):
+        for i in range(n):
+            moves.inc(1, 'STOCK_TO_WASTE')
+
+    for what, fn in (('locked', count_locked), ('sharded', count_sharded)):
+        threads = [threading.Thread(target=fn, args=(args.incs,))
+                   for _ in range(args.threads)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        secs = time.perf_counter() - start
+        print(f'{what}: {secs / (args.threads * args.incs) * 1e9:.0f}ns '
+              f'per inc')
+    rng = random.Random(1)
+    for _ in range(100):
+        games_started.inc()
+        if rng.random() < 0.3:
+            games_won.inc()
+        work.pop()
+    with urllib.request.urlopen(url) as response:
+        text = response.read().decode()
+    print(text, end='')
+    assert f'{PREFIX}moves_total{{act="STOCK_TO_WASTE"}} ' \
+           f'{args.threads * args.incs}' in text
+    server.shutdown()
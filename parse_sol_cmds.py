@@ -17,6 +17,8 @@ import sys
 import typing as ty
 import shutil
 
+import layout as L
+
 class SolActs(enum.IntEnum):
     ''' Solitaire actions
     '''
@@ -36,7 +38,18 @@ class SolActs(enum.IntEnum):
     QUIT = enum.auto()
     INVALID = enum.auto()
 
+# the actions that move cards, i.e., what a game record holds
+MOVE_ACTS = frozenset({
+    SolActs.STOCK_TO_WASTE,
+    SolActs.WASTE_FOUNDATION,
+    SolActs.WASTE_TO_TABLEAU,
+    SolActs.TABLEAU_TO_FOUNDATION,
+    SolActs.TABLEAU_TO_TABLEAU,
+})
+
 class CmdInfo(object):
+    __slots__ = ('_cmd', '_cargs', '_definition')
+
     def __init__(self, cmd: str, cargs: ty.List, definition: str):
         self._cmd = cmd
         self._cargs = cargs
@@ -79,6 +92,8 @@ class SolCmd(object):
         Used to implement a command, to store in history for undo
         and used for saving a game or replay or debug
     '''
+    __slots__ = ('_cmd', '_cargs')
+
     def __init__(self, cmd: SolActs, cargs: ty.List[int]):
         self._cmd = cmd
         self._cargs = cargs
@@ -95,6 +110,12 @@ class SolCmd(object):
     def cmd_str(self) -> str:
         return _cmd_content_map[self._cmd]
 
+    @property
+    def cmd_line(self) -> str:
+        ''' the command as the user types it, columns are 1 based
+        '''
+        return ' '.join([self.cmd_str] + [str(c + 1) for c in self._cargs])
+
     def __str__(self):
         return f'{self._cmd}:{self._cargs}'
 
@@ -165,7 +186,8 @@ def parse_cmd(cin:str) -> SolCmd:
     ''' there a small set of commands, see _cmd_set
     Each command is a starts with a single charater in the _cmd_set.
     w and t command take 0, 1, or 2 paramters which reresent column
-    number.  The user enters columns: 1 >= C <= 7, which we map to [0, 6]
+    number.  The user enters columns: 1 >= C <= cols of the layout,
+    which we map to [0, cols - 1]
     Returns:
         SolCmd with (cmd, posistions), where cmd is in _cmd_set and
             positions can be [], [C], or [C1, C2] where C is a column #
@@ -186,15 +208,16 @@ def parse_cmd(cin:str) -> SolCmd:
             return None, parts
         return cmd, positions
     for i, param in enumerate(parts[1:], start=1):
-        pi = parts[1].strip()
-        if not pi.isdigit(): # only single digits allowed
+        pi = param.strip()
+        # isdecimal, not isdigit: int() rejects digits like '²'
+        if not pi.isdecimal(): # only single digits allowed
             # If a non-digit parameter is found, it's an invalid command
             print(f'pc-not-dig: {i} -> {pi}')
             return None, parts
         # now we can convert to an integer
         pos = int(parts[i]) - 1 # zero  base index
         #print(f'pc: {i} -> {pos}')
-        if pos > 6 or pos < 0: # check column range form 1 to 7
+        if pos >= L.current().cols or pos < 0: # check column range
             print(f'pc-bad-pos: {i} -> {parts}')
             # If position is out of range, it's an invalid command
             return None, parts
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Batched playouts, needs numpy.
+    N games are arrays and move in lockstep, each step computes the
+    legal move mask of every game and plays one policy move in each,
+    with numpy operations over all N rather than a Python loop:
+        cols   (N, 7, 19)  card ids from the bottom, EMPTY past the end
+        lens   (N, 7)      cards per column
+        down   (N, 7)      face down cards per column
+        found  (N, 4)      foundation top value per suit
+        talon  (N, 24)     stock and waste in draw order, the waste is
+                           talon[:drawn] and the stock talon[drawn:tlen]
+        drawn, tlen (N,)
+    as position.Position keeps the talon. Moves are indexes into MOVES,
+    the engine moves in dataset order. Games that are won, stuck or out
+    of moves are done and no longer move.
+    The rules are the engine's (SV.is_legal), check() replays some of
+    the games through Tableau/Foundation/StockWaste and compares every
+    mask and board.
+'''
+
+import argparse
+import contextlib
+import os
+import time
+import typing as ty
+
+import numpy as np
+
+import cards as C
+import dataset as DS
+import parse_sol_cmds as psc
+import solitaire as S
+import solver as SV
+import tableau as T
+
+MOVES = DS._all_moves
+
+EMPTY = len(C.all_cards())
+_ncols = T.Tableau.cols()
+_ntalon = DS._max_waste
+_width = DS._max_col
+
+# per card id, EMPTY included so lookups need no masking
+_VALUE = np.array(SV._value + [0], dtype=np.int8)
+_SUIT = np.array(SV._suit + [0], dtype=np.int8)
+_RED = np.array([int(r) for r in SV._red] + [2], dtype=np.int8)
+
+_STOCK = 0
+_WF = 1
+_WT = 2
+_TF = _WT + _ncols
+_TT = _TF + _ncols
+# the (x, y) of each tableau to tableau move, in MOVES order
+_tt_pairs = np.array([m[1] for m in MOVES[_TT:]], dtype=np.intp)
+_offdiag = ~np.eye(_ncols, dtype=bool).ravel()
+_foundation_moves = np.zeros(len(MOVES), dtype=bool)
+_foundation_moves[[_WF] + list(range(_TF, _TT))] = True
+
+
+def _along(a: np.ndarray, index: np.ndarray) -> np.ndarray:
+    ''' a[n, x, index[n, x, ...]] '''
+    return np.take_along_axis(a, index.astype(np.intp), axis=2)
+
+
+def _fits_foundation(found: np.ndarray, cards: np.ndarray) -> np.ndarray:
+    ''' cards is (n, k) '''
+    tops = np.take_along_axis(found, _SUIT[cards].astype(np.intp), axis=1)
+    return (cards != EMPTY) & (tops + 1 == _VALUE[cards])
+
+
+def _legal_mask(cols, lens, down, found, talon, drawn, tlen) -> np.ndarray:
+    ''' the mask for the games in the arrays, see Playouts '''
+    n = len(lens)
+    mask = np.empty((n, len(MOVES)), dtype=bool)
+    shown = lens - down
+    empty = lens == 0
+    top = np.where(empty, EMPTY,
+                   _along(cols, np.maximum(lens - 1, 0)[..., None])[..., 0])
+    base = np.where(shown > 0,
+                    _along(cols, np.minimum(down, _width - 1)[..., None])
+                    [..., 0], EMPTY)
+    waste = np.take_along_axis(
+        talon, np.maximum(drawn - 1, 0).astype(np.intp)[:, None], axis=1)
+    waste = np.where(drawn[:, None] > 0, waste, EMPTY)
+    top_v = _VALUE[top]
+    top_r = _RED[top]
+    wv = _VALUE[waste]
+    mask[:, _STOCK] = tlen > 0
+    mask[:, _WF] = _fits_foundation(found, waste)[:, 0]
+    mask[:, _WT:_TF] = (waste != EMPTY) & np.where(
+        empty, wv == C.king, (_RED[waste] != top_r) & (wv + 1 == top_v))
+    mask[:, _TF:_TT] = _fits_foundation(found, top)
+    # the run from x that can go on y starts at shown index
+    # value(base x) - value(top y) + 1
+    index = _VALUE[base][:, :, None].astype(np.int16) \
+        - top_v[:, None, :] + 1
+    ok = (index >= 0) & (index < shown[:, :, None])
+    card = _along(cols, np.clip(down[:, :, None] + index, 0, _width - 1))
+    fits = ok & (_RED[card] != top_r[:, None, :]) \
+        & (_VALUE[card] + 1 == top_v[:, None, :])
+    king = (_VALUE[base] == C.king)[:, :, None]
+    tt = (shown > 0)[:, :, None] & np.where(empty[:, None, :], king, fits)
+    mask[:, _TT:] = tt.reshape(n, -1)[:, _offdiag]
+    return mask
+
+
+class Playouts():
+    ''' N games in lockstep
+    '''
+    def __init__(self, deals: ty.Sequence[int], max_moves: int=1000):
+        n = len(deals)
+        self._deals = np.array(deals, dtype=np.int64)
+        self._max_moves = max_moves
+        self._cols = np.full((n, _ncols, _width), EMPTY, dtype=np.int8)
+        self._lens = np.zeros((n, _ncols), dtype=np.int8)
+        self._down = np.zeros((n, _ncols), dtype=np.int8)
+        self._found = np.zeros((n, len(C.Suits)), dtype=np.int8)
+        self._talon = np.full((n, _ntalon), EMPTY, dtype=np.int8)
+        self._drawn = np.zeros(n, dtype=np.int8)
+        self._tlen = np.zeros(n, dtype=np.int8)
+        self._moves = np.zeros(n, dtype=np.int32)
+        self._done = np.zeros(n, dtype=bool)
+        for i, deal in enumerate(deals):
+            self.set_state(i, SV.deal_state(deal))
+
+    def set_state(self, i: int, state: SV.State) -> None:
+        cols, found, stock, waste = state
+        self._cols[i] = EMPTY
+        for x, (hidden, shown) in enumerate(cols):
+            column = hidden + shown
+            self._cols[i, x, :len(column)] = column
+            self._lens[i, x] = len(column)
+            self._down[i, x] = len(hidden)
+        self._found[i] = found
+        talon = waste + stock[::-1]
+        self._talon[i] = EMPTY
+        self._talon[i, :len(talon)] = talon
+        self._tlen[i] = len(talon)
+        self._drawn[i] = len(waste)
+
+    def state(self, i: int) -> SV.State:
+        ''' game i as a solver State '''
+        cols = tuple((tuple(int(c) for c in self._cols[i, x, :d]),
+                      tuple(int(c) for c in self._cols[i, x, d:n]))
+                     for x, (d, n) in enumerate(zip(self._down[i],
+                                                    self._lens[i])))
+        talon = [int(c) for c in self._talon[i, :self._tlen[i]]]
+        drawn = int(self._drawn[i])
+        return (cols, tuple(int(v) for v in self._found[i]),
+                tuple(talon[drawn:][::-1]), tuple(talon[:drawn]))
+
+    @property
+    def deals(self) -> np.ndarray:
+        return self._deals
+
+    @property
+    def done(self) -> np.ndarray:
+        return self._done
+
+    @property
+    def won(self) -> np.ndarray:
+        return (self._found == C.king).all(axis=1)
+
+    @property
+    def moves(self) -> np.ndarray:
+        ''' moves played per game '''
+        return self._moves
+
+    def legal_mask(self) -> np.ndarray:
+        ''' (N, len(MOVES)) the moves SV.is_legal allows, none for
+            games that are done, only the others are computed
+        '''
+        mask = np.zeros((len(self._done), len(MOVES)), dtype=bool)
+        if self._done.any():
+            rows = np.flatnonzero(~self._done)
+            mask[rows] = _legal_mask(
+                self._cols[rows], self._lens[rows], self._down[rows],
+                self._found[rows], self._talon[rows], self._drawn[rows],
+                self._tlen[rows])
+        else:
+            mask[:] = _legal_mask(self._cols, self._lens, self._down,
+                                  self._found, self._talon, self._drawn,
+                                  self._tlen)
+        return mask
+
+    def _take_waste(self, rows: np.ndarray) -> np.ndarray:
+        ''' remove the waste top of rows, returns the cards '''
+        drawn = self._drawn[rows].astype(np.intp)
+        cards = self._talon[rows, drawn - 1]
+        j = np.arange(_ntalon)[None, :]
+        src = np.minimum(j + (j >= drawn[:, None] - 1), _ntalon - 1)
+        talon = np.take_along_axis(self._talon[rows], src, axis=1)
+        talon[np.arange(len(rows)), self._tlen[rows] - 1] = EMPTY
+        self._talon[rows] = talon
+        self._tlen[rows] -= 1
+        self._drawn[rows] -= 1
+        return cards
+
+    def _to_foundation(self, rows: np.ndarray, cards: np.ndarray) -> None:
+        self._found[rows, _SUIT[cards]] = _VALUE[cards]
+
+    def _flip(self, rows: np.ndarray, cols: np.ndarray) -> None:
+        ''' Tableau.flip_card where the shown cards ran out '''
+        bare = (self._lens[rows, cols] == self._down[rows, cols]) \
+            & (self._down[rows, cols] > 0)
+        self._down[rows[bare], cols[bare]] -= 1
+
+    def play(self, moves: np.ndarray) -> None:
+        ''' play moves[i] in game i, -1 for no move; each must be legal
+        '''
+        rows = np.flatnonzero(moves == _STOCK)
+        if len(rows):
+            self._drawn[rows] = np.where(
+                self._drawn[rows] < self._tlen[rows], self._drawn[rows] + 1, 1)
+        rows = np.flatnonzero(moves == _WF)
+        if len(rows):
+            self._to_foundation(rows, self._take_waste(rows))
+        rows = np.flatnonzero((moves >= _WT) & (moves < _TF))
+        if len(rows):
+            x = moves[rows] - _WT
+            cards = self._take_waste(rows)
+            self._cols[rows, x, self._lens[rows, x]] = cards
+            self._lens[rows, x] += 1
+        rows = np.flatnonzero((moves >= _TF) & (moves < _TT))
+        if len(rows):
+            x = moves[rows] - _TF
+            top = self._lens[rows, x] - 1
+            self._to_foundation(rows, self._cols[rows, x, top])
+            self._cols[rows, x, top] = EMPTY
+            self._lens[rows, x] = top
+            self._flip(rows, x)
+        rows = np.flatnonzero(moves >= _TT)
+        if len(rows):
+            x, y = _tt_pairs[moves[rows] - _TT].T
+            down = self._down[rows, x].astype(np.intp)
+            src_len = self._lens[rows, x].astype(np.intp)
+            dst_len = self._lens[rows, y].astype(np.intp)
+            base = self._cols[rows, x, down]
+            top = self._cols[rows, y, np.maximum(dst_len - 1, 0)]
+            start = np.where(dst_len > 0,
+                             down + _VALUE[base] - _VALUE[top] + 1, down)
+            count = src_len - start
+            for k in range(int(count.max())):
+                sel = k < count
+                r, sx, sy = rows[sel], x[sel], y[sel]
+                self._cols[r, sy, dst_len[sel] + k] = \
+                    self._cols[r, sx, start[sel] + k]
+                self._cols[r, sx, start[sel] + k] = EMPTY
+            self._lens[rows, x] = start
+            self._lens[rows, y] = dst_len + count
+            self._flip(rows, x)
+        played = moves >= 0
+        self._moves[played] += 1
+        self._done |= self.won | (self._moves >= self._max_moves)
+
+    def step(self, policy: ty.Callable, rng: np.random.Generator) \
+            -> ty.Tuple[np.ndarray, np.ndarray]:
+        ''' one move in every game that is not done
+        Returns:
+            (mask, moves) with moves -1 for games that did not move
+        '''
+        mask = self.legal_mask()
+        stuck = ~mask.any(axis=1)
+        self._done |= stuck
+        moves = np.where(stuck, -1, policy(mask, rng))
+        self.play(moves)
+        return mask, moves
+
+    def run(self, policy: ty.Callable, rng: np.random.Generator) -> int:
+        ''' step until every game is done
+        Returns:
+            the steps taken
+        '''
+        steps = 0
+        while not self._done.all():
+            self.step(policy, rng)
+            steps += 1
+        return steps
+
+
+def random_policy(mask: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    ''' a uniform legal move '''
+    return np.where(mask, rng.random(mask.shape, dtype=np.float32),
+                    -1.0).argmax(axis=1)
+
+
+def greedy_policy(mask: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    ''' a foundation move if there is one, else a uniform legal move '''
+    score = rng.random(mask.shape, dtype=np.float32) + _foundation_moves
+    return np.where(mask, score, -1.0).argmax(axis=1)
+
+
+_policies = {
+    'random': random_policy,
+    'greedy': greedy_policy,
+}
+
+def policies() -> ty.List[str]:
+    return list(_policies)
+
+
+def policy(name: str) -> ty.Callable:
+    return _policies[name]
+
+
+def check(deals: ty.Sequence[int], policy: ty.Callable, seed: int=0,
+          max_moves: int=300) -> int:
+    ''' play deals batched and each through the engine (T.Tableau),
+        asserting the same legal masks and boards after every move
+    Returns:
+        the moves checked
+    '''
+    batch = Playouts(deals, max_moves)
+    games = [SV.deal_game(d) for d in deals]
+    rng = np.random.default_rng(seed)
+    checked = 0
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        while not batch.done.all():
+            mask, moves = batch.step(policy, rng)
+            for i, game in enumerate(games):
+                if moves[i] < 0:
+                    continue
+                before = SV.state_from_game(*game)
+                legal = [SV.is_legal(before, m) for m in MOVES]
+                assert list(mask[i]) == legal, \
+                    f'deal {deals[i]}: mask differs at move {batch.moves[i]}'
+                act, cargs = MOVES[moves[i]]
+                assert S.play_cmd(*game, psc.SolCmd(act, list(cargs))), \
+                    f'deal {deals[i]}: engine refused {MOVES[moves[i]]}'
+                assert SV.state_from_game(*game) == batch.state(i), \
+                    f'deal {deals[i]}: board differs after {MOVES[moves[i]]}'
+                checked += 1
+    return checked
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Batched playouts')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--games', '-g',
+                        type=int,
+                        default=2000,
+                        help='games in the batch default: %(default)s')
+    parser.add_argument('--policy', '-p',
+                        choices=policies(),
+                        default='greedy',
+                        help='move policy default: %(default)s')
+    parser.add_argument('--max_moves', '-m',
+                        type=int,
+                        default=1000,
+                        help='moves per game default: %(default)s')
+    parser.add_argument('--seed', '-s',
+                        type=int,
+                        default=0,
+                        help='policy seed default: %(default)s')
+    parser.add_argument('--check', '-c',
+                        type=int,
+                        default=0,
+                        help='cross check this many games against the '
+                             'engine first')
+    args = parser.parse_args()
+    if args.check:
+        start = time.perf_counter()
+        n = check(range(args.first, args.first + args.check),
+                  policy(args.policy), args.seed)
+        print(f'checked {n} moves against the engine in '
+              f'{time.perf_counter() - start:.1f}s')
+    deals = range(args.first, args.first + args.games)
+    start = time.perf_counter()
+    batch = Playouts(deals, args.max_moves)
+    setup = time.perf_counter() - start
+    start = time.perf_counter()
+    steps = batch.run(policy(args.policy), np.random.default_rng(args.seed))
+    secs = time.perf_counter() - start
+    print(f'{args.games} games, {steps} steps, {int(batch.moves.sum())} '
+          f'moves in {secs:.2f}s (+{setup:.2f}s deal): '
+          f'{args.games / secs:.0f} games/s '
+          f'{batch.moves.sum() / secs:.0f} moves/s, '
+          f'won {int(batch.won.sum())}')
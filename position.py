@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Immutable positions for search and what-if analysis.
+    A Position never changes, play() returns a new one that shares
+    with its parent every column the move does not touch, so a branch
+    costs the columns touched and siblings share the rest.
+    The stock and waste are one tuple, the talon, in draw order with a
+    count of the cards drawn: waste = talon[:drawn] and the stock is
+    the rest. Drawing, and recycling the waste, only change the count
+    so every stock press shares the talon; only a card leaving the
+    waste copies it.
+    Each Position keeps its parent and the move from it, so a what-if
+    tree can be walked back to its root.
+'''
+
+import argparse
+import copy
+import time
+import tracemalloc
+import typing as ty
+
+import cards as C
+import parse_sol_cmds as psc
+import solver as SV
+
+
+class Position():
+    ''' a game position, hashable, equal when the cards are
+    '''
+    __slots__ = ('_cols', '_found', '_talon', '_drawn', '_parent', '_move')
+
+    def __init__(self, cols, found: ty.Tuple[int, ...],
+                 talon: ty.Tuple[int, ...], drawn: int,
+                 parent: 'Position | None'=None,
+                 move: SV.Move | None=None):
+        ''' use from_state/from_game/deal, or play() '''
+        self._cols = cols
+        self._found = found
+        self._talon = talon
+        self._drawn = drawn
+        self._parent = parent
+        self._move = move
+
+    @staticmethod
+    def from_state(state: SV.State) -> 'Position':
+        cols, found, stock, waste = state
+        return Position(cols, found, waste + stock[::-1], len(waste))
+
+    @staticmethod
+    def from_game(tableau, foundation, stock_waste) -> 'Position':
+        return Position.from_state(SV.state_from_game(tableau, foundation,
+                                                      stock_waste))
+
+    @staticmethod
+    def deal(deal: int) -> 'Position':
+        ''' the start of the numbered deal, see deck.numbered_shuffle '''
+        return Position.from_state(SV.deal_state(deal))
+
+    @property
+    def cols(self):
+        ''' a (hidden, shown) tuple pair per column, as in SV.State '''
+        return self._cols
+
+    @property
+    def found(self) -> ty.Tuple[int, ...]:
+        return self._found
+
+    @property
+    def stock(self) -> ty.Tuple[int, ...]:
+        return self._talon[:self._drawn - 1:-1] if self._drawn \
+            else self._talon[::-1]
+
+    @property
+    def waste(self) -> ty.Tuple[int, ...]:
+        return self._talon[:self._drawn]
+
+    @property
+    def state(self) -> SV.State:
+        ''' the solver State, builds the stock and waste tuples '''
+        return self._cols, self._found, self.stock, self.waste
+
+    @property
+    def parent(self) -> 'Position | None':
+        return self._parent
+
+    @property
+    def move(self) -> SV.Move | None:
+        ''' the move that made this from parent '''
+        return self._move
+
+    def _view(self) -> SV.State:
+        ''' a State with just enough of the stock and waste for the
+            solver rules, which only look at the top two cards
+        '''
+        d = self._drawn
+        return (self._cols, self._found, self._talon[d:d + 1],
+                self._talon[max(0, d - 2):d])
+
+    def is_won(self) -> bool:
+        return SV.is_won(self._view())
+
+    def is_legal(self, move: SV.Move) -> bool:
+        return SV.is_legal(self._view(), move)
+
+    def legal_moves(self) -> ty.List[SV.Move]:
+        ''' SV.legal_moves, the moves worth trying '''
+        return SV.legal_moves(self._view())
+
+    def play(self, move: SV.Move) -> 'Position':
+        ''' the position after move
+        Raises:
+            ValueError: if the engine would not make move
+        '''
+        view = self._view()
+        if not SV.is_legal(view, move):
+            raise ValueError(
+                f'illegal move: {SV.move_to_cmd(move).cmd_line}')
+        talon, drawn = self._talon, self._drawn
+        match move[0]:
+            case psc.SolActs.STOCK_TO_WASTE:
+                # past the end the waste goes back and the first is drawn
+                drawn = drawn + 1 if drawn < len(talon) else 1
+                return Position(self._cols, self._found, talon, drawn, self,
+                                move)
+            case psc.SolActs.WASTE_FOUNDATION | psc.SolActs.WASTE_TO_TABLEAU:
+                talon = talon[:drawn - 1] + talon[drawn:]
+                drawn -= 1
+        cols, found = SV.apply_move(view, move)[:2]
+        return Position(cols, found, talon, drawn, self, move)
+
+    def after(self, moves: ty.Iterable[SV.Move]) -> 'Position':
+        ''' play moves in turn, see play() '''
+        position = self
+        for move in moves:
+            position = position.play(move)
+        return position
+
+    def children(self) -> ty.List['Position']:
+        ''' one child per legal_moves() move '''
+        return [self.play(m) for m in self.legal_moves()]
+
+    def path(self) -> ty.List[SV.Move]:
+        ''' the moves from the root to here '''
+        moves = []
+        position = self
+        while position._parent is not None:
+            moves.append(position._move)
+            position = position._parent
+        moves.reverse()
+        return moves
+
+    def to_game(self):
+        ''' new engine objects, see SV.game_from_state '''
+        return SV.game_from_state(self.state)
+
+    def _key(self):
+        return self._cols, self._found, self._talon, self._drawn
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Position):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __str__(self) -> str:
+        cols = ' '.join(
+            '/'.join(filter(None, (C.cards_to_str([C.card_by_id(c)
+                                                   for c in part])
+                                   for part in col))) or '-'
+            for col in self._cols)
+        return f'{cols} found:{self._found} ' \
+               f'talon:{self._drawn}/{len(self._talon)}'
+
+
+def _unique_bytes(objs: ty.Iterable[object], seen: set) -> int:
+    ''' bytes of the tuples reachable from objs not already in seen,
+        ints are shared small ints so are not counted
+    '''
+    total = 0
+    stack = list(objs)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or not isinstance(obj, tuple):
+            continue
+        seen.add(id(obj))
+        total += obj.__sizeof__()
+        stack.extend(obj)
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Branching cost')
+    parser.add_argument('--deal', '-d',
+                        type=int,
+                        default=1,
+                        help='deal number default: %(default)s')
+    parser.add_argument('--positions', '-p',
+                        type=int,
+                        default=5000,
+                        help='positions to branch to default: %(default)s')
+    args = parser.parse_args()
+    root = Position.deal(args.deal)
+
+    def expand(n):
+        # breadth first so there are many siblings
+        tree = [root]
+        seen = {root}
+        i = 0
+        while len(tree) < n and i < len(tree):
+            for child in tree[i].children():
+                if child not in seen:
+                    seen.add(child)
+                    tree.append(child)
+            i += 1
+        return tree
+
+    start = time.perf_counter()
+    tree = expand(args.positions)
+    secs = time.perf_counter() - start
+    plays = sum(len(p.legal_moves()) for p in tree)
+    start = time.perf_counter()
+    for p in tree:
+        for m in p.legal_moves():
+            p.play(m)
+    play_secs = time.perf_counter() - start
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tree = expand(args.positions)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    shared = set()
+    unique = sum(_unique_bytes(p._key(), shared) for p in tree)
+    unshared = sum(_unique_bytes(p._key(), set()) for p in tree)
+    print(f'{len(tree)} positions in {secs:.3f}s, a play is '
+          f'{play_secs / max(1, plays) * 1e6:.1f}us')
+    print(f'{used / len(tree):.0f} bytes per position with the search '
+          f'sets, tuples {unique / len(tree):.0f} bytes each shared, '
+          f'{unshared / len(tree):.0f} unshared')
+    game = root.to_game()
+    n = 500
+    start = time.perf_counter()
+    for _ in range(n):
+        copy.deepcopy(game)
+    print(f'engine deepcopy: {(time.perf_counter() - start) / n * 1e6:.1f}us')
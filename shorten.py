@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Shorten winning move sequences.
+    A solution is replayed through the solver rules and each position
+    is remembered by the move it was reached at. When a position comes
+    round again the moves in between did nothing (a card moved back and
+    forth, a whole stock cycle) and are cut. Then single moves and short
+    runs of moves are removed, and neighbours swapped, whenever what is
+    left still replays to a win. Every candidate is checked from the
+    remembered position before it, so a pass is one replay per move.
+    Solver lines seldom have anything to cut, it pays on logged games,
+    e.g., random or human play, so the "s" command does not run it.
+'''
+
+import argparse
+import pathlib as pl
+import sys
+import time
+import typing as ty
+
+import game_log as GL
+import layout as L
+import parse_sol_cmds as psc
+import solver as SV
+
+
+def _moves_of(cmds: ty.Iterable[psc.SolCmd]) -> ty.List[SV.Move]:
+    return [(c.cmd, tuple(c.cargs)) for c in cmds]
+
+
+def replay(state: SV.State, moves: ty.Sequence[SV.Move]) \
+        -> SV.State | None:
+    ''' the state after moves, None if one of them is not legal
+    '''
+    for move in moves:
+        if not SV.is_legal(state, move):
+            return None
+        state = SV.apply_move(state, move)
+    return state
+
+
+def _wins(state: SV.State, moves: ty.Sequence[SV.Move]) -> bool:
+    state = replay(state, moves)
+    return state is not None and SV.is_won(state)
+
+
+def cut_loops(start: SV.State, moves: ty.Sequence[SV.Move]) \
+        -> ty.Tuple[ty.List[SV.Move], ty.List[SV.State]]:
+    ''' drop the moves between two visits of the same position
+    Returns:
+        (moves, states) with states[i] the position before moves[i]
+        and states[-1] the final one
+    '''
+    states = [start]
+    kept = []
+    seen = {start: 0}
+    for move in moves:
+        state = SV.apply_move(states[-1], move)
+        back = seen.get(state)
+        if back is not None:
+            for s in states[back + 1:]:
+                del seen[s]
+            del states[back + 1:]
+            del kept[back:]
+            continue
+        kept.append(move)
+        states.append(state)
+        seen[state] = len(states) - 1
+    return kept, states
+
+
+def _drop_runs(start: SV.State, moves: ty.List[SV.Move],
+               states: ty.List[SV.State], span: int) \
+        -> ty.Tuple[ty.List[SV.Move], ty.List[SV.State]]:
+    ''' remove runs of span moves, last first so the states before the
+        run stay valid
+    '''
+    i = len(moves) - span
+    while i >= 0:
+        rest = moves[i + span:]
+        if _wins(states[i], rest):
+            moves = moves[:i] + rest
+            moves, states = cut_loops(start, moves)
+            i = min(i, len(moves) - span) + 1
+        i -= 1
+    return moves, states
+
+
+def _swaps(start: SV.State, moves: ty.List[SV.Move],
+           states: ty.List[SV.State]) \
+        -> ty.Tuple[ty.List[SV.Move], ty.List[SV.State]]:
+    ''' swap neighbours when that lets a loop be cut
+    '''
+    i = len(moves) - 2
+    while i >= 0:
+        swapped = moves[:i] + [moves[i + 1], moves[i]] + moves[i + 2:]
+        if _wins(states[i], swapped[i:]):
+            shorter, shorter_states = cut_loops(start, swapped)
+            if len(shorter) < len(moves):
+                moves, states = shorter, shorter_states
+                i = min(i, len(moves) - 2) + 1
+        i -= 1
+    return moves, states
+
+
+def shorten_moves(start: SV.State, moves: ty.Sequence[SV.Move],
+                  max_span: int=3, max_passes: int=4) -> ty.List[SV.Move]:
+    ''' a shorter winning sequence from start, moves must win
+    Args:
+        max_span: the longest run of moves tried as one removal
+        max_passes: rounds of removals and swaps, stops early when a
+            round changes nothing
+    '''
+    if not _wins(start, moves):
+        raise ValueError('moves do not win from start')
+    moves, states = cut_loops(start, moves)
+    for _ in range(max_passes):
+        before = len(moves)
+        for span in range(1, max_span + 1):
+            moves, states = _drop_runs(start, moves, states, span)
+        moves, states = _swaps(start, moves, states)
+        if len(moves) == before:
+            break
+    return moves
+
+
+def shorten(start: SV.State, cmds: ty.Sequence[psc.SolCmd],
+            **kwargs) -> ty.List[psc.SolCmd]:
+    ''' shorten_moves for SolCmds, see there for kwargs
+    '''
+    return [SV.move_to_cmd(m)
+            for m in shorten_moves(start, _moves_of(cmds), **kwargs)]
+
+
+def shorten_game(game: GL.Game, **kwargs) -> GL.Game:
+    ''' the game with shorter moves if it was won, else the game
+    '''
+    with L.using(game.layout):
+        start = SV.deal_state(game.deal)
+    if not game.won or not _wins(start, _moves_of(game.moves)):
+        return game
+    return GL.Game(game.deal, game.policy,
+                   shorten(start, game.moves, **kwargs), True, game.seconds,
+                   layout=game.layout)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shorten won games')
+    parser.add_argument('paths',
+                        type=pl.Path,
+                        nargs='*',
+                        help='game logs, default: solve --deals deals')
+    parser.add_argument('--out', '-o',
+                        type=argparse.FileType('w'),
+                        default=None,
+                        help='write the shortened games here')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=10,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=20000,
+                        help='solver node limit default: %(default)s')
+    parser.add_argument('--max_span', '-s',
+                        type=int,
+                        default=3,
+                        help='longest run removed at once '
+                             'default: %(default)s')
+    args = parser.parse_args()
+    if args.paths:
+        games = (g for p in args.paths for g in GL.read_path(p))
+    else:
+        games = (GL.solver_game(d, args.max_nodes)
+                 for d in range(args.first, args.first + args.deals))
+    log = GL.GameLog(args.out) if args.out else None
+    before = after = 0
+    for game in games:
+        start = time.perf_counter()
+        short = shorten_game(game, max_span=args.max_span)
+        ms = (time.perf_counter() - start) * 1000
+        if game.won:
+            print(f'{game.deal} {game.policy}: {len(game.moves)} -> '
+                  f'{len(short.moves)} moves in {ms:.1f}ms',
+                  file=sys.stderr if log else sys.stdout)
+            before += len(game.moves)
+            after += len(short.moves)
+        if log:
+            log.write_game(short)
+    print(f'total: {before} -> {after} moves',
+          file=sys.stderr if log else sys.stdout)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Fixed size byte snapshots of a game position.
+    Layout, one byte per entry, the offsets for klondike:
+        [0, 52)   card ids: each tableau column hidden then shown cards,
+                  then the stock, then the waste, padded with EMPTY.
+                  Foundation cards are not stored, the tops say which.
+        [52, 59)  cards in each tableau column
+        [59, 66)  hidden (face down) cards in each tableau column
+        [66, 70)  foundation top value by stack, 0 is empty
+        [70]      cards in the stock, the rest are the waste
+    Other layouts (see layout.py) have the same sections sized by their
+    cards, columns and foundation stacks, see size(); unpack_state reads
+    the current layout's.
+    The same position always gives the same bytes so a snapshot can be
+    hashed, compared, stored or sent to another process as is.
+'''
+
+import argparse
+import random
+import timeit
+import typing as ty
+
+import cards as C
+import layout as L
+import solver as SV
+import tableau as T
+
+EMPTY = 0xff
+
+_nvalues = C.king - C.ace + 1
+
+
+def _offsets(layout: L.Layout) -> ty.Tuple[int, int, int, int]:
+    ''' where the lens, downs, found and stock sections start '''
+    lens_at = layout.cards
+    downs_at = lens_at + layout.cols
+    found_at = downs_at + layout.cols
+    return lens_at, downs_at, found_at, found_at + layout.foundations
+
+
+def size(layout: L.Layout | None=None) -> int:
+    ''' the snapshot bytes of layout, default the current one '''
+    return _offsets(layout or L.current())[3] + 1
+
+
+# the size of a klondike snapshot
+SIZE = size(L.layout('klondike'))
+
+
+def pack_state(state: SV.State) -> bytes:
+    ''' pack a solver State into SIZE bytes
+    '''
+    cols, found, stock, waste = state
+    order = []
+    lens = []
+    downs = []
+    for hidden, shown in cols:
+        order += hidden
+        order += shown
+        lens.append(len(hidden) + len(shown))
+        downs.append(len(hidden))
+    order += stock
+    order += waste
+    # a deck has _nvalues cards per foundation stack
+    order += [EMPTY] * (_nvalues * len(found) - len(order))
+    return bytes(order + lens + downs + list(found) + [len(stock)])
+
+
+def unpack_state(data: bytes) -> SV.State:
+    ''' the inverse of pack_state
+    '''
+    lens_at, downs_at, found_at, stock_at = _offsets(L.current())
+    assert len(data) == stock_at + 1, f'bad snapshot size {len(data)}'
+    cols = []
+    pos = 0
+    for n, d in zip(data[lens_at:downs_at], data[downs_at:found_at]):
+        cols.append((tuple(data[pos:pos + d]),
+                     tuple(data[pos + d:pos + n])))
+        pos += n
+    found = tuple(data[found_at:stock_at])
+    end = lens_at - sum(found)
+    stock_end = pos + data[stock_at]
+    return (tuple(cols), found, tuple(data[pos:stock_end]),
+            tuple(data[stock_end:end]))
+
+
+def pack(tableau, foundation, stock_waste) -> bytes:
+    ''' snapshot the engine objects
+    Args:
+        tableau: a T.Tableau
+        foundation: a F.Foundation
+        stock_waste: a SW.StockWaste
+    '''
+    return pack_state(SV.state_from_game(tableau, foundation, stock_waste))
+
+
+def unpack(data: bytes):
+    ''' new engine objects for a snapshot
+    Returns:
+        (tableau, foundation, stock_waste)
+    '''
+    return SV.game_from_state(unpack_state(data))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Test game snapshots')
+    parser.add_argument('--seed', '-s',
+                        type=int,
+                        help='set seed')
+    parser.add_argument('--moves', '-m',
+                        type=int,
+                        default=60,
+                        help='random moves before the snapshot '
+                             'default: %(default)s')
+    parser.add_argument('--number', '-n',
+                        type=int,
+                        default=20000,
+                        help='timing loop count default: %(default)s')
+    parser.add_argument('--layout', '-l',
+                        choices=L.layouts(),
+                        default='klondike',
+                        help='table layout default: %(default)s')
+    args = parser.parse_args()
+    L.use(args.layout)
+    if args.seed != None:
+        random.seed(args.seed)
+    state = SV.deal_state(args.seed)
+    for i in range(args.moves):
+        moves = SV.legal_moves(state)
+        if not moves:
+            break
+        state = SV.apply_move(state, random.choice(moves))
+    data = pack_state(state)
+    assert unpack_state(data) == state, 'state round trip failed'
+    assert pack(*unpack(data)) == data, 'game round trip failed'
+    print(f'SIZE={len(data)} {data.hex()}')
+    for name, stmt in [('pack_state', lambda: pack_state(state)),
+                       ('unpack_state', lambda: unpack_state(data)),
+                       ('pack', lambda: pack(*game)),
+                       ('unpack', lambda: unpack(data))]:
+        game = unpack(data)
+        secs = timeit.timeit(stmt, number=args.number)
+        print(f'{name}: {secs / args.number * 1e6:.2f}us')
@@ -3,36 +3,66 @@
 #
 import argparse
 import functools as ft
+import pathlib as pl
 import random
 import re
 import sys
 import typing as ty
 
 import cards as C
+import deal_index as DI
+import deal_pool as DP
 import deck as D
 import foundation as F
+import game_log as GL
+import hint_worker as HW
+import layout as L
+import log_writer as LW
+import metrics as M
 import tableau as T
 import stock_waste as SW
 import parse_sol_cmds as psc
+import snapshot as SN
+import solve_cache as SC
+import solver as SV
 
 BREAK_STRING \
     = '\n-------------------------------------------------------------------'
 
 UNDER='[4m'
 
-_lfd = None
-def set_log_file(lfd):
-    global _lfd
-    _lfd = lfd
+_log = None
+def set_log_file(lfd, **kwargs):
+    ''' log through a background LW.LogWriter
+    Args:
+        lfd: a path or an open file, None logs to stdout
+        kwargs: passed to LW.LogWriter, e.g., max_bytes, policy
+    '''
+    global _log
+    if _log:
+        _log.close()
+    _log = LW.LogWriter(lfd, **kwargs) if lfd is not None else None
     return None
 
 def logit(*args) -> None:
-    print(*args, file=_lfd, flush=True)
+    if _log:
+        _log.log(*args)
+    else:
+        print(*args)
     return None
 
 def plogit(*args) -> None:
-    print(*args, file=_lfd, flush=True)
-    print(*args, file=sys.stdout)
+    logit(*args)
+    if _log:
+        print(*args, file=sys.stdout)
+    return None
+
+def errlogit(*args) -> None:
+    ''' log an error, the log file is flushed after it is written
+    '''
+    if _log:
+        _log.error(*args)
+    print(*args, file=sys.stderr)
     return None
 
 
@@ -41,30 +71,54 @@ _tableau = None
 _foundation = None
 _waste = None
 _show_hidden = False
+_tableau_class = T.Tableau
+_solver_mode = 'best'
+_solver_mem_mb = 256.0
+_solver_seconds = 0.2
+_deal = None
+_deal_range = 1_000_000
+_game_log = None
+_deal_index = None
+_difficulty = None
+_winnable_pool = None
+_hinter = None
+_solve_cache = None
 
 
 def new_deal(cmd_args: ty.List[C.Card]) -> bool:
-    global _deck, _tableau, _foundation, _waste
-    _deck = D.Deck()
+    global _deck, _tableau, _foundation, _waste, _deal
+    _deal = None
+    if _deal_index and _difficulty:
+        _deal = _deal_index.pick(_difficulty)
+    elif _winnable_pool:
+        _deal = _winnable_pool.get()
+        logit(f'winnable pool: {_winnable_pool}')
+    if _deal is None:
+        _deal = random.randrange(_deal_range)
+    _deck = D.Deck(D.numbered_shuffle(_deal))
     _foundation = F.Foundation()
     # deal out the cards for the tableau, cars arranged init
-    t_cards = [_deck.deal_cards(x) for x in range(1, T.Tableau.cols() + 1)]
-    _tableau = T.Tableau(t_cards, _foundation)
+    t_cards = [_deck.deal_cards(x) for x in range(1, L.current().cols + 1)]
+    _tableau = _tableau_class(t_cards, _foundation)
     _waste = SW.StockWaste(_deck.deal_cards())
+    if _game_log:
+        _game_log.start(_deal)
+    M.games_started.inc()
     return True
 
 
-def stock_to_waste(cmd_args: ty.List[int]) -> None:
+def stock_to_waste(cmd_args: ty.List[int]) -> bool:
     ''' turn over the stock pile and put it on the waste/discard pile
         cmd_args should be empty
         cmd is "m"
+    Returns:
+        True iff the move changed the game, as for every move handler
     '''
     print(f'S.stw: {cmd_args}')
-    _waste.stock_to_waste()
-    return None
+    return _waste.stock_to_waste()
 
 
-def waste_to_foundation(cmd_args: ty.List[int]) -> None:
+def waste_to_foundation(cmd_args: ty.List[int]) -> bool:
     ''' Move the top card in the waste to its foundation pile
     Args:
         cmd_args: should be empty
@@ -73,12 +127,13 @@ def waste_to_foundation(cmd_args: ty.List[int]) -> None:
     print(f'S.wtf: {cmd_args}')
     c = _waste.get_waste()
     print(f'wtf: {c}')
-    if _foundation.add_card(_waste.get_waste()):
-        # TODO(epr): accessses waste twice
+    # the waste is empty at the start and after the stock is turned
+    if c and _foundation.add_card(c):
         _waste.pop_waste_card()
-    return None
+        return True
+    return False
 
-def waste_to_tableau(cmd_args: ty.List[int]) -> None:
+def waste_to_tableau(cmd_args: ty.List[int]) -> bool:
     ''' Move card from the waste/discard pile col in tableaeu
     Args:
         cmd_args: col to move to
@@ -86,12 +141,10 @@ def waste_to_tableau(cmd_args: ty.List[int]) -> None:
     '''
     col = cmd_args[0]
     print(f'S.wtt: {col=} -> ')
-    if _tableau.waste_to_tableau(_waste, col):
-        return None
-    return None
+    return _tableau.waste_to_tableau(_waste, col)
 
 
-def tableau_to_foundation(cmd_args: ty.List[int]) -> None:
+def tableau_to_foundation(cmd_args: ty.List[int]) -> bool:
     ''' Move card at cmd_args[0] to its foundation pile
     Args:
         cmd_args: [x] contains pile number
@@ -99,21 +152,16 @@ def tableau_to_foundation(cmd_args: ty.List[int]) -> None:
     '''
     col = cmd_args[0]
     print(f'S.TTF: {cmd_args=}')
-
-    if _tableau.to_foundation(col):
-        return None
-    return None
+    return _tableau.to_foundation(col)
 
 
-def tableau_to_tableau(cmd_args: ty.List[int]) -> None:
+def tableau_to_tableau(cmd_args: ty.List[int]) -> bool:
     ''' Move column from one col to another. The from column can
         be partial.
     cmd is t C C
     '''
     print(f'ttt: {cmd_args}')
-    if _tableau.tableau_to_tableau(cmd_args[0], cmd_args[1]):
-        return None
-    return None
+    return _tableau.tableau_to_tableau(cmd_args[0], cmd_args[1])
 
 
 def foundation_to_tableau(cmd_args: ty.List[int]) -> None:
@@ -130,14 +178,61 @@ def replay(cmd_args: ty.List[int]) -> None:
 
 
 def hint(cmd_args: ty.List[int]) -> None:
-    print('Hint Not Available.')
-    #input('no hint')
+    ''' the next move of the background search, at once, or say there
+        is no background search
+    cmd is "h"
+    '''
+    if not _hinter:
+        print('Hint Not Available.')
+        return None
+    found = _hinter.latest()
+    logit(f'Hint: {found}')
+    if found.done and found.moves:
+        print(f'Hint: {found.moves[0].cmd_line}')
+    elif found.best:
+        print(f'Hint, best line so far: {found.best[0].cmd_line} ({found})')
+    else:
+        print(f'No hint yet: {found}')
     return None
 
 
-def solve(cmd_args: ty.List[int]) -> None:
-    print('Solve Not Available.')
-    return None
+def solve(cmd_args: ty.List[int]) -> ty.List[psc.SolCmd]:
+    ''' search for a win from the current table, with a background
+        worker its latest result, without one best first for
+        _solver_seconds and, if that decides nothing, an anytime search
+        for as long again for the best line
+    Returns:
+        the SolCmd list that wins, empty if none was found
+    cmd is "s"
+    '''
+    if _hinter:
+        result = _hinter.latest()
+        if not result.done:
+            plogit(f'Solve: {result}')
+            print(' '.join(c.cmd_line for c in result.moves))
+            return []
+    else:
+        start = SV.state_from_game(_tableau, _foundation, _waste)
+        result = _solve_cache.get(start) if _solve_cache else None
+        if result is None:
+            # the search state holds the hidden cards, so this is a
+            # perfect information search with or without --show_hidden
+            result = SV.solve(start, 'best', mem_mb=_solver_mem_mb,
+                              seconds=_solver_seconds)
+            if result.status == SV.SolveStatus.INCONCLUSIVE:
+                # best first has no line to show, deepening always does
+                result = SV.solve(start, 'deepening', mem_mb=_solver_mem_mb,
+                                  seconds=_solver_seconds)
+            if _solve_cache:
+                _solve_cache.put(start, result)
+    plogit(f'Solve: {result}')
+    moves = result.moves
+    if moves:
+        print(' '.join(c.cmd_line for c in moves))
+    elif result.best:
+        # an anytime search still has a line worth showing
+        print('best so far: ' + ' '.join(c.cmd_line for c in result.best))
+    return moves
 
 
 def sol_quit(cmd_args: ty.List[int]) -> None:
@@ -173,6 +268,32 @@ def show_cmds(cmd_args: ty.List[int]) -> None:
 
 
 
+def play_cmd(tableau: T.Tableau, foundation: F.Foundation,
+             stock_waste: SW.StockWaste, cmd: psc.SolCmd) -> bool:
+    ''' run a move command against the given engine objects rather
+        than the module globals, e.g. to replay solver output headless.
+    Returns:
+        True iff the move changed the game
+    '''
+    cargs = cmd.cargs
+    match cmd.cmd:
+        case psc.SolActs.STOCK_TO_WASTE:
+            return stock_waste.stock_to_waste()
+        case psc.SolActs.WASTE_FOUNDATION:
+            card = stock_waste.get_waste()
+            if card and foundation.add_card(card):
+                stock_waste.pop_waste_card()
+                return True
+            return False
+        case psc.SolActs.WASTE_TO_TABLEAU:
+            return tableau.waste_to_tableau(stock_waste, cargs[0])
+        case psc.SolActs.TABLEAU_TO_FOUNDATION:
+            return tableau.to_foundation(cargs[0])
+        case psc.SolActs.TABLEAU_TO_TABLEAU:
+            return tableau.tableau_to_tableau(cargs[0], cargs[1])
+    return False
+
+
 _cmd_table = {
     psc.SolActs.NEW_DEAL : new_deal,
     psc.SolActs.WASTE_FOUNDATION: waste_to_foundation,
@@ -190,6 +311,15 @@ _cmd_table = {
 }
 
 
+def deal_index(path: str) -> DI.DealIndex:
+    ''' load the --deal_index file, argparse reports a bad one
+    '''
+    try:
+        return DI.DealIndex(path)
+    except (OSError, ValueError) as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
 def print_table(show_hidden: bool=False):
     ''' Prints the current status of the table
     '''
@@ -198,27 +328,33 @@ def print_table(show_hidden: bool=False):
     #   last step in refactoring
     print(BREAK_STRING)
     print('Waste \t Stock \t\t\t\t Foundation')
-    print('{}\t{}\t\t{}\t{}\t{}\t{}'.format(_waste.get_waste(),
-            _waste.get_stock(), 
-            _foundation.top_card_str(C.Suits.SPADE),
-            _foundation.top_card_str(C.Suits.HEART), 
-            _foundation.top_card_str(C.Suits.DIAMOND),
-            _foundation.top_card_str(C.Suits.CLUB))
-          )
-    print('\nTableau\n\t1\t2\t3\t4\t5\t6\t7\n')
+    # a row of stacks per deck, see layout
+    tops = ['\t'.join(_foundation.top_card_str(s, k)
+                      for s in (C.Suits.SPADE, C.Suits.HEART,
+                                C.Suits.DIAMOND, C.Suits.CLUB))
+            for k in range(L.current().decks)]
+    print('{}\t{}\t\t{}'.format(_waste.get_waste(), _waste.get_stock(),
+                                 '\n\t\t\t'.join(tops)))
+    print('\nTableau\n' + ''.join(f'\t{x}' for x in
+                                  range(1, len(_tableau.flipped) + 1))
+          + '\n')
     # Print the cards, first printing the unflipped cards,
     # and then the flipped.
+    unflipped = _tableau.unflipped
+    flipped = _tableau.flipped
+    if show_hidden:
+        # once per table, not per cell
+        for col in range(len(flipped)):
+            uf = ', '.join([str(c) for c in unflipped[col]])
+            logit(f'{col=}:{len(unflipped[col])}:{uf}')
     for pile_depth in range(_tableau.pile_length()):
         print_str = ''
-        for col in range(T.Tableau.cols()):
-            hidden_cards = _tableau.unflipped[col]
-            shown_cards = _tableau.flipped[col]
+        for col in range(len(flipped)):
+            hidden_cards = unflipped[col]
+            shown_cards = flipped[col]
             if len(hidden_cards) > pile_depth:
                 if show_hidden:
-                    logit(f'{pile_depth=}, {len(hidden_cards)=}')
-                    uf = ', '.join([str(c) for c in _tableau.unflipped[col]])
-                    logit(f'{col=}:{uf}')
-                    print_str += f'\t{UNDER}{str(_tableau.unflipped[col][pile_depth])}'
+                    print_str += f'\t{UNDER}{str(hidden_cards[pile_depth])}'
                 else:
                     print_str += '\tx'
             elif len(shown_cards) + len(hidden_cards) > pile_depth:
@@ -240,12 +376,105 @@ if __name__ == '__main__':
                         action='store_true',
                         help='show the hidden cards')
     parser.add_argument('--log_file', '-l',
-                        type=argparse.FileType('w'),
                         default='S.log',
-                        help='define the log file: def: (default)s')
+                        help='define the log file: def: %(default)s')
+    parser.add_argument('--log_max_bytes',
+                        type=int,
+                        default=0,
+                        help='rotate the log at this size, 0 never '
+                             'def: %(default)s')
+    parser.add_argument('--log_policy',
+                        choices=[p.value for p in LW.Policy],
+                        default=LW.Policy.DROP.value,
+                        help='when the log queue is full def: %(default)s')
+    parser.add_argument('--tableau',
+                        choices=T.backends(),
+                        default='dict',
+                        help='tableau storage def: %(default)s')
+    parser.add_argument('--layout',
+                        choices=L.layouts(),
+                        default='klondike',
+                        help='decks and columns def: %(default)s')
+    parser.add_argument('--solver',
+                        choices=SV.modes(),
+                        default=_solver_mode,
+                        help='background solver search mode '
+                             'def: %(default)s')
+    parser.add_argument('--solver_mem_mb',
+                        type=float,
+                        default=_solver_mem_mb,
+                        help='solver memory budget in MB def: %(default)s')
+    parser.add_argument('--solver_seconds',
+                        type=float,
+                        default=_solver_seconds,
+                        help='without the background solver "s" runs '
+                             'best first for this long, then deepening '
+                             'as long for a best line def: %(default)s')
+    parser.add_argument('--game_log', '-g',
+                        type=argparse.FileType('a'),
+                        default=None,
+                        help='append the games played to this file')
+    parser.add_argument('--deal_index',
+                        type=deal_index,
+                        default=None,
+                        help='a deal index built by deal_index.py')
+    parser.add_argument('--difficulty',
+                        choices=DI.BUCKETS,
+                        default=None,
+                        help='deal from this bucket of the deal index')
+    parser.add_argument('--winnable', '-w',
+                        action='store_true',
+                        help='only deal games the solver has won')
+    parser.add_argument('--solve_cache',
+                        type=pl.Path,
+                        default=pl.Path('solve_cache.db'),
+                        help='solver results kept across sessions '
+                             'def: %(default)s')
+    parser.add_argument('--no_solve_cache',
+                        action='store_true',
+                        help='always search, keep nothing')
+    parser.add_argument('--metrics_port',
+                        type=int,
+                        default=None,
+                        help='serve counters on 127.0.0.1:port/metrics')
+    parser.add_argument('--background_solver',
+                        action=argparse.BooleanOptionalAction,
+                        default=True,
+                        help='search each position in a worker process so '
+                             'h and s answer at once def: %(default)s')
     args = parser.parse_args()
-    set_log_file(args.log_file)
+    if args.layout != 'klondike' and args.deal_index:
+        parser.error('a deal index labels klondike deals')
+    L.use(args.layout)
+    set_log_file(args.log_file, max_bytes=args.log_max_bytes,
+                 policy=LW.Policy(args.log_policy))
     _show_hidden = args.show_hidden
+    _tableau_class = T.backend(args.tableau)
+    _solver_mode = args.solver
+    _solver_mem_mb = args.solver_mem_mb
+    _solver_seconds = args.solver_seconds
+    _deal_index = args.deal_index
+    _difficulty = args.difficulty
+    if args.winnable:
+        _winnable_pool = DP.WinnablePool(
+            cache=None if args.no_solve_cache else args.solve_cache)
+    if args.game_log:
+        _game_log = GL.GameLog(args.game_log)
+    if args.metrics_port is not None:
+        M.serve(args.metrics_port)
+        if _log:
+            M.gauge('log_queue_depth', 'log records waiting',
+                    lambda: _log.depth)
+        if _winnable_pool:
+            M.gauge('winnable_pool_depth', 'winnable deals ready',
+                    lambda: _winnable_pool.depth)
+    if not args.no_solve_cache:
+        _solve_cache = SC.SolveCache(args.solve_cache)
+    if args.background_solver:
+        _hinter = HW.HintWorker(_solver_mode, False,
+                                None if args.no_solve_cache
+                                else args.solve_cache,
+                                mem_mb=_solver_mem_mb)
     new_deal([])
 
     print(BREAK_STRING)
@@ -255,18 +484,41 @@ if __name__ == '__main__':
 
     while True:
         while not _foundation.game_won():
+            if _hinter:
+                # a no-op unless the table changed
+                _hinter.restart(SV.state_from_game(_tableau, _foundation,
+                                                   _waste))
             try:
                 sol_cmd = psc.parse_sol_cmds()
             except psc.InvalidCmd as e_ic:
-                print(e_ic)
+                errlogit(e_ic)
                 continue
+            logit(f'LOOP: {sol_cmd}')
             print(f'LOOP: {sol_cmd}')
-            _cmd_table[sol_cmd.cmd](sol_cmd.cargs)
+            changed = _cmd_table[sol_cmd.cmd](sol_cmd.cargs)
+            # only moves that changed the table are counted and logged,
+            # the move handlers return True for those
+            if sol_cmd.cmd in psc.MOVE_ACTS and changed:
+                M.moves.inc(1, sol_cmd.cmd.name)
+                if _game_log:
+                    _game_log.move(sol_cmd, SN.pack(_tableau, _foundation,
+                                                    _waste))
             print_table(args.show_hidden)
 
+        # the game ends, and is counted won, once; the next deal starts
+        # a new one
+        M.games_won.inc()
+        if _game_log:
+            _game_log.end(True)
         print('Congratulations! You\'ve won!')
         y = input('Another?')
-        if y[0] == 'y':
+        if y[:1] != 'y':
             break
+        new_deal([])
+        print_table(args.show_hidden)
+    if _hinter:
+        _hinter.close()
+    if _solve_cache:
+        _solve_cache.close()
     print('Bye!')
 
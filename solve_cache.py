@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' A persistent cache of solver results, an SQLite file.
+    The key is a hash of the snapshot bytes of a state's canonical
+    form under suit swaps, see symmetry.canonical_key, so the four
+    suit swapped twins of a position share a row; moves name columns
+    so a line plays the same in each. A row holds the verdict, the best
+    move and for a solved state the moves left to the win. A solve stores
+    every state along its winning line, so a later game passing through
+    any of them reads the rest of the line back move by move.
+    Unsolvable is a proof and always a hit; an inconclusive search is
+    only a hit for a node limit no bigger than the one it ran with.
+    The file is in WAL mode so pool workers, each with their own
+    connection, read while one writes. Rows record when they were last
+    used and the least recently used are evicted past max_rows. Hit and
+    miss counts are kept per connection and added to the file's totals
+    by flush().
+'''
+
+import argparse
+import atexit
+import concurrent.futures as cf
+import hashlib
+import os
+import pathlib as pl
+import sqlite3
+import time
+import typing as ty
+
+import metrics as M
+import parse_sol_cmds as psc
+import solver as SV
+import symmetry as SY
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS solves (
+    key BLOB PRIMARY KEY,
+    status INTEGER NOT NULL,
+    move INTEGER,
+    distance INTEGER,
+    nodes INTEGER NOT NULL,
+    budget INTEGER NOT NULL,
+    used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS solves_used ON solves (used);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+
+_solved = SV.SolveStatus.SOLVED.value
+_inconclusive = SV.SolveStatus.INCONCLUSIVE.value
+_counters = ('lookups', 'hits', 'misses', 'writes', 'evicted')
+
+
+def state_key(state: SV.State) -> bytes:
+    ''' the cache key of state '''
+    return hashlib.blake2b(SY.canonical_key(state),
+                           digest_size=16).digest()
+
+
+def _move_code(move: SV.Move) -> int:
+    act, cargs = move
+    code = int(act)
+    for c in cargs:
+        code = code << 4 | c + 1
+    return code << 4 * (2 - len(cargs))
+
+
+def _code_move(code: int) -> SV.Move:
+    ''' the inverse of _move_code '''
+    second, first, act = code & 0xf, code >> 4 & 0xf, code >> 8
+    return (psc.SolActs(act),
+            tuple(c - 1 for c in (first, second) if c))
+
+
+class SolveCache():
+    ''' one connection to a cache file
+    '''
+    def __init__(self, path: pl.Path, max_rows: int=1_000_000,
+                 timeout: float=30.0):
+        '''
+        Args:
+            path: the SQLite file, made if missing
+            max_rows: evict down to this many rows, least recently used
+                first
+            timeout: seconds to wait for another writer
+        '''
+        self._path = pl.Path(path)
+        self._max_rows = max_rows
+        self._db = sqlite3.connect(self._path, timeout=timeout)
+        self._wal(timeout)
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_schema)
+        self._counts = dict.fromkeys(_counters, 0)
+        self._flushed = dict.fromkeys(_counters, 0)
+        # hits only update used when flushed, so reads stay reads
+        self._touched = set()
+        self._writes_since_trim = 0
+
+    @property
+    def path(self) -> pl.Path:
+        return self._path
+
+    def _wal(self, timeout: float) -> None:
+        ''' put the file in WAL mode, it stays so. Switching needs the
+            file to itself and does not wait for a busy one, so when two
+            processes open a new file at once one retries.
+        '''
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                mode = self._db.execute('PRAGMA journal_mode').fetchone()[0]
+                if mode != 'wal':
+                    self._db.execute('PRAGMA journal_mode=WAL')
+                return None
+            except sqlite3.OperationalError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.01)
+
+    def _row(self, key: bytes):
+        return self._db.execute(
+            'SELECT status, move, distance, nodes, budget FROM solves '
+            'WHERE key = ?', (key,)).fetchone()
+
+    def _line(self, state: SV.State, distance: int) \
+            -> ty.List[SV.Move] | None:
+        ''' the cached winning line from state, None if a row along it
+            has been evicted. A later solve may have stored a shorter
+            line from a state further along, which wins all the same,
+            so each row only has to be no further from the win than
+            the one before it said.
+        '''
+        moves = []
+        while not SV.is_won(state):
+            key = state_key(state)
+            row = self._row(key)
+            if row is None or row[0] != _solved \
+                    or not 0 < row[2] <= distance:
+                return None
+            move = _code_move(row[1])
+            if not SV.is_legal(state, move):
+                return None
+            self._touched.add(key)
+            moves.append(move)
+            state = SV.apply_move(state, move)
+            distance = row[2] - 1
+        return moves
+
+    def get(self, state: SV.State, max_nodes: int=1_000_000) \
+            -> SV.SolveResult | None:
+        ''' the cached result for a search of state with max_nodes, None
+            on a miss
+        '''
+        self._counts['lookups'] += 1
+        M.cache_lookups.inc()
+        key = state_key(state)
+        row = self._row(key)
+        result = None
+        if row is not None:
+            status, move, distance, nodes, budget = row
+            status = SV.SolveStatus(status)
+            if status == SV.SolveStatus.SOLVED:
+                moves = self._line(state, distance)
+                if moves is not None:
+                    result = SV.SolveResult(status,
+                                            [SV.move_to_cmd(m)
+                                             for m in moves],
+                                            nodes, False, 'cached')
+            elif status == SV.SolveStatus.UNSOLVABLE or budget >= max_nodes:
+                result = SV.SolveResult(status, [], nodes, False,
+                                        f'cached, node limit {budget}')
+        if result is None:
+            self._counts['misses'] += 1
+        else:
+            self._counts['hits'] += 1
+            M.cache_hits.inc()
+            self._touched.add(key)
+        return result
+
+    def put(self, state: SV.State, result: SV.SolveResult,
+            max_nodes: int=1_000_000) -> None:
+        ''' store result, a search of state with max_nodes.
+            A solved line is stored state by state and only replaces
+            a longer one.
+        '''
+        now = time.time()
+        rows = []
+        if result.status == SV.SolveStatus.SOLVED:
+            moves = [(c.cmd, tuple(c.cargs)) for c in result.moves]
+            for i, move in enumerate(moves):
+                rows.append((state_key(state), result.status.value,
+                             _move_code(move), len(moves) - i,
+                             result.nodes if i == 0 else 0, max_nodes, now))
+                state = SV.apply_move(state, move)
+        elif result.status == SV.SolveStatus.UNSOLVABLE \
+                or not result.mem_capped and result.nodes > max_nodes:
+            # a search cut by memory or a deadline says nothing about
+            # max_nodes
+            rows.append((state_key(state), result.status.value, None, None,
+                         result.nodes, max_nodes, now))
+        if not rows:
+            return None
+        with self._db:
+            self._db.executemany(
+                'INSERT INTO solves VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET status = excluded.status, '
+                'move = excluded.move, distance = excluded.distance, '
+                'nodes = excluded.nodes, budget = excluded.budget, '
+                'used = excluded.used '
+                f'WHERE (excluded.status = {_solved} AND (solves.status != '
+                f'{_solved} OR excluded.distance < solves.distance)) '
+                f'OR (solves.status = {_inconclusive} AND (excluded.status '
+                f'!= {_inconclusive} OR excluded.budget > solves.budget))',
+                rows)
+        self._counts['writes'] += len(rows)
+        self._writes_since_trim += len(rows)
+        if self._writes_since_trim > self._max_rows // 16:
+            self.trim()
+        return None
+
+    def solve(self, start: SV.State, mode: str='best', **kwargs) \
+            -> SV.SolveResult:
+        ''' SV.solve through the cache, kwargs as for SV.solve
+        '''
+        max_nodes = kwargs.get('max_nodes', 1_000_000)
+        result = self.get(start, max_nodes)
+        if result is None:
+            result = SV.solve(start, mode, **kwargs)
+            self.put(start, result, max_nodes)
+        return result
+
+    def trim(self) -> int:
+        ''' evict the least recently used rows past max_rows
+        Returns:
+            the rows evicted
+        '''
+        self._writes_since_trim = 0
+        self._flush_touched()
+        with self._db:
+            rows = self._db.execute('SELECT count(*) FROM solves').fetchone()
+            excess = rows[0] - self._max_rows
+            if excess <= 0:
+                return 0
+            # a little more, so a full cache does not trim every write
+            excess += self._max_rows // 16
+            self._db.execute(
+                'DELETE FROM solves WHERE key IN '
+                '(SELECT key FROM solves ORDER BY used LIMIT ?)', (excess,))
+        self._counts['evicted'] += excess
+        return excess
+
+    def _flush_touched(self) -> None:
+        if not self._touched:
+            return
+        now = time.time()
+        with self._db:
+            self._db.executemany('UPDATE solves SET used = ? WHERE key = ?',
+                                 ((now, k) for k in self._touched))
+        self._touched.clear()
+
+    def flush(self) -> None:
+        ''' record hits as uses and add the counts to the file totals
+        '''
+        self._flush_touched()
+        delta = [(name, self._counts[name] - self._flushed[name])
+                 for name in _counters]
+        with self._db:
+            self._db.executemany(
+                'INSERT INTO stats VALUES (?, ?) ON CONFLICT (name) '
+                'DO UPDATE SET value = value + excluded.value', delta)
+        self._flushed = dict(self._counts)
+
+    def stats(self) -> ty.Dict[str, int]:
+        ''' this connection's counts '''
+        return dict(self._counts)
+
+    def totals(self) -> ty.Dict[str, int]:
+        ''' the counts of every connection that flushed, and the rows '''
+        totals = dict.fromkeys(_counters, 0)
+        totals.update(self._db.execute('SELECT name, value FROM stats'))
+        totals['rows'] = self._db.execute(
+            'SELECT count(*) FROM solves').fetchone()[0]
+        return totals
+
+    def close(self) -> None:
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def __enter__(self) -> 'SolveCache':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        c = self._counts
+        rate = 100 * c['hits'] / c['lookups'] if c['lookups'] else 0.0
+        return f'{self._path}: hits:{c["hits"]}/{c["lookups"]} ' \
+               f'({rate:.1f}%) writes:{c["writes"]} evicted:{c["evicted"]}'
+
+
+# one connection per process and path, for pool workers
+_opened = {}
+
+
+def open_cache(path: pl.Path, **kwargs) -> SolveCache:
+    ''' this process's connection to path, kept open and closed at
+        exit. Pool workers leave without running atexit, so flush after
+        each job as solve() does.
+    '''
+    key = (os.getpid(), pl.Path(path))
+    if key not in _opened:
+        cache = SolveCache(path, **kwargs)
+        _opened[key] = cache
+        atexit.register(cache.close)
+    return _opened[key]
+
+
+def solve(start: SV.State, mode: str='best', cache: pl.Path | None=None,
+          **kwargs) -> SV.SolveResult:
+    ''' SV.solve, through this process's connection to cache if given
+    '''
+    if cache is None:
+        return SV.solve(start, mode, **kwargs)
+    connection = open_cache(cache)
+    result = connection.solve(start, mode, **kwargs)
+    connection.flush()
+    return result
+
+
+def _solve_deal(path: pl.Path, deal: int, max_nodes: int) \
+        -> SV.SolveResult:
+    return solve(SV.deal_state(deal), 'best', path, max_nodes=max_nodes)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve through the cache')
+    parser.add_argument('--cache', '-c',
+                        type=pl.Path,
+                        default=pl.Path('solve_cache.db'),
+                        help='cache file default: %(default)s')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=40,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=20000,
+                        help='solver node limit default: %(default)s')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='pool size default: %(default)s')
+    parser.add_argument('--stats',
+                        action='store_true',
+                        help='only print the file totals')
+    args = parser.parse_args()
+    if not args.stats:
+        deals = range(args.first, args.first + args.deals)
+        for rnd in ('first', 'second'):
+            start = time.perf_counter()
+            with cf.ProcessPoolExecutor(max_workers=args.workers) as pool:
+                done = list(pool.map(_solve_deal, [args.cache] * len(deals),
+                                     deals, [args.max_nodes] * len(deals)))
+            hits = sum(r.reason.startswith('cached') for r in done)
+            print(f'{rnd} pass: {len(deals)} deals in '
+                  f'{time.perf_counter() - start:.2f}s, {hits} cache hits')
+        # mid game positions of a solved line are hits too
+        with SolveCache(args.cache) as cache:
+            state = SV.deal_state(args.first)
+            result = cache.get(state, args.max_nodes)
+            if result and result.moves:
+                for c in result.moves[:len(result.moves) // 2]:
+                    state = SV.apply_move(state, (c.cmd, tuple(c.cargs)))
+                mid = cache.get(state, args.max_nodes)
+                print(f'deal {args.first} half way: {mid}')
+    with SolveCache(args.cache) as cache:
+        print(', '.join(f'{k}:{v}' for k, v in cache.totals().items()))
@@ -0,0 +1,658 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Memory bounded solver for the solitaire engine.
+    The search runs over a compact tuple version of the game, cards are
+    ints (Card.id) so states are cheap to
+    hash and share the columns that a move does not touch.
+    The answer is a list of psc.SolCmd, i.e., what the "s" command
+    would run through solitaire._cmd_table.
+'''
+
+import argparse
+import enum
+import heapq
+import itertools as it
+import random
+import sys
+import time
+import typing as ty
+
+import cards as C
+import deck as D
+import foundation as F
+import layout as L
+import metrics as M
+import parse_sol_cmds as psc
+import stock_waste as SW
+import tableau as T
+
+_nsuits = len(C.Suits)
+
+# per card id lookup tables, see Card.id
+_value = [c.value for c in C.all_cards()]
+_suit = [c.suit - C.min_suit() for c in C.all_cards()]
+_red = [c.red for c in C.all_cards()]
+
+
+# A state is the tuple (cols, found, stock, waste)
+#   cols: a tuple with a (hidden, shown) tuple pair per tableau column
+#   found: the top value of each foundation stack, stack i holds suit
+#          i % 4 (indexed by suit - 1), four stacks per deck
+#   stock, waste: tuples of card ids, the last one is the "top"
+State = ty.Tuple[ty.Tuple[ty.Tuple[ty.Tuple[int, ...], ty.Tuple[int, ...]],
+                          ...],
+                 ty.Tuple[int, ...],
+                 ty.Tuple[int, ...],
+                 ty.Tuple[int, ...]]
+Move = ty.Tuple[psc.SolActs, ty.Tuple[int, ...]]
+# progress(nodes, best line so far), the line to the best scored state,
+# the same list object while that line is unchanged
+Progress = ty.Callable[[int, ty.List[psc.SolCmd]], None]
+# report(nodes, depth, best reached()) of deepening
+Report = ty.Callable[[int, int, int], None]
+
+
+def state_from_game(tableau: T.Tableau, foundation, stock_waste) -> State:
+    ''' build a search State from the engine objects
+    Args:
+        tableau: a T.Tableau
+        foundation: a F.Foundation
+        stock_waste: a SW.StockWaste
+    '''
+    cols = tableau.id_columns()
+    found = foundation.tops()
+    stock = tuple(c.id for c in stock_waste._stock)
+    waste = tuple(c.id for c in stock_waste._waste)
+    return cols, found, stock, waste
+
+
+def game_from_state(state: State) \
+        -> ty.Tuple[T.Tableau, F.Foundation, SW.StockWaste]:
+    ''' the inverse of state_from_game, builds new engine objects
+    '''
+    cols, found, stock, waste = state
+    f = F.Foundation(len(found))
+    for i, (stack, top) in enumerate(zip(f.stacks(), found)):
+        suit = i % _nsuits + C.min_suit()
+        stack.extend(C.card(v, suit) for v in range(C.ace, top + 1))
+    t = T.Tableau([[] for x in range(len(cols))], f)
+    t.set_columns([[C.card_by_id(c) for c in h] for h, s in cols],
+                  [[C.card_by_id(c) for c in s] for h, s in cols])
+    sw = SW.StockWaste([C.card_by_id(c) for c in stock])
+    sw._waste.extend(C.card_by_id(c) for c in waste)
+    return t, f, sw
+
+
+def is_won(state: State) -> bool:
+    return all(v == C.king for v in state[1])
+
+
+def _fits_foundation(found: ty.Tuple[int, ...], cid: int) -> bool:
+    if len(found) == _nsuits:
+        return found[_suit[cid]] + 1 == _value[cid]
+    return _foundation_for(found, cid) is not None
+
+
+def _foundation_for(found: ty.Tuple[int, ...], cid: int) -> int | None:
+    ''' the first foundation stack of cid's suit that it fits, the one
+        F.Foundation.add_card puts it on
+    '''
+    v = _value[cid] - 1
+    for i in range(_suit[cid], len(found), _nsuits):
+        if found[i] == v:
+            return i
+    return None
+
+
+def _to_foundation(found: ty.Tuple[int, ...], cid: int) \
+        -> ty.Tuple[int, ...]:
+    i = _suit[cid] if len(found) == _nsuits else _foundation_for(found, cid)
+    return found[:i] + (_value[cid],) + found[i + 1:]
+
+
+def _fits_on(cid: int, top: int) -> bool:
+    ''' True iff cid can go on top in the tableau
+    '''
+    return _red[cid] != _red[top] and _value[cid] + 1 == _value[top]
+
+
+def legal_moves(state: State) -> ty.List[Move]:
+    ''' the moves the engine accepts from state, the most promising
+        kinds first: to foundation, tableau shuffles, waste, stock.
+        Moves the engine would crash on (non-king to an empty column)
+        or that can not change anything are left out.
+    '''
+    cols, found, stock, waste = state
+    ncols = len(cols)
+    moves = []
+    for x, (hidden, shown) in enumerate(cols):
+        if shown and _fits_foundation(found, shown[-1]):
+            moves.append((psc.SolActs.TABLEAU_TO_FOUNDATION, (x,)))
+    if waste and _fits_foundation(found, waste[-1]):
+        moves.append((psc.SolActs.WASTE_FOUNDATION, ()))
+    for srcc, (shidden, sshown) in enumerate(cols):
+        if not sshown:
+            continue
+        for dstc in range(ncols):
+            if dstc == srcc:
+                continue
+            dshown = cols[dstc][1]
+            if not dshown:
+                # only a king run, and only if it uncovers something
+                if _value[sshown[0]] == C.king and shidden:
+                    moves.append((psc.SolActs.TABLEAU_TO_TABLEAU,
+                                  (srcc, dstc)))
+                continue
+            # the shown cards are a run so only one index can attach
+            index = _value[sshown[0]] - _value[dshown[-1]] + 1
+            if 0 <= index < len(sshown) \
+                    and _fits_on(sshown[index], dshown[-1]):
+                moves.append((psc.SolActs.TABLEAU_TO_TABLEAU, (srcc, dstc)))
+    if waste:
+        for dstc, (hidden, shown) in enumerate(cols):
+            if shown:
+                if _fits_on(waste[-1], shown[-1]):
+                    moves.append((psc.SolActs.WASTE_TO_TABLEAU, (dstc,)))
+            elif _value[waste[-1]] == C.king:
+                moves.append((psc.SolActs.WASTE_TO_TABLEAU, (dstc,)))
+    if stock or len(waste) > 1:
+        moves.append((psc.SolActs.STOCK_TO_WASTE, ()))
+    return moves
+
+
+def is_legal(state: State, move: Move) -> bool:
+    ''' True iff the engine would make move from state, a wider test
+        than legal_moves, which leaves out moves that can not help.
+    '''
+    cols, found, stock, waste = state
+    act, cargs = move
+    ncols = len(cols)
+    match act:
+        case psc.SolActs.STOCK_TO_WASTE:
+            return bool(stock or waste)
+        case psc.SolActs.WASTE_FOUNDATION:
+            return bool(waste) and _fits_foundation(found, waste[-1])
+        case psc.SolActs.WASTE_TO_TABLEAU:
+            if not waste or len(cargs) != 1 or not 0 <= cargs[0] < ncols:
+                return False
+            shown = cols[cargs[0]][1]
+            if shown:
+                return _fits_on(waste[-1], shown[-1])
+            return _value[waste[-1]] == C.king
+        case psc.SolActs.TABLEAU_TO_FOUNDATION:
+            if len(cargs) != 1 or not 0 <= cargs[0] < ncols:
+                return False
+            shown = cols[cargs[0]][1]
+            return bool(shown) and _fits_foundation(found, shown[-1])
+        case psc.SolActs.TABLEAU_TO_TABLEAU:
+            if len(cargs) != 2 or cargs[0] == cargs[1] \
+                    or not all(0 <= c < ncols for c in cargs):
+                return False
+            sshown = cols[cargs[0]][1]
+            dshown = cols[cargs[1]][1]
+            if not sshown:
+                return False
+            if not dshown:
+                return _value[sshown[0]] == C.king
+            index = _value[sshown[0]] - _value[dshown[-1]] + 1
+            return 0 <= index < len(sshown) \
+                and _fits_on(sshown[index], dshown[-1])
+    return False
+
+
+def _reveal(hidden: ty.Tuple[int, ...], shown: ty.Tuple[int, ...]):
+    ''' Tableau.flip_card for an emptied column
+    '''
+    if not shown and hidden:
+        return hidden[:-1], hidden[-1:]
+    return hidden, shown
+
+
+def apply_move(state: State, move: Move) -> State:
+    ''' returns the state after move, move must come from legal_moves.
+        Columns that the move does not touch are shared with state.
+    '''
+    cols, found, stock, waste = state
+    act, cargs = move
+    match act:
+        case psc.SolActs.STOCK_TO_WASTE:
+            if not stock:
+                stock, waste = waste[::-1], ()
+            return cols, found, stock[:-1], waste + stock[-1:]
+        case psc.SolActs.WASTE_FOUNDATION:
+            found = _to_foundation(found, waste[-1])
+            return cols, found, stock, waste[:-1]
+        case psc.SolActs.WASTE_TO_TABLEAU:
+            dstc = cargs[0]
+            hidden, shown = cols[dstc]
+            cols = cols[:dstc] + ((hidden, shown + waste[-1:]),) \
+                + cols[dstc + 1:]
+            return cols, found, stock, waste[:-1]
+        case psc.SolActs.TABLEAU_TO_FOUNDATION:
+            srcc = cargs[0]
+            hidden, shown = cols[srcc]
+            found = _to_foundation(found, shown[-1])
+            cols = cols[:srcc] + (_reveal(hidden, shown[:-1]),) \
+                + cols[srcc + 1:]
+            return cols, found, stock, waste
+        case psc.SolActs.TABLEAU_TO_TABLEAU:
+            srcc, dstc = cargs
+            shidden, sshown = cols[srcc]
+            dhidden, dshown = cols[dstc]
+            if dshown:
+                index = _value[sshown[0]] - _value[dshown[-1]] + 1
+            else:
+                index = 0
+            ncols = list(cols)
+            ncols[srcc] = _reveal(shidden, sshown[:index])
+            ncols[dstc] = (dhidden, dshown + sshown[index:])
+            return tuple(ncols), found, stock, waste
+    raise ValueError(f'not a solver move: {act}')
+
+
+def score(state: State) -> int:
+    ''' the heuristic, bigger is closer to a win. Foundation cards
+        count most, then uncovering hidden cards and empty columns.
+    '''
+    cols, found, stock, waste = state
+    hidden = sum(len(h) for h, s in cols)
+    empty = sum(1 for h, s in cols if not s)
+    return 10 * sum(found) - 5 * hidden + empty - len(waste) // 8
+
+
+def reached(state: State) -> int:
+    ''' cards home plus hidden cards turned up, how far a line got;
+        0 at the deal
+    '''
+    cols, found = state[0], state[1]
+    hidden = sum(len(h) for h, s in cols)
+    # column x is dealt x hidden cards
+    return sum(found) + len(cols) * (len(cols) - 1) // 2 - hidden
+
+
+def move_to_cmd(move: Move) -> psc.SolCmd:
+    return psc.SolCmd(move[0], list(move[1]))
+
+
+class SolveStatus(enum.IntEnum):
+    SOLVED = enum.auto()
+    UNSOLVABLE = enum.auto()  # the whole reachable space was searched
+    INCONCLUSIVE = enum.auto()  # a limit stopped the search
+
+
+class SolveResult():
+    ''' what a solve returns
+        moves: the SolCmd list, empty unless solved
+        nodes: number of states expanded
+        mem_capped: True iff the memory budget forced pruning/eviction
+        best: the line to the furthest position reached, from searches
+            that keep one (deepening), else moves
+    '''
+    def __init__(self, status: SolveStatus, moves: ty.List[psc.SolCmd],
+                 nodes: int, mem_capped: bool, reason: str='',
+                 best: ty.List[psc.SolCmd] | None=None):
+        self._status = status
+        self._moves = moves
+        self._nodes = nodes
+        self._mem_capped = mem_capped
+        self._reason = reason
+        self._best = moves if best is None else best
+
+    @property
+    def status(self) -> SolveStatus:
+        return self._status
+
+    @property
+    def moves(self) -> ty.List[psc.SolCmd]:
+        return self._moves
+
+    @property
+    def nodes(self) -> int:
+        return self._nodes
+
+    @property
+    def mem_capped(self) -> bool:
+        return self._mem_capped
+
+    @property
+    def reason(self) -> str:
+        return self._reason
+
+    @property
+    def best(self) -> ty.List[psc.SolCmd]:
+        return self._best
+
+    def __str__(self) -> str:
+        s = f'{self._status.name} moves:{len(self._moves)} ' \
+            f'nodes:{self._nodes}'
+        if self._reason:
+            s += f' ({self._reason})'
+        return s
+
+
+def _node_bytes(state: State) -> int:
+    ''' rough cost in bytes of keeping one more state in the search:
+        a move rebuilds the top level tuples and about two columns,
+        plus the visited dict slot and the open set / path entries.
+    '''
+    cols = state[0]
+    col_bytes = max(sys.getsizeof(h) + sys.getsizeof(s) + sys.getsizeof((h, s))
+                    for h, s in cols)
+    return (sys.getsizeof(state) + sys.getsizeof(cols) + 2 * col_bytes
+            + sys.getsizeof(state[2]) + sys.getsizeof(state[3])
+            + 3 * sys.getsizeof((0, 0, 0, 0)) + 100)
+
+
+def _path_moves(path) -> ty.List[psc.SolCmd]:
+    ''' paths are linked (move, parent) tuples so siblings share them
+    '''
+    moves = []
+    while path:
+        move, path = path
+        moves.append(move_to_cmd(move))
+    moves.reverse()
+    return moves
+
+
+def _evict(visited: ty.Dict[State, None], keep: int) -> None:
+    ''' drop the oldest entries of visited until keep remain
+    '''
+    for key in list(it.islice(visited, len(visited) - keep)):
+        del visited[key]
+
+
+def best_first(start: State, mem_mb: float=256.0,
+               max_nodes: int=1_000_000, progress: Progress | None=None,
+               report_every: int=1000,
+               seconds: float | None=None) -> SolveResult:
+    ''' best first search ordered by score().
+        When the estimated memory passes mem_mb the open set is cut to
+        its best half and the oldest half of the visited set is dropped.
+        progress, if given, is called every report_every nodes, so a
+        listener can count them, with the line to the best scored state.
+        seconds: wall clock deadline, None has none
+    '''
+    deadline = None if seconds is None else time.perf_counter() + seconds
+    max_states = max(16, int(mem_mb * 2**20) // _node_bytes(start))
+    counter = it.count()
+    best = (score(start), None)
+    reported = None
+    line = []
+    open_set = [(-best[0], 0, next(counter), start, None)]
+    visited = {start: None}
+    nodes = 0
+    mem_capped = False
+    while open_set:
+        neg, depth, _, state, path = heapq.heappop(open_set)
+        if is_won(state):
+            return SolveResult(SolveStatus.SOLVED, _path_moves(path), nodes,
+                               mem_capped)
+        nodes += 1
+        if nodes > max_nodes:
+            return SolveResult(SolveStatus.INCONCLUSIVE, [], nodes,
+                               mem_capped, f'node limit {max_nodes}')
+        if deadline and nodes % 64 == 0 and time.perf_counter() > deadline:
+            return SolveResult(SolveStatus.INCONCLUSIVE, [], nodes,
+                               mem_capped, f'deadline {seconds}s')
+        for move in legal_moves(state):
+            child = apply_move(state, move)
+            if child in visited:
+                continue
+            visited[child] = None
+            child_score = score(child)
+            heapq.heappush(open_set, (-child_score, depth + 1,
+                                      next(counter), child, (move, path)))
+            if child_score > best[0]:
+                best = (child_score, (move, path))
+        if progress and nodes % report_every == 0:
+            if best[1] is not reported:
+                reported = best[1]
+                line = _path_moves(reported)
+            progress(nodes, line)
+        if len(open_set) + len(visited) > max_states:
+            mem_capped = True
+            open_set = heapq.nsmallest(max(1, len(open_set) // 2), open_set)
+            heapq.heapify(open_set)
+            _evict(visited, max_states // 2)
+    if mem_capped:
+        return SolveResult(SolveStatus.INCONCLUSIVE, [], nodes, mem_capped,
+                           f'memory cap {mem_mb}MB pruned the search')
+    return SolveResult(SolveStatus.UNSOLVABLE, [], nodes, mem_capped)
+
+
+def beam(start: State, width: int=1000, mem_mb: float=256.0,
+         max_nodes: int=1_000_000, progress: Progress | None=None) \
+        -> SolveResult:
+    ''' beam search, each depth keeps the width best states by score().
+        The visited set is shared across depths and evicted oldest first
+        once the estimated memory passes mem_mb.
+        progress, if given, is called with the best state of each depth.
+    '''
+    max_states = max(16, int(mem_mb * 2**20) // _node_bytes(start))
+    width = max(1, min(width, max_states // 2))
+    frontier = [(start, None)]
+    visited = {start: None}
+    nodes = 0
+    mem_capped = False
+    truncated = False
+    while frontier:
+        children = []
+        for state, path in frontier:
+            if is_won(state):
+                return SolveResult(SolveStatus.SOLVED, _path_moves(path),
+                                   nodes, mem_capped)
+            nodes += 1
+            for move in legal_moves(state):
+                child = apply_move(state, move)
+                if child in visited:
+                    continue
+                visited[child] = None
+                children.append((score(child), child, (move, path)))
+        if nodes > max_nodes:
+            return SolveResult(SolveStatus.INCONCLUSIVE, [], nodes,
+                               mem_capped, f'node limit {max_nodes}')
+        if len(children) > width:
+            truncated = True
+            children = heapq.nlargest(width, children, key=lambda c: c[0])
+        if progress and children:
+            progress(nodes, _path_moves(max(children,
+                                            key=lambda c: c[0])[2]))
+        frontier = [(child, path) for s, child, path in children]
+        if len(visited) + len(frontier) > max_states:
+            mem_capped = True
+            _evict(visited, max_states // 2)
+    if mem_capped:
+        return SolveResult(SolveStatus.INCONCLUSIVE, [], nodes, mem_capped,
+                           f'memory cap {mem_mb}MB pruned the search')
+    if truncated:
+        return SolveResult(SolveStatus.INCONCLUSIVE, [], nodes, mem_capped,
+                           f'beam width {width} dropped states')
+    return SolveResult(SolveStatus.UNSOLVABLE, [], nodes, mem_capped)
+
+
+def _children(state: State) -> ty.List[ty.Tuple[Move, State]]:
+    ''' the (move, child) pairs of state, best score() first '''
+    children = [(move, apply_move(state, move))
+                for move in legal_moves(state)]
+    children.sort(key=lambda c: score(c[1]), reverse=True)
+    return children
+
+
+def deepening(start: State, seconds: float | None=None,
+              mem_mb: float=256.0, max_nodes: int=1_000_000, step: int=4,
+              progress: Progress | None=None, report: Report | None=None,
+              report_every: int=1000) -> SolveResult:
+    ''' anytime search: depth first to a depth limit that grows by step
+        each pass, best score() child first, so there is a best line,
+        the one that reached() furthest, from the first few nodes on.
+        A table of the depth each state was searched to skips repeats
+        within a pass, past mem_mb it is cleared, which costs time but
+        drops no line.
+        seconds: wall clock deadline, None has none
+        progress: as for best_first, with the line that reached()
+            furthest
+        report: called with (nodes, depth, best reached()) at the same
+            times and at the end of each pass
+    Returns:
+        SOLVED, UNSOLVABLE when a pass ended without reaching its
+        depth, else INCONCLUSIVE; best is the best line in all cases
+    '''
+    if is_won(start):
+        return SolveResult(SolveStatus.SOLVED, [], 0, False)
+    deadline = None if seconds is None else time.perf_counter() + seconds
+    max_states = max(16, int(mem_mb * 2**20) // _node_bytes(start))
+    best, best_reached = [], reached(start)
+    reported = None
+    line = []
+    nodes = 0
+    mem_capped = False
+    limit = 0
+    stopped = ''
+    while not stopped:
+        limit += step
+        seen = {start: limit}
+        path = []
+        stack = [iter(_children(start))]
+        cutoff = False
+        while stack:
+            move, child = next(stack[-1], (None, None))
+            if move is None:
+                stack.pop()
+                if path:
+                    path.pop()
+                continue
+            left = limit - len(path) - 1
+            if seen.get(child, -1) >= left:
+                continue
+            seen[child] = left
+            nodes += 1
+            path.append(move)
+            if is_won(child):
+                line = [move_to_cmd(m) for m in path]
+                return SolveResult(SolveStatus.SOLVED, line, nodes,
+                                   mem_capped)
+            child_reached = reached(child)
+            if child_reached > best_reached:
+                best, best_reached = list(path), child_reached
+            if nodes % report_every == 0:
+                if best is not reported:
+                    reported = best
+                    line = [move_to_cmd(m) for m in best]
+                if progress:
+                    progress(nodes, line)
+                if report:
+                    report(nodes, limit, best_reached)
+            if nodes > max_nodes:
+                stopped = f'node limit {max_nodes}'
+                break
+            if deadline and nodes % 64 == 0 \
+                    and time.perf_counter() > deadline:
+                stopped = f'deadline {seconds}s at depth {limit}'
+                break
+            if len(seen) > max_states:
+                mem_capped = True
+                seen.clear()
+            if left:
+                stack.append(iter(_children(child)))
+            else:
+                cutoff = True
+                path.pop()
+        if report:
+            report(nodes, limit, best_reached)
+        if not stopped and not cutoff:
+            return SolveResult(SolveStatus.UNSOLVABLE, [], nodes, mem_capped,
+                               best=[move_to_cmd(m) for m in best])
+    return SolveResult(SolveStatus.INCONCLUSIVE, [], nodes, mem_capped,
+                       stopped, [move_to_cmd(m) for m in best])
+
+
+_modes = {
+    'best': best_first,
+    'beam': beam,
+    'deepening': deepening,
+}
+
+def modes() -> ty.List[str]:
+    return list(_modes)
+
+
+def solve(start: State, mode: str='best', **kwargs) -> SolveResult:
+    ''' run the search mode on start
+    Args:
+        mode: one of modes()
+        kwargs: passed to the mode, e.g. mem_mb, max_nodes, width
+    '''
+    began = time.perf_counter()
+    result = _modes[mode](start, **kwargs)
+    M.searched(mode, result.nodes, time.perf_counter() - began)
+    return result
+
+
+def deal_game(deal: int | None=None, tableau_class: type=T.Tableau) \
+        -> ty.Tuple[T.Tableau, F.Foundation, SW.StockWaste]:
+    ''' deal a game the way solitaire.new_deal does
+    Args:
+        deal: the deal number, see D.numbered_shuffle, None is random
+        tableau_class: the tableau backend
+    '''
+    if deal is None:
+        deck = D.Deck()
+    else:
+        deck = D.Deck(D.numbered_shuffle(deal))
+    f = F.Foundation()
+    t = tableau_class([deck.deal_cards(x)
+                       for x in range(1, L.current().cols + 1)], f)
+    sw = SW.StockWaste(deck.deal_cards())
+    return t, f, sw
+
+
+def deal_state(deal: int | None=None) -> State:
+    ''' the State of deal_game(deal)
+    '''
+    return state_from_game(*deal_game(deal))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve a solitaire deal')
+    parser.add_argument('--seed', '-s',
+                        type=int,
+                        help='set seed')
+    parser.add_argument('--mode', '-m',
+                        choices=modes(),
+                        default='best',
+                        help='search mode default: %(default)s')
+    parser.add_argument('--mem_mb',
+                        type=float,
+                        default=256.0,
+                        help='memory budget in MB default: %(default)s')
+    parser.add_argument('--width', '-w',
+                        type=int,
+                        default=1000,
+                        help='beam width default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=1_000_000,
+                        help='node limit default: %(default)s')
+    parser.add_argument('--seconds',
+                        type=float,
+                        default=None,
+                        help='deepening deadline default: none')
+    parser.add_argument('--layout', '-l',
+                        choices=L.layouts(),
+                        default='klondike',
+                        help='table layout default: %(default)s')
+    args = parser.parse_args()
+    L.use(args.layout)
+    start = deal_state(args.seed)
+    kwargs = {'mem_mb': args.mem_mb, 'max_nodes': args.max_nodes}
+    if args.mode == 'beam':
+        kwargs['width'] = args.width
+    elif args.mode == 'deepening':
+        kwargs['seconds'] = args.seconds
+        kwargs['report'] = lambda nodes, depth, best: print(
+            f'nodes:{nodes} depth:{depth} reached:{best}')
+    result = solve(start, args.mode, **kwargs)
+    print(f'{args.seed=}: {result}')
+    print(' '.join(c.cmd_line for c in result.best))
@@ -17,6 +17,8 @@ class StockWaste():
     ''' A StockWaste object keeps track of the Stock and Waste piles
         TODO(epr): consider as a subclass of Foundation
     '''
+    __slots__ = ('_stock', '_waste')
+
     def __init__(self, cards: ty.List[C.Card]):
         ''' 
         Args:
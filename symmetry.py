@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Suit symmetry of positions.
+    Only colour and value matter to the rules, so swapping the two red
+    suits, the two black suits, or both, gives a position that plays
+    the same: the same moves, by column, win or lose it. The moves
+    name columns not suits, so a line found for one position plays
+    unchanged in the other three.
+    canonical() picks one representative of the four, the one whose
+    snapshot.pack_state bytes are smallest, so caches and corpora
+    keyed by it share results across them.
+'''
+
+import argparse
+import random
+import time
+import typing as ty
+
+import cards as C
+import snapshot as SN
+import solver as SV
+
+_nsuits = len(C.Suits)
+# suit indexes, Card.id % _nsuits, of each colour's pair
+_pairs = [tuple(sorted(s - C.min_suit() for s in group))
+          for group in (C.Card.RedSuits, C.Card.BlackSuits)]
+
+
+def _suit_map(swap_red: bool, swap_black: bool) -> ty.Tuple[int, ...]:
+    suits = list(range(_nsuits))
+    for (a, b), swap in zip(_pairs, (swap_red, swap_black)):
+        if swap:
+            suits[a], suits[b] = b, a
+    return tuple(suits)
+
+
+# the four symmetries as suit maps, identity first
+SYMMETRIES = [_suit_map(r, b) for r in (False, True) for b in (False, True)]
+
+# per symmetry the card id map, see Card.id
+_card_maps = [tuple(cid - cid % _nsuits + suits[cid % _nsuits]
+                    for cid in range(len(C.all_cards())))
+              for suits in SYMMETRIES]
+
+
+def apply(state: SV.State, symmetry: int) -> SV.State:
+    ''' state with the suits of SYMMETRIES[symmetry] swapped
+    '''
+    if symmetry == 0:
+        return state
+    m = _card_maps[symmetry]
+    suits = SYMMETRIES[symmetry]
+    cols, found, stock, waste = state
+    # stack i holds suit i % _nsuits, each deck's stacks swap together
+    new_found = [0] * len(found)
+    for i, top in enumerate(found):
+        new_found[i - i % _nsuits + suits[i % _nsuits]] = top
+    return (tuple((tuple(m[c] for c in hidden), tuple(m[c] for c in shown))
+                  for hidden, shown in cols),
+            tuple(new_found),
+            tuple(m[c] for c in stock),
+            tuple(m[c] for c in waste))
+
+
+def _parts(cols, stock, waste) -> ty.Iterator[ty.Tuple[int, ...]]:
+    ''' the card tuples in pack_state order '''
+    for hidden, shown in cols:
+        yield hidden
+        yield shown
+    yield stock
+    yield waste
+
+
+def symmetry_of(state: SV.State) -> int:
+    ''' the symmetry that takes state to its canonical form.
+        The first card of a pair's suits in pack_state order decides
+        that pair, it must end up the lower suit; with none of them out
+        of the foundations the lower suit gets the lower tops.
+    '''
+    cols, found, stock, waste = state
+    swaps = [None, None]
+    todo = 2
+    for part in _parts(cols, stock, waste):
+        for c in part:
+            suit = c % _nsuits
+            for i, (a, b) in enumerate(_pairs):
+                if swaps[i] is None and suit in (a, b):
+                    swaps[i] = suit == b
+                    todo -= 1
+                    if not todo:
+                        return 2 * swaps[0] + swaps[1]
+    for i, (a, b) in enumerate(_pairs):
+        if swaps[i] is None:
+            swaps[i] = found[a::_nsuits] > found[b::_nsuits]
+    return 2 * swaps[0] + swaps[1]
+
+
+def canonical(state: SV.State) -> SV.State:
+    ''' the representative of state's symmetry class
+    '''
+    return apply(state, symmetry_of(state))
+
+
+def canonical_key(state: SV.State) -> bytes:
+    ''' the pack_state bytes of canonical(state), equal for the four
+        symmetric positions
+    '''
+    return SN.pack_state(canonical(state))
+
+
+def deal_key(deal: int) -> bytes:
+    ''' canonical_key of the start of a numbered deal, to dedupe deals '''
+    return canonical_key(SV.deal_state(deal))
+
+
+def _brute(state: SV.State) -> bytes:
+    return min(SN.pack_state(apply(state, s)) for s in range(len(SYMMETRIES)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the symmetries')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=200,
+                        help='deals to check default: %(default)s')
+    parser.add_argument('--moves', '-m',
+                        type=int,
+                        default=100,
+                        help='random moves into each deal default: '
+                             '%(default)s')
+    args = parser.parse_args()
+    rng = random.Random(1)
+    states = []
+    for deal in range(args.deals):
+        state = SV.deal_state(deal)
+        for _ in range(rng.randrange(args.moves + 1)):
+            legal = SV.legal_moves(state)
+            if not legal:
+                break
+            state = SV.apply_move(state, rng.choice(legal))
+        states.append(state)
+    for state in states:
+        key = canonical_key(state)
+        assert key == _brute(state), 'not the smallest snapshot'
+        for s in range(len(SYMMETRIES)):
+            twin = apply(state, s)
+            assert canonical_key(twin) == key
+            assert SV.legal_moves(twin) == SV.legal_moves(state)
+    start = time.perf_counter()
+    for state in states:
+        canonical_key(state)
+    secs = time.perf_counter() - start
+    print(f'{len(states)} positions x {len(SYMMETRIES)} symmetries agree, '
+          f'canonical_key {secs / len(states) * 1e6:.1f}us')
+    # a solution plays unchanged in a symmetric twin
+    start = SV.deal_state(1)
+    result = SV.solve(start, max_nodes=20000)
+    twin = apply(start, len(SYMMETRIES) - 1)
+    for c in result.moves:
+        move = (c.cmd, tuple(c.cargs))
+        assert SV.is_legal(twin, move)
+        twin = SV.apply_move(twin, move)
+    print(f'deal 1 {result.status.name}, the line wins the suit swapped '
+          f'deal: {SV.is_won(twin)}')
+    keys = {deal_key(d) for d in range(args.deals)}
+    print(f'{args.deals} deals, {len(keys)} distinct up to suit swaps')
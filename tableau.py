@@ -3,6 +3,7 @@
 #
 import argparse
 import functools as ft
+import itertools as it
 import pathlib as pl
 import random
 import re
@@ -12,22 +13,24 @@ import typing as ty
 import cards as C
 import deck as D
 import foundation as F
+import layout as L
 import parse_sol_cmds as psc
 import stock_waste as SW
 
-_cols = 7
-
 class Tableau():
-    ''' Class that keeps track of the seven piles of cards on the Tableau
-        The Tableau has seven columns, each column has flipped and unflipped
-        cards with flipped cards concieved as on top of the unflipped.
+    ''' Class that keeps track of the piles of cards on the Tableau
+        The Tableau has the layout's columns, seven in klondike, each
+        column has flipped and unflipped cards with flipped cards
+        concieved as on top of the unflipped.
         Each column is represented as dictionary of cards.
-        Note(epr): columns go from 0 to 6
+        Note(epr): columns go from 0 to 6 (cols() - 1)
             adjust at APIs
     '''
+    __slots__ = ('_F', '_unflipped', '_flipped')
 
     def cols() -> int:
-        return _cols
+        ''' the column count of the current layout '''
+        return L.current().cols
 
     def __init__(self,
                  cards_lists: ty.List[[ty.List[C.Card]]],
@@ -45,9 +48,23 @@ class Tableau():
         The dictionaries are indexed by column numbers 0 to 6
         '''
         self._F = foundation
-        self._unflipped = {x: cards_lists[x] for x in range(_cols)}
-        self._flipped = {x: [self._unflipped[x].pop()]
-                        for x in range(_cols)}
+        self._unflipped = dict(enumerate(cards_lists))
+        self._flipped = {x: self._unflipped[x][-1:]
+                        for x in self._unflipped}
+        for x in self._unflipped:
+            del self._unflipped[x][-1:]
+
+    def set_columns(self,
+                    unflipped: ty.List[ty.List[C.Card]],
+                    flipped: ty.List[ty.List[C.Card]]) -> None:
+        ''' replace every column, e.g. to restore a saved position
+        Args:
+            unflipped: the hidden cards of each column
+            flipped: the shown cards of each column
+        '''
+        self._unflipped = {x: list(unflipped[x])
+                           for x in range(len(unflipped))}
+        self._flipped = {x: list(flipped[x]) for x in range(len(flipped))}
 
     @property
     def unflipped(self):
@@ -57,6 +74,15 @@ class Tableau():
     def flipped(self):
         return self._flipped
 
+    def id_columns(self) -> ty.Tuple[ty.Tuple[ty.Tuple[int, ...],
+                                              ty.Tuple[int, ...]], ...]:
+        ''' the card ids of each column as (hidden, shown) tuples, what
+            solver.state_from_game needs
+        '''
+        return tuple((tuple(c.id for c in self._unflipped[x]),
+                      tuple(c.id for c in self._flipped[x]))
+                     for x in range(len(self._flipped)))
+
     def flip_card(self, srcc: int):
         ''' Flips a card in srcc on the Tableau
             Iff the len(unflipped) > 0
@@ -72,7 +98,7 @@ class Tableau():
         ''' Returns the length of the longest pile on the Tableau
         '''
         return max([len(self._flipped[x]) + len(self._unflipped[x])
-                        for x in range(_cols)])
+                        for x in self._flipped])
 
     def add_card(self, card: C.Card, dstc: int) -> bool:
         ''' add a single card to the column in the tableaue
@@ -83,11 +109,13 @@ class Tableau():
             True iff it was attached, else False
         '''
         column_cards = self._flipped[dstc]
-        if not column_cards and card.value == C.king:
+        if not column_cards:
+            if card.value != C.king:
+                return False # only a king goes to an empty column
             column_cards.append(card)
             return True
         attach_card = column_cards[-1]
-        if card.color == attach_card.color:
+        if card.red == attach_card.red:
             return False # can not attach some color
         # sum will be zero when we can attach: 1 below + 1 is zero
         if card.value - attach_card.value + 1:
@@ -109,28 +137,23 @@ class Tableau():
             True if clist was successfully added to column on the tableau
             else False
         '''
-        print(f'T.addC: new {C.cards_to_str(clist)}')
         #column_cards = self._flipped[column]
-        print(f'T.addC: to {C.cards_to_str(column)}')
         # check of if the colume is empty and the is a king list.
-        if not column and clist[0].value == C.king:
+        if not column:
+            if clist[0].value != C.king:
+                return False # only a king goes to an empty column
             column.extend(clist)
             return True
-        #if not column_cards:
-        #    return False
         attach_to_c = clist[0]
         attach_card = column[-1]
         # colors must not be the same to add on tableau
-        if attach_to_c.color == attach_card.color:
-            print(f'T.addC: bad color')
+        if attach_to_c.red == attach_card.red:
             return False
         # sum will be zero when we can attach: 1 below + 1 is zero
         if attach_to_c.value - attach_card.value + 1:
-            print(f'T.addC:  {attach_to_c.value=} {attach_card.value=}')
             return False
         # Ok extend the column with the new list
         column.extend(clist)
-        print(f'T.addC: newcol {C.cards_to_str(column)}')
         return True
 
     def tableau_to_tableau(self, srcc: int, dstc: int) -> bool:
@@ -143,17 +166,13 @@ class Tableau():
             True if any card(s) are moved from
             srcc to dstc, Otherwise False
         '''
-        print(f'Ttt {srcc=} -> {dstc=}')
         src_cards = self._flipped[srcc]
         dst_cards = self._flipped[dstc]
-        print(f'Ttt src:{C.cards_to_str(src_cards)}')
-        print(f'Ttt dst:{C.cards_to_str(dst_cards)}')
 
         # walk down the source pile until we find a plce to append to
         # srcc to dstc
         # TODO(epr): this looks a little inefficient
         for index in range(len(src_cards)):
-            print(f'Ttt:{index=}')
             if self.add_cards(src_cards[index:], dst_cards):
                 self._flipped[srcc] = src_cards[0:index]
                 if index == 0:
@@ -167,7 +186,6 @@ class Tableau():
         Args:
             srcc: index of source column
         '''
-        print(f'T.tf: {srcc=}')
         column = self._flipped[srcc]
         if not column:
             return False
@@ -190,24 +208,146 @@ class Tableau():
             True if a card from the Waste pile is succesfully
             moved to a column on the Tableau, returns False otherwise.
         '''
+        if not waste_pile._waste:
+            return False
         card = waste_pile._waste[-1]
-        print(f'T.wt: {card} -> {dstc}')
         if self.add_card(card, dstc):
             waste_pile.pop_waste_card()
-            print(f'T.wt: {card} -> {dstc}')
             return True
         return False
 
 
+class ArrayTableau(Tableau):
+    ''' Tableau backend that keeps each column as one list, the hidden
+        cards first, and a count of the face down cards per column.
+        A multi card move is one extend and one truncation, and a
+        flip is a count decrement, so no column is rebuilt on a move.
+        The unflipped/flipped properties build dicts for display.
+    '''
+    __slots__ = ('_columns', '_down')
+
+    def __init__(self,
+                 cards_lists: ty.List[[ty.List[C.Card]]],
+                 foundation: F.Foundation):
+        self._F = foundation
+        self._columns = list(cards_lists)
+        self._down = [max(0, len(c) - 1) for c in self._columns]
+
+    def set_columns(self,
+                    unflipped: ty.List[ty.List[C.Card]],
+                    flipped: ty.List[ty.List[C.Card]]) -> None:
+        cols = range(len(unflipped))
+        self._columns = [list(unflipped[x]) + list(flipped[x]) for x in cols]
+        self._down = [len(unflipped[x]) for x in cols]
+
+    @property
+    def unflipped(self):
+        return {x: c[:d] for x, (c, d) in
+                enumerate(zip(self._columns, self._down))}
+
+    @property
+    def flipped(self):
+        return {x: c[d:] for x, (c, d) in
+                enumerate(zip(self._columns, self._down))}
+
+    def id_columns(self) -> ty.Tuple[ty.Tuple[ty.Tuple[int, ...],
+                                              ty.Tuple[int, ...]], ...]:
+        # straight from the columns, no display dicts
+        return tuple((tuple(c.id for c in it.islice(col, down)),
+                      tuple(c.id for c in it.islice(col, down, None)))
+                     for col, down in zip(self._columns, self._down))
+
+    def flip_card(self, srcc: int):
+        down = self._down[srcc]
+        if not down:
+            return
+        column = self._columns[srcc]
+        if len(column) > down:
+            # same as Tableau, the hidden card goes on top of the shown
+            column.append(column.pop(down - 1))
+        self._down[srcc] = down - 1
+
+    def pile_length(self):
+        return max(len(c) for c in self._columns)
+
+    def add_card(self, card: C.Card, dstc: int) -> bool:
+        column = self._columns[dstc]
+        if not column:
+            if card.value != C.king:
+                return False
+            column.append(card)
+            return True
+        attach_card = column[-1]
+        if card.red == attach_card.red:
+            return False
+        if card.value - attach_card.value + 1:
+            return False
+        column.append(card)
+        return True
+
+    def tableau_to_tableau(self, srcc: int, dstc: int) -> bool:
+        ''' Same move as Tableau.tableau_to_tableau, the flipped cards are
+            a run so the start of the moved cards is found from the
+            values rather than by trying each index.
+        '''
+        src = self._columns[srcc]
+        dst = self._columns[dstc]
+        down = self._down[srcc]
+        if len(src) == down:
+            return False
+        if dst:
+            top = dst[-1]
+            start = down + src[down].value - top.value + 1
+            if start < down or start >= len(src) \
+                    or src[start].red == top.red:
+                return False
+        elif src[down].value == C.king:
+            start = down
+        else:
+            return False
+        dst += src[start:]
+        del src[start:]
+        if start == down:
+            self.flip_card(srcc)
+        return True
+
+    def to_foundation(self, srcc: int) -> bool:
+        column = self._columns[srcc]
+        if len(column) == self._down[srcc]:
+            return False
+        if self._F.add_card(column[-1]):
+            column.pop()
+            if len(column) == self._down[srcc]:
+                self.flip_card(srcc)
+            return True
+        return False
+
+
+_backends = {
+    'dict': Tableau,
+    'array': ArrayTableau,
+}
+
+def backends() -> ty.List[str]:
+    return list(_backends)
+
+
+def backend(name: str) -> type:
+    ''' the Tableau class for a backend name from backends()
+    '''
+    return _backends[name]
+
+
 def print_tableau(t: Tableau):
     '''
     Debug method to print tableau contents
     '''
     print(f'PL: {t.pile_length()}')
-    for dstc in range(Tableau.cols()):
-        #print(f'F({len(t._flipped)}:{t._flipped}')
-        print(f'{dstc + 1}:F:{C.cards_to_str(t._flipped[dstc])}', end=' -- ')
-        print(f'U: {C.cards_to_str(t._unflipped[dstc])}')
+    flipped = t.flipped
+    unflipped = t.unflipped
+    for dstc in range(len(flipped)):
+        print(f'{dstc + 1}:F:{C.cards_to_str(flipped[dstc])}', end=' -- ')
+        print(f'U: {C.cards_to_str(unflipped[dstc])}')
 
 
 if __name__ == '__main__':
@@ -219,13 +359,18 @@ if __name__ == '__main__':
     parser.add_argument('--seed', '-s',
                         type=int,
                         help='set seed')
+    parser.add_argument('--backend', '-b',
+                        choices=backends(),
+                        default='dict',
+                        help='tableau storage default: %(default)s')
     args = parser.parse_args()
     if args.seed != None:
         random.seed(args.seed)
     deck = D.Deck()
     # generate a list of lists [1-card, 2-cards, ..., 7-cards]
     f = F.Foundation()
-    t = Tableau([deck.deal_cards(x) for x in range(1, Tableau.cols() + 1)], F)
+    t = backend(args.backend)([deck.deal_cards(x)
+                               for x in range(1, Tableau.cols() + 1)], f)
     sw = SW.StockWaste(deck.deal_cards())
     print_tableau(t)
     SW.print_sw(sw)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' "Thoughtful" solitaire: a solver that knows where every card is,
+    for labelling deals as winnable. SV.State holds the hidden cards
+    too, so every solver search has perfect information; this one
+    adds pruning that keeps UNSOLVABLE answers exact, so it can prove
+    a deal lost where solver.best_first runs to its limits. It costs
+    more per node, so the interactive game does not use it:
+      - talon plays: with draw one and unlimited redeals every stock and
+        waste card can be reached, so stock presses are folded into the
+        play that follows them (no search nodes for "m" alone).
+      - safe foundation moves are made without branching, a card is
+        safe when no card that could go on it is still out.
+      - a hidden card with its lower suit card and both of its tableau
+        targets below it in the same column can never move, so neither
+        can the cards under it: the position is dead.
+      - positions that only differ in column order are the same node.
+    The search is best first and returns the SV.SolveResult of solver.
+    The safe and dead rules count on one foundation stack per suit, so
+    only single deck layouts are solved.
+'''
+
+import argparse
+import concurrent.futures as cf
+import functools as ft
+import heapq
+import itertools as it
+import os
+import time
+import typing as ty
+
+import cards as C
+import metrics as M
+import parse_sol_cmds as psc
+import solver as SV
+
+_value = SV._value
+_suit = SV._suit
+_red = SV._red
+_nsuits = len(C.Suits)
+
+# the other color's suit indices for each suit index
+_opposite = [[t for t in range(_nsuits)
+              if C.card_by_id(t).red != C.card_by_id(s).red]
+             for s in range(_nsuits)]
+
+# A Macro is (presses, move): press "m" presses times, then play move
+Macro = ty.Tuple[int, SV.Move]
+
+
+def _cid(value: int, suit: int) -> int:
+    return (value - C.ace) * _nsuits + suit
+
+
+# per card id: the cards that go on it in the tableau, and the kings
+_onto = [[_cid(_value[c] - 1, s) for s in _opposite[_suit[c]]]
+         if _value[c] > C.ace else [] for c in range(len(_value))]
+_kings = [_cid(C.king, s) for s in range(_nsuits)]
+
+_WF = (psc.SolActs.WASTE_FOUNDATION, ())
+
+
+@ft.cache
+def _move_table(ncols: int):
+    ''' the moves of an ncols table, built once rather than per node
+    Returns:
+        (waste to column x, column x to foundation,
+         column s to column d) lists
+    '''
+    cols = range(ncols)
+    return ([(psc.SolActs.WASTE_TO_TABLEAU, (x,)) for x in cols],
+            [(psc.SolActs.TABLEAU_TO_FOUNDATION, (x,)) for x in cols],
+            [[(psc.SolActs.TABLEAU_TO_TABLEAU, (s, d)) for d in cols]
+             for s in cols])
+
+
+def is_safe(found: ty.Tuple[int, ...], cid: int) -> bool:
+    ''' True iff cid can go to the foundation without losing a win:
+        both cards of the other color that could go on it are home.
+    '''
+    v = _value[cid]
+    return v <= 2 or all(found[s] >= v - 1 for s in _opposite[_suit[cid]])
+
+
+def is_dead(state: SV.State) -> bool:
+    ''' True iff a hidden card has its lower suit card and its two
+        tableau targets (unless already home) under it in its column.
+        Such a card can never move so the lower card never gets home.
+    '''
+    cols, found = state[0], state[1]
+    for hidden, shown in cols:
+        for i in range(1, len(hidden)):
+            cid = hidden[i]
+            v = _value[cid]
+            if v == C.ace or v == C.king:
+                continue
+            below = hidden[:i]
+            if _cid(v - 1, _suit[cid]) not in below:
+                continue
+            if all(found[s] >= v + 1 or _cid(v + 1, s) in below
+                   for s in _opposite[_suit[cid]]):
+                return True
+    return False
+
+
+def _auto(state: SV.State) -> ty.Tuple[SV.State, ty.List[SV.Move]]:
+    ''' make the safe foundation moves
+    '''
+    played = []
+    progress = True
+    while progress:
+        progress = False
+        cols, found, stock, waste = state
+        # one stack per suit so a card fits iff it is one over its stack
+        for x, (hidden, shown) in enumerate(cols):
+            if shown:
+                cid = shown[-1]
+                if found[_suit[cid]] + 1 == _value[cid] \
+                        and is_safe(found, cid):
+                    move = (psc.SolActs.TABLEAU_TO_FOUNDATION, (x,))
+                    state = SV.apply_move(state, move)
+                    played.append(move)
+                    progress = True
+                    break
+        else:
+            if waste and found[_suit[waste[-1]]] + 1 == _value[waste[-1]] \
+                    and is_safe(found, waste[-1]):
+                move = (psc.SolActs.WASTE_FOUNDATION, ())
+                state = SV.apply_move(state, move)
+                played.append(move)
+                progress = True
+    return state, played
+
+
+def _moves(state: SV.State) -> ty.List[ty.Tuple[int, Macro, SV.State]]:
+    ''' (priority, macro, state before the play) for the moves worth
+        searching, lower priority first. For talon plays the state
+        before the play is the state after the presses.
+        The tableau moves are those of SV.legal_moves, found from the
+        cards that go on each column rather than by trying each pair.
+    '''
+    cols, found, stock, waste = state
+    wtt, ttf, ttt = _move_table(len(cols))
+    macros = []
+    at = {}  # shown card id -> (column, index)
+    for x, (hidden, shown) in enumerate(cols):
+        for i, c in enumerate(shown):
+            at[c] = (x, i)
+    wanted = {}  # card id -> the talon moves that could play it
+    empty = None
+    for x, (hidden, shown) in enumerate(cols):
+        if not shown:
+            if empty is None:
+                # the other empty columns give the same node
+                empty = x
+                for k in _kings:
+                    wanted[k] = [wtt[x]]
+            continue
+        top = shown[-1]
+        # one stack per suit so a card fits iff it is one over its stack
+        if found[_suit[top]] + 1 == _value[top]:
+            macros.append((0, (0, ttf[x]), state))
+        for c in _onto[top]:
+            src = at.get(c)
+            if src is None:
+                wanted.setdefault(c, []).append(wtt[x])
+                continue
+            srcc, index = src
+            if index == 0:
+                # whole run: uncovers a card or empties the column
+                priority = 1 if cols[srcc][0] else 3
+            else:
+                under = cols[srcc][1][index - 1]
+                priority = 1 if found[_suit[under]] + 1 == _value[under] \
+                    else 4
+            macros.append((priority, (0, ttt[srcc][x]), state))
+    if empty is not None:
+        # a king run only moves when it uncovers a card
+        for srcc, (hidden, shown) in enumerate(cols):
+            if hidden and shown and _value[shown[0]] == C.king:
+                macros.append((1, (0, ttt[srcc][empty]), state))
+    for s in range(_nsuits):
+        if found[s] < C.king:
+            wanted.setdefault(_cid(found[s] + 1, s), []).insert(0, _WF)
+    # every stock and waste card can be brought to the top of the
+    # waste, card i of full is there after presses, each card once
+    # with its fewest presses; past the end of the stock it recycles
+    nwaste = len(waste)
+    full = waste + stock[::-1]
+    for i, cid in enumerate(full):
+        plays = wanted.get(cid)
+        if plays:
+            presses = i - nwaste + 1 if i >= nwaste - 1 \
+                else len(stock) + 1 + i
+            before = (cols, found, full[:i:-1], full[:i + 1])
+            for move in plays:
+                macros.append((2, (presses, move), before))
+    macros.sort(key=lambda m: (m[0], m[1][0]))
+    return macros
+
+
+def _key(state: SV.State):
+    ''' the same for positions that only differ in column order
+    '''
+    return tuple(sorted(state[0])), state[1], state[2], state[3]
+
+
+def _path_moves(path) -> ty.List[psc.SolCmd]:
+    chunks = []
+    while path:
+        moves, path = path
+        chunks.append(moves)
+    cmds = []
+    for moves in reversed(chunks):
+        cmds.extend(SV.move_to_cmd(m) for m in moves)
+    return cmds
+
+
+def solve(start: SV.State, max_nodes: int=1_000_000,
+          progress: SV.Progress | None=None,
+          report_every: int=1000, mem_mb: float=256.0) -> SV.SolveResult:
+    ''' best first (SV.score, fewest stock presses on ties) over the
+        pruned moves, the dead check only runs when a card went home
+        since hidden cards never move.
+        progress and mem_mb are as for SV.best_first.
+    Raises:
+        ValueError: for a layout with more than one deck
+    '''
+    if len(start[1]) != _nsuits:
+        raise ValueError(f'{len(start[1])} foundation stacks, thoughtful '
+                         f'solves single deck layouts')
+    began = time.perf_counter()
+    result = _search(start, max_nodes, progress, report_every, mem_mb)
+    M.searched('thoughtful', result.nodes, time.perf_counter() - began)
+    return result
+
+
+def _search(start: SV.State, max_nodes: int, progress: SV.Progress | None,
+            report_every: int, mem_mb: float) -> SV.SolveResult:
+    start, auto = _auto(start)
+    root = (auto, None) if auto else None
+    if SV.is_won(start):
+        return SV.SolveResult(SV.SolveStatus.SOLVED, _path_moves(root), 0,
+                              False)
+    if is_dead(start):
+        return SV.SolveResult(SV.SolveStatus.UNSOLVABLE, [], 0, False)
+    max_states = max(16, int(mem_mb * 2**20) // SV._node_bytes(start))
+    counter = it.count()
+    open_set = [(-SV.score(start), 0, next(counter), start, root)]
+    visited = {_key(start): None}
+    best = (SV.score(start), root)
+    reported = root
+    line = _path_moves(root)
+    nodes = 0
+    mem_capped = False
+    while open_set:
+        neg, _, _, state, path = heapq.heappop(open_set)
+        nodes += 1
+        if nodes > max_nodes:
+            return SV.SolveResult(SV.SolveStatus.INCONCLUSIVE, [], nodes,
+                                  mem_capped, f'node limit {max_nodes}')
+        for priority, (presses, move), before in _moves(state):
+            child = SV.apply_move(before, move)
+            child, auto = _auto(child)
+            key = _key(child)
+            if key in visited:
+                continue
+            visited[key] = None
+            if child[1] != state[1] and is_dead(child):
+                continue
+            played = [(psc.SolActs.STOCK_TO_WASTE, ())] * presses \
+                + [move] + auto
+            if SV.is_won(child):
+                return SV.SolveResult(SV.SolveStatus.SOLVED,
+                                      _path_moves((played, path)), nodes,
+                                      mem_capped)
+            child_score = SV.score(child)
+            heapq.heappush(open_set, (-child_score, presses, next(counter),
+                                      child, (played, path)))
+            if child_score > best[0]:
+                best = (child_score, (played, path))
+        if progress and nodes % report_every == 0:
+            if best[1] is not reported:
+                reported = best[1]
+                line = _path_moves(reported)
+            progress(nodes, line)
+        if len(open_set) + len(visited) > max_states:
+            mem_capped = True
+            open_set = heapq.nsmallest(max(1, len(open_set) // 2), open_set)
+            heapq.heapify(open_set)
+            SV._evict(visited, max_states // 2)
+    if mem_capped:
+        return SV.SolveResult(SV.SolveStatus.INCONCLUSIVE, [], nodes,
+                              mem_capped,
+                              f'memory cap {mem_mb}MB pruned the search')
+    return SV.SolveResult(SV.SolveStatus.UNSOLVABLE, [], nodes, False)
+
+
+def label_deal(deal: int, max_nodes: int) \
+        -> ty.Tuple[int, SV.SolveStatus, int, float]:
+    ''' (deal, status, nodes, seconds) for corpus labelling
+    '''
+    start = time.perf_counter()
+    result = solve(SV.deal_state(deal), max_nodes)
+    return deal, result.status, result.nodes, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Label deals winnable')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=20,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=200000,
+                        help='node limit default: %(default)s')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='pool size default: %(default)s')
+    parser.add_argument('--compare', '-c',
+                        action='store_true',
+                        help='also time solver.best_first')
+    args = parser.parse_args()
+    deals = range(args.first, args.first + args.deals)
+    counts = {s: 0 for s in SV.SolveStatus}
+    secs = 0.0
+    with cf.ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for deal, status, nodes, sec in pool.map(
+                label_deal, deals, [args.max_nodes] * len(deals)):
+            print(f'{deal}: {status.name} nodes:{nodes} {sec:.3f}s')
+            counts[status] += 1
+            secs += sec
+    print(', '.join(f'{s.name}:{n}' for s, n in counts.items())
+          + f' {secs / max(1, len(deals)):.3f}s/deal')
+    if args.compare:
+        counts = {s: 0 for s in SV.SolveStatus}
+        start = time.perf_counter()
+        for deal in deals:
+            counts[SV.solve(SV.deal_state(deal), 'best',
+                            max_nodes=args.max_nodes).status] += 1
+        print('best_first: '
+              + ', '.join(f'{s.name}:{n}' for s, n in counts.items())
+              + f' {(time.perf_counter() - start) / len(deals):.3f}s/deal')
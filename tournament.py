@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Policy tournament.
+    Every policy plays the same deal numbers over a process pool and
+    the report pairs them deal by deal: each pair's win rate difference
+    with a normal confidence interval on the paired differences, and
+    per policy the win rate, moves per win and CPU seconds per game.
+    Results are appended to a cache file, one line per game:
+        <version> <deal> <won> <moves> <cpu seconds>
+    keyed by the policy version, a hash of the policy name, its
+    parameters and the source of the modules it plays with and every
+    module of this directory they import, e.g., the deck's shuffle and
+    the engine rules, so a rerun only plays the (policy, deal) pairs
+    whose code or settings changed.
+'''
+
+import argparse
+import concurrent.futures as cf
+import functools as ft
+import hashlib
+import importlib
+import itertools as it
+import math
+import os
+import pathlib as pl
+import random
+import statistics
+import time
+import types
+import typing as ty
+
+import game_log as GL
+import greedy as GR
+import solver as SV
+import thoughtful as TH
+
+# name -> (modules that play it, default params)
+_policies = {
+    'random': (('game_log', 'solver'), {'max_moves': 1000}),
+    'best': (('solver',), {'max_nodes': 20000}),
+    'beam': (('solver',), {'max_nodes': 20000, 'width': 1000}),
+    'thoughtful': (('thoughtful', 'solver'), {'max_nodes': 20000}),
+    'greedy': (('greedy', 'game_log', 'solver'),
+               {'max_moves': 1000, **GR.WEIGHTS}),
+}
+
+
+def policies() -> ty.List[str]:
+    return list(_policies)
+
+
+@ft.cache
+def _sources(modules: ty.Tuple[str, ...]) -> ty.List[pl.Path]:
+    ''' the files of modules and of the modules of this directory that
+        they import, directly or not
+    '''
+    here = pl.Path(__file__).resolve().parent
+    found = set()
+    todo = [importlib.import_module(m) for m in modules]
+    while todo:
+        module = todo.pop()
+        if getattr(module, '__file__', None) is None:
+            continue  # built in
+        path = pl.Path(module.__file__).resolve()
+        if path.parent != here or path in found:
+            continue
+        found.add(path)
+        todo.extend(v for v in vars(module).values()
+                    if isinstance(v, types.ModuleType))
+    return sorted(found)
+
+
+def version(name: str, params: ty.Dict[str, int]) -> str:
+    ''' changes when the policy's parameters or code do
+    '''
+    h = hashlib.sha1(name.encode())
+    h.update(repr(sorted(params.items())).encode())
+    for path in _sources(_policies[name][0]):
+        h.update(path.read_bytes())
+    return f'{name}-{h.hexdigest()[:12]}'
+
+
+def play(name: str, params: ty.Dict[str, int], deal: int) \
+        -> ty.Tuple[bool, int, float]:
+    ''' (won, moves, CPU seconds) of policy name on deal
+    '''
+    start = time.process_time()
+    match name:
+        case 'random':
+            game = GL.random_game(deal, params['max_moves'],
+                                  random.Random(deal))
+            won, moves = game.won, len(game.moves)
+        case 'greedy':
+            weights = {f: params[f] for f in GR.FEATURES}
+            game = GR.play(deal, weights, params['max_moves'])
+            won, moves = game.won, len(game.moves)
+        case 'best' | 'beam':
+            result = SV.solve(SV.deal_state(deal), name, **params)
+            won = result.status == SV.SolveStatus.SOLVED
+            moves = len(result.moves)
+        case 'thoughtful':
+            result = TH.solve(SV.deal_state(deal), params['max_nodes'])
+            won = result.status == SV.SolveStatus.SOLVED
+            moves = len(result.moves)
+        case _:
+            raise ValueError(f'unknown policy {name}')
+    return won, moves, time.process_time() - start
+
+
+class Cache():
+    ''' the results file, loaded once and appended to
+    '''
+    def __init__(self, path: pl.Path | None):
+        self._path = path
+        self._results = {}
+        if path is not None and path.exists():
+            with open(path) as fd:
+                for line in fd:
+                    parts = line.split()
+                    if len(parts) != 5:
+                        continue  # a line cut short by a crash
+                    self._results[parts[0], int(parts[1])] = (
+                        parts[2] == '1', int(parts[3]), float(parts[4]))
+        self._fd = open(path, 'a') if path is not None else None
+
+    def get(self, version: str, deal: int):
+        return self._results.get((version, deal))
+
+    def put(self, version: str, deal: int,
+            result: ty.Tuple[bool, int, float]) -> None:
+        self._results[version, deal] = result
+        if self._fd:
+            won, moves, cpu = result
+            self._fd.write(f'{version} {deal} {int(won)} {moves} {cpu:.6f}\n')
+            self._fd.flush()
+
+    def close(self) -> None:
+        if self._fd:
+            self._fd.close()
+            self._fd = None
+
+
+def run(names: ty.Sequence[str], deals: ty.Sequence[int],
+        params: ty.Dict[str, ty.Dict[str, int]], cache: Cache,
+        workers: int | None=None) \
+        -> ty.Tuple[ty.Dict[str, ty.List[ty.Tuple[bool, int, float]]], int]:
+    ''' play what the cache does not have
+    Returns:
+        (policy name -> results in deal order, games played)
+    '''
+    versions = {n: version(n, params[n]) for n in names}
+    todo = [(n, d) for n in names for d in deals
+            if cache.get(versions[n], d) is None]
+    if todo:
+        with cf.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(play, n, params[n], d): (n, d)
+                       for n, d in todo}
+            for future in cf.as_completed(futures):
+                n, d = futures[future]
+                cache.put(versions[n], d, future.result())
+    return {n: [cache.get(versions[n], d) for d in deals]
+            for n in names}, len(todo)
+
+
+def paired(a: ty.Sequence[bool], b: ty.Sequence[bool],
+           z: float=1.96) -> ty.Tuple[float, float, float]:
+    ''' (mean, low, high) of the win rate difference a - b over the
+        same deals, a normal interval on the per deal differences
+    '''
+    diffs = [int(x) - int(y) for x, y in zip(a, b)]
+    mean = statistics.fmean(diffs)
+    if len(diffs) < 2:
+        return mean, -1.0, 1.0
+    half = z * statistics.stdev(diffs) / math.sqrt(len(diffs))
+    return mean, mean - half, mean + half
+
+
+def report(results: ty.Dict[str, ty.List[ty.Tuple[bool, int, float]]],
+           z: float=1.96) -> str:
+    lines = [f'{"policy":<12} {"win%":>6} {"moves/win":>10} {"cpu/game":>9}']
+    for name, rs in results.items():
+        wins = [m for w, m, c in rs if w]
+        lines.append(f'{name:<12} {100 * len(wins) / len(rs):6.1f} '
+                     f'{statistics.fmean(wins) if wins else 0:10.1f} '
+                     f'{statistics.fmean(c for w, m, c in rs):8.3f}s')
+    names = list(results)
+    if len(names) > 1:
+        lines.append(f'paired win rate differences over '
+                     f'{len(results[names[0]])} deals:')
+    for a, b in it.combinations(names, 2):
+        mean, low, high = paired([r[0] for r in results[a]],
+                                 [r[0] for r in results[b]], z)
+        only_a = sum(x[0] and not y[0]
+                     for x, y in zip(results[a], results[b]))
+        only_b = sum(y[0] and not x[0]
+                     for x, y in zip(results[a], results[b]))
+        sure = '' if low <= 0 <= high else ' *'
+        lines.append(f'  {a} - {b}: {100 * mean:+.1f}% '
+                     f'[{100 * low:+.1f}%, {100 * high:+.1f}%] '
+                     f'only {a}:{only_a} only {b}:{only_b}{sure}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare policies')
+    parser.add_argument('policies',
+                        nargs='*',
+                        default=['best', 'thoughtful'],
+                        help=f'from {policies()} default: best thoughtful')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=100,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--max_nodes', '-n',
+                        type=int,
+                        default=None,
+                        help='solver node limit for every policy')
+    parser.add_argument('--cache', '-c',
+                        type=pl.Path,
+                        default=pl.Path('tournament.cache'),
+                        help='results cache default: %(default)s')
+    parser.add_argument('--no_cache',
+                        action='store_true',
+                        help='play every game, keep nothing')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='pool size default: %(default)s')
+    args = parser.parse_args()
+    bad = set(args.policies) - set(policies())
+    if bad:
+        parser.error(f'unknown policies {bad}, choose from {policies()}')
+    params = {}
+    for name in args.policies:
+        params[name] = dict(_policies[name][1])
+        if args.max_nodes is not None and 'max_nodes' in params[name]:
+            params[name]['max_nodes'] = args.max_nodes
+    cache = Cache(None if args.no_cache else args.cache)
+    start = time.perf_counter()
+    results, played = run(args.policies,
+                          range(args.first, args.first + args.deals),
+                          params, cache, args.workers)
+    cache.close()
+    print(report(results))
+    print(f'played {played} games in {time.perf_counter() - start:.1f}s, '
+          f'the rest were cached')
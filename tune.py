@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Weight tuning for the greedy policy.
+    Each round perturbs the best weights so far into a set of candidates
+    and races them over a fixed deal list: the deals are played a block
+    at a time over a process pool, and after each block a candidate
+    whose win rate, plus its Hoeffding bound, is below the leader's
+    minus its own is dropped, so clearly bad weights stop costing games.
+    The best of the survivors centres the next round with a smaller
+    step. Games go through the tournament cache keyed by the greedy
+    policy version, i.e., the weights and the code, so reruns and
+    candidates seen before only read it.
+'''
+
+import argparse
+import concurrent.futures as cf
+import math
+import os
+import pathlib as pl
+import random
+import time
+import typing as ty
+
+import greedy as GR
+import tournament as TO
+
+# (won, moves, cpu seconds) of a game, see tournament.play
+Result = ty.Tuple[bool, int, float]
+
+
+class Candidate():
+    ''' a weight vector and its results so far, in deal order
+    '''
+    __slots__ = ('_params', '_version', '_results', '_dropped')
+
+    def __init__(self, params: ty.Dict[str, float]):
+        self._params = params
+        self._version = TO.version('greedy', params)
+        self._results = []
+        self._dropped = None
+
+    @property
+    def params(self) -> ty.Dict[str, float]:
+        return self._params
+
+    @property
+    def version(self) -> str:
+        return self._version
+
+    @property
+    def results(self) -> ty.List[Result]:
+        return self._results
+
+    @property
+    def games(self) -> int:
+        return len(self._results)
+
+    @property
+    def rate(self) -> float:
+        return sum(r[0] for r in self._results) / max(1, self.games)
+
+    @property
+    def dropped(self) -> int | None:
+        ''' the games it had when it was dropped, None if still in '''
+        return self._dropped
+
+    def drop(self) -> None:
+        self._dropped = self.games
+
+    def weights(self) -> str:
+        return ' '.join(f'{f}={self._params[f]:g}' for f in GR.FEATURES)
+
+
+def _radius(games: int, candidates: int, delta: float) -> float:
+    ''' the Hoeffding bound on a win rate after games, union bounded
+        over the candidates
+    '''
+    return math.sqrt(math.log(2 * candidates / delta) / (2 * max(1, games)))
+
+
+def _play(params: ty.Dict[str, float], deals: ty.List[int]) \
+        -> ty.List[Result]:
+    ''' the pool task, one candidate's games of a block '''
+    return [TO.play('greedy', params, deal) for deal in deals]
+
+
+def race(candidates: ty.List[Candidate], deals: ty.Sequence[int],
+         cache: TO.Cache, pool: cf.Executor, block: int=50,
+         delta: float=0.05) -> ty.Tuple[int, int]:
+    ''' play the candidates block by block over deals, dropping the
+        clearly worse ones after each block
+    Returns:
+        (games played, games read from the cache)
+    '''
+    played = cached = 0
+    for at in range(0, len(deals), block):
+        alive = [c for c in candidates if c.dropped is None]
+        todo = {}
+        for c in alive:
+            missing = [d for d in deals[at:at + block]
+                       if cache.get(c.version, d) is None]
+            cached += min(block, len(deals) - at) - len(missing)
+            if missing:
+                todo[pool.submit(_play, c.params, missing)] = (c, missing)
+        for future in cf.as_completed(todo):
+            c, missing = todo[future]
+            for deal, result in zip(missing, future.result()):
+                cache.put(c.version, deal, result)
+            played += len(missing)
+        for c in alive:
+            c.results.extend(cache.get(c.version, d)
+                             for d in deals[at:at + block])
+        r = _radius(alive[0].games, len(candidates), delta)
+        leader = max(c.rate for c in alive)
+        for c in alive:
+            if c.rate + r < leader - r:
+                c.drop()
+    return played, cached
+
+
+def _perturb(params: ty.Dict[str, float], step: float,
+             rng: random.Random) -> ty.Dict[str, float]:
+    ''' params with each weight moved by a normal step scaled to it,
+        rounded so that near misses share cache entries
+    '''
+    new = dict(params)
+    for f in GR.FEATURES:
+        w = params[f]
+        new[f] = round(w + rng.gauss(0, step * max(1.0, abs(w))), 2)
+    return new
+
+
+def tune(deals: ty.Sequence[int], rounds: int=5, population: int=8,
+         step: float=0.5, shrink: float=0.7, block: int=50,
+         delta: float=0.05, max_moves: int=1000,
+         cache: TO.Cache | None=None, workers: int | None=None,
+         seed: int=1) -> ty.Tuple[Candidate, ty.List[str]]:
+    ''' the racing search from GR.WEIGHTS
+    Returns:
+        (the best candidate, a report line per round)
+    '''
+    cache = cache or TO.Cache(None)
+    rng = random.Random(seed)
+    best = Candidate({'max_moves': max_moves, **GR.WEIGHTS})
+    lines = []
+    with cf.ProcessPoolExecutor(max_workers=workers) as pool:
+        for n in range(rounds):
+            start = time.perf_counter()
+            candidates = [Candidate(best.params)] \
+                + [Candidate(_perturb(best.params, step, rng))
+                   for i in range(population - 1)]
+            played, cached = race(candidates, deals, cache, pool, block,
+                                  delta)
+            survivors = [c for c in candidates if c.dropped is None]
+            # the old best is candidate 0, so this never gets worse
+            best = max(survivors, key=lambda c: c.rate)
+            lines.append(f'round {n}: step {step:.3f} '
+                         f'{len(survivors)}/{len(candidates)} survived, '
+                         f'best {100 * best.rate:.1f}% '
+                         f'({best.weights()}) {played} played '
+                         f'{cached} cached '
+                         f'{time.perf_counter() - start:.1f}s')
+            step *= shrink
+    return best, lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tune the greedy '
+                                     'policy weights')
+    parser.add_argument('--first', '-f',
+                        type=int,
+                        default=1,
+                        help='first deal default: %(default)s')
+    parser.add_argument('--deals', '-d',
+                        type=int,
+                        default=400,
+                        help='number of deals default: %(default)s')
+    parser.add_argument('--rounds', '-r',
+                        type=int,
+                        default=5,
+                        help='search rounds default: %(default)s')
+    parser.add_argument('--population', '-p',
+                        type=int,
+                        default=8,
+                        help='candidates per round default: %(default)s')
+    parser.add_argument('--step', '-s',
+                        type=float,
+                        default=0.5,
+                        help='first relative step default: %(default)s')
+    parser.add_argument('--block', '-b',
+                        type=int,
+                        default=50,
+                        help='deals between drops default: %(default)s')
+    parser.add_argument('--delta',
+                        type=float,
+                        default=0.05,
+                        help='chance of dropping a candidate that is as '
+                             'good default: %(default)s')
+    parser.add_argument('--max_moves', '-m',
+                        type=int,
+                        default=1000,
+                        help='moves per game default: %(default)s')
+    parser.add_argument('--cache', '-c',
+                        type=pl.Path,
+                        default=pl.Path('tournament.cache'),
+                        help='results cache default: %(default)s')
+    parser.add_argument('--no_cache',
+                        action='store_true',
+                        help='play every game, keep nothing')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='pool size default: %(default)s')
+    args = parser.parse_args()
+    cache = TO.Cache(None if args.no_cache else args.cache)
+    start = time.perf_counter()
+    best, lines = tune(range(args.first, args.first + args.deals),
+                       args.rounds, args.population, args.step,
+                       block=args.block, delta=args.delta,
+                       max_moves=args.max_moves, cache=cache,
+                       workers=args.workers)
+    cache.close()
+    print('\n'.join(lines))
+    print(f'best weights: {best.weights()} win rate '
+          f'{100 * best.rate:.1f}% over {best.games} deals, '
+          f'{time.perf_counter() - start:.1f}s')
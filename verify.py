@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+## -*- coding: utf-8 -*-
+#
+
+''' Replay game logs through the engine and check their checksums.
+    Each game is dealt and played headless with solitaire.play_cmd,
+    stdout sent to /dev/null, and after every move the engine position
+    is chained into the checksum the way game_log does it. The first
+    move whose checksum differs from the logged one is where the
+    engine's behaviour has changed, so a game stops there and is
+    reported. Files are checked in parallel, one per pool task.
+'''
+
+import argparse
+import concurrent.futures as cf
+import contextlib
+import os
+import pathlib as pl
+import random
+import sys
+import tempfile
+import time
+import typing as ty
+
+import game_log as GL
+import layout as L
+import snapshot as SN
+import solitaire as S
+import solver as SV
+import tableau as T
+
+
+class Divergence():
+    ''' where a replay first left its log
+    '''
+    __slots__ = ('_path', '_game', '_deal', '_step', '_cmd', '_logged',
+                 '_replayed')
+
+    def __init__(self, path: pl.Path, game: int, deal: int, step: int,
+                 cmd: str, logged: int, replayed: int | None):
+        self._path = path
+        self._game = game
+        self._deal = deal
+        self._step = step
+        self._cmd = cmd
+        self._logged = logged
+        self._replayed = replayed
+
+    @property
+    def step(self) -> int:
+        ''' the index of the move in its game '''
+        return self._step
+
+    def __str__(self) -> str:
+        got = 'an error' if self._replayed is None \
+            else f'{self._replayed:08x}'
+        return f'{self._path}: game {self._game} deal {self._deal} move ' \
+               f'{self._step} "{self._cmd}": logged {self._logged:08x} ' \
+               f'replayed {got}'
+
+
+def verify_game(game: GL.Game, tableau_class: type=T.Tableau) \
+        -> ty.Tuple[int, int | None, int | None]:
+    ''' replay game, in its layout, up to the first checksum that
+        differs
+    Returns:
+        (moves replayed, the step that differs or None, the replayed
+         checksum there, None if the engine raised)
+    '''
+    with L.using(game.layout):
+        t, f, sw = SV.deal_game(game.deal, tableau_class)
+        checksum = 0
+        for step, (cmd, logged) in enumerate(zip(game.moves,
+                                                 game.checksums)):
+            try:
+                S.play_cmd(t, f, sw, cmd)
+                checksum = GL.chain(checksum, SN.pack(t, f, sw))
+            except Exception:
+                return step + 1, step, None
+            if logged is not None and checksum != logged:
+                return step + 1, step, checksum
+    return len(game.moves), None, None
+
+
+def verify_path(path: pl.Path, tableau: str='dict') \
+        -> ty.Tuple[int, int, int, ty.List[Divergence]]:
+    ''' verify every game in path
+    Returns:
+        (games, moves replayed, moves checked, divergences)
+    '''
+    tableau_class = T.backend(tableau)
+    games = moves = checked = 0
+    bad = []
+    # the engine prints as it plays
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        for n, game in enumerate(GL.read_path(path)):
+            games += 1
+            checked += sum(c is not None for c in game.checksums)
+            played, step, replayed = verify_game(game, tableau_class)
+            moves += played
+            if step is not None:
+                bad.append(Divergence(path, n, game.deal, step,
+                                      game.moves[step].cmd_line,
+                                      game.checksums[step], replayed))
+    return games, moves, checked, bad
+
+
+def verify_paths(paths: ty.Sequence[pl.Path], tableau: str='dict',
+                 workers: int | None=None) \
+        -> ty.Iterator[ty.Tuple[pl.Path, int, int, int,
+                                ty.List[Divergence]]]:
+    ''' verify_path over a process pool, yields as files finish
+    '''
+    with cf.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(verify_path, p, tableau): p for p in paths}
+        for future in cf.as_completed(futures):
+            yield (futures[future],) + future.result()
+
+
+def _sample_logs(directory: pl.Path, files: int, games: int) \
+        -> ty.List[pl.Path]:
+    ''' random game logs to check, the last has one move changed
+    '''
+    rng = random.Random(1)
+    paths = []
+    for i in range(files):
+        path = directory / f'games-{i}.log'
+        with open(path, 'w') as fd:
+            log = GL.GameLog(fd)
+            for deal in range(i * games, (i + 1) * games):
+                log.write_game(GL.random_game(deal, 300, rng))
+        paths.append(path)
+    # swap the columns of the last tableau move of the middle game, the
+    # checksums after it no longer match what the engine does
+    lines = paths[-1].read_text().splitlines()
+    games_at = [i for i, line in enumerate(lines) if line[:4] == 'game']
+    start = games_at[len(games_at) // 2]
+    end = games_at[len(games_at) // 2 + 1]
+    for i in range(end - 1, start, -1):
+        parts = lines[i].split()
+        if parts[0] == 'move' and len(parts) == 5:
+            parts[2], parts[3] = parts[3], parts[2]
+            lines[i] = ' '.join(parts)
+            break
+    paths[-1].write_text('\n'.join(lines) + '\n')
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verify game logs')
+    parser.add_argument('paths',
+                        type=pl.Path,
+                        nargs='*',
+                        help='game logs, default: check generated ones')
+    parser.add_argument('--tableau',
+                        choices=T.backends(),
+                        default='dict',
+                        help='tableau backend default: %(default)s')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='pool size default: %(default)s')
+    parser.add_argument('--files',
+                        type=int,
+                        default=8,
+                        help='generated logs default: %(default)s')
+    parser.add_argument('--games',
+                        type=int,
+                        default=50,
+                        help='games per generated log default: %(default)s')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args.paths or _sample_logs(pl.Path(tmp), args.files,
+                                           args.games)
+        start = time.perf_counter()
+        totals = [0, 0, 0]
+        diverged = 0
+        for path, games, moves, checked, bad in verify_paths(
+                paths, args.tableau, args.workers):
+            totals = [a + b for a, b in zip(totals, (games, moves, checked))]
+            for d in bad:
+                print(d)
+            diverged += len(bad)
+        secs = time.perf_counter() - start
+    print(f'{len(paths)} files, {totals[0]} games, {totals[1]} moves '
+          f'replayed ({totals[1] / secs:.0f}/s), {totals[2]} checksums, '
+          f'{diverged} diverged', file=sys.stderr)
+    sys.exit(1 if diverged else 0)